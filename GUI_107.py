@@ -4,12 +4,30 @@ from PyQt5.QtCore import *
 from PyQt5 import QtCore, QtGui, QtWidgets
 
 import cryostat_functions as cryo
+from cryostat_run import Run
+from cryostat_cache import FigureCache, cached_plot, cache_key, restore_figure
+import cryostat_pyramid
+from cryostat_live import LivePlot, LogTail
 
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar
 import pandas as pd
 
+import os
 import sys 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+#Rendered figures are cached on disk, keyed by log file content, plot function and parameters
+FIGURE_CACHE = FigureCache()
+#Summary tables of SummaryData by button text. Each is memoized on the Run and computed on its own, so one failing table
+#(e.g. "Magnet summary qtys" of a log without temperature holds) does not hide the others
+SUMMARY_TABLES = {"Temperature summary qtys":lambda run: run.temp_summary_combine(),
+                  "Magnet summary qtys":lambda run: run.hold_summary(energy=True),
+                  "Regen summary qtys":lambda run: run.regen_summary(energy=True),
+                  "50 mK noise summary qtys":lambda run: run.noise_summary(),
+                  "Hold decay fit qtys":lambda run: run.hold_decay(),
+                  "Cooldown/warmup threshold crossings":lambda run: run.coolwarm_crossings(),
+                  "Cooldown/warmup time":lambda run: run.coolwarm_time()}
 
 class MplCanvas(FigureCanvasQTAgg):
 
@@ -30,6 +48,174 @@ class PlotWindow(QMainWindow):
         widget.setLayout(layout)
         self.setCentralWidget(widget)
 
+class PagedPlotWindow(PlotWindow):
+
+    def __init__(self, phasefiles, plottype):
+        super(PagedPlotWindow, self).__init__()
+        self.pager = cryo.PhasePager(self.canvas.fig, phasefiles, plottype)
+        self.prevbutton = QPushButton("Previous")
+        self.nextbutton = QPushButton("Next")
+        self.pagelabel = QLabel("")
+        
+        pagelayout = QHBoxLayout()
+        pagelayout.addWidget(self.prevbutton)
+        pagelayout.addWidget(self.pagelabel)
+        pagelayout.addWidget(self.nextbutton)
+        self.centralWidget().layout().addLayout(pagelayout)
+        
+        self.prevbutton.clicked.connect(self.prev_page)
+        self.nextbutton.clicked.connect(self.next_page)
+        
+    def showEvent(self, event):
+        super(PagedPlotWindow, self).showEvent(event)
+        self.show_page(self.pager.page)
+        
+    def show_page(self, page):
+        self.pager.show(page)
+        self.pagelabel.setText('Page {} of {}'.format(self.pager.page + 1, self.pager.pages))
+        
+    def prev_page(self):
+        self.show_page(self.pager.page - 1)
+        
+    def next_page(self):
+        self.show_page(self.pager.page + 1)
+
+class StreamWorker(QThread):
+    #Emits the points of each log file as soon as they are calculated, in order of completion 
+    #Each log is checked for data repeated in the logs processed before it while it is processed (see cryo.ChunkFilter), 
+    #and logs holding only repeated data are skipped
+    result = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
+    skipped = pyqtSignal(str)
+    
+    def __init__(self, paths, filefunc, args=(), workers=2):
+        super(StreamWorker, self).__init__()
+        self.paths = paths
+        self.filefunc = filefunc
+        self.args = args
+        self.workers = workers
+        self.cancelled = False
+        
+    def cancel(self):
+        self.cancelled = True
+        
+    def process(self, chunks, path):
+        #Unique row ranges of the log, and its points unless it holds only repeated data 
+        spans = chunks.spans(path)
+        if spans == []:
+            return spans, None
+        return spans, self.filefunc(path, *self.args, spans=spans)
+        
+    def run(self):
+        #Smallest files first, so the first points appear as soon as possible; missing files fail when they are processed 
+        paths = sorted(self.paths, key=lambda path: os.path.getsize(path) if os.path.isfile(path) else 0)
+        chunks = cryo.ChunkFilter()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        futures = {executor.submit(self.process, chunks, path):path for path in paths}
+        for future in as_completed(futures):
+            if self.cancelled:
+                break
+            try:
+                spans, points = future.result()
+            except Exception as error:
+                self.failed.emit(futures[future], str(error))
+                continue
+            if spans == []:
+                self.skipped.emit(futures[future])
+            else:
+                self.result.emit(futures[future], points)
+        #Files that have not started are dropped on cancel; running ones finish in the background 
+        executor.shutdown(wait=False, cancel_futures=True)
+
+class StreamingPlotWindow(PlotWindow):
+
+    def __init__(self, paths, plotname, args=(), cachekey=None):
+        super(StreamingPlotWindow, self).__init__()
+        axesfunc, filefunc, self.pointsfunc = cryo.STREAMED_PLOTS[plotname]
+        self.cachekey = cachekey
+        self.total = len(paths)
+        self.done = 0
+        self.errors = 0
+        self.duplicates = 0
+        self.ax = axesfunc(self)
+        
+        self.progress = QProgressBar()
+        self.progress.setRange(0, self.total)
+        self.statuslabel = QLabel("")
+        self.cancelbutton = QPushButton("Cancel")
+        
+        progresslayout = QHBoxLayout()
+        progresslayout.addWidget(self.progress)
+        progresslayout.addWidget(self.statuslabel)
+        progresslayout.addWidget(self.cancelbutton)
+        self.centralWidget().layout().addLayout(progresslayout)
+        
+        self.worker = StreamWorker(paths, filefunc, args)
+        self.worker.result.connect(self.add_points)
+        self.worker.failed.connect(self.fail_file)
+        self.worker.skipped.connect(self.skip_file)
+        self.worker.finished.connect(self.finish)
+        self.cancelbutton.clicked.connect(self.worker.cancel)
+        self.worker.start()
+        
+    def add_points(self, path, result):
+        self.pointsfunc(self.ax, result)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.canvas.draw_idle()
+        self.step()
+        
+    def fail_file(self, path, error):
+        self.errors += 1
+        self.step()
+        
+    def skip_file(self, path):
+        self.duplicates += 1
+        self.step()
+        
+    def step(self):
+        self.done += 1
+        self.progress.setValue(self.done)
+        notes = ['{} failed'.format(self.errors)] if self.errors else []
+        notes += ['{} duplicate'.format(self.duplicates)] if self.duplicates else []
+        self.statuslabel.setText('{} of {} files{}'.format(self.done, self.total, ''.join(', ' + note for note in notes)))
+        
+    def finish(self):
+        self.cancelbutton.setEnabled(False)
+        if self.worker.cancelled:
+            self.statuslabel.setText('Canceled after {} of {} files'.format(self.done, self.total))
+        elif self.cachekey is not None and not self.errors:
+            #Complete plots are cached like the other summary plots 
+            FIGURE_CACHE.put(self.cachekey, self.canvas.fig)
+            
+    def closeEvent(self, event):
+        self.worker.cancel()
+        super(StreamingPlotWindow, self).closeEvent(event)
+
+class LiveWindow(PlotWindow):
+    #Live view of a log that is being written, redrawn by blitting several times per second 
+
+    def __init__(self, path, cryostat=107, interval=250):
+        super(LiveWindow, self).__init__()
+        self.setWindowTitle('Live: ' + os.path.basename(path))
+        self.tail = LogTail(path, cryostat)
+        self.plot = LivePlot(self.canvas.fig)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(interval)
+        
+    def refresh(self):
+        try:
+            self.plot.extend(self.tail.read())
+        except (OSError, ValueError) as error:
+            self.statusBar().showMessage(str(error))
+            return
+        self.plot.update()
+        
+    def closeEvent(self, event):
+        self.timer.stop()
+        super(LiveWindow, self).closeEvent(event)
+
 class TableModel(QtCore.QAbstractTableModel):
 
     def __init__(self, data, parent=None):
@@ -66,11 +252,11 @@ class TableWindow(QMainWindow):
         self.setCentralWidget(self.table)
         
 class CoolWarmWindow(QWidget):
-    def __init__(self,coollog,warmlog):
+    def __init__(self,cooltime,warmtime):
         super(CoolWarmWindow, self).__init__()
         
-        self.coollog = coollog
-        self.warmlog = warmlog
+        self.cooltimes = cooltime
+        self.warmtimes = warmtime
         
         self.coolbutton = QRadioButton("Cooldown time")
         self.warmbutton= QRadioButton("Warmup time")
@@ -89,12 +275,16 @@ class CoolWarmWindow(QWidget):
         self.warmbutton.pressed.connect(self.warmtime)
 
     def cooltime(self):
-        text = str(round(cryo.coolwarm_time(self.coollog),3))
-        self.time.setText(text + ' hours')
+        self.time.setText(self.format_time(self.cooltimes))
         
     def warmtime(self):
-        text = str(round(cryo.coolwarm_time(self.warmlog),3))
-        self.time.setText(text + ' hours')
+        self.time.setText(self.format_time(self.warmtimes))
+    
+    def format_time(self, time):
+        #coolwarm_time() returns a message instead of a number if there is no full cooldown or warmup
+        if isinstance(time, str):
+            return time
+        return str(round(time,3)) + ' hours'
        
 class SinglePhasePlot(QGroupBox):
     
@@ -105,8 +295,12 @@ class SinglePhasePlot(QGroupBox):
         
         self.filebutton = QPushButton("Choose File")
         self.filelabel = QLabel("")
+        #Cryostat model of the chosen log (see cryo.LOG_SCHEMAS)
+        self.choosemodel = QComboBox()
+        self.choosemodel.addItems([str(cryostat) for cryostat in cryo.LOG_SCHEMAS])
         
         filelayout = QHBoxLayout()
+        filelayout.addWidget(self.choosemodel)
         filelayout.addWidget(self.filebutton)
         filelayout.addWidget(self.filelabel) 
     
@@ -127,12 +321,14 @@ class SinglePhasePlot(QGroupBox):
         chooselayout.addWidget(self.choosephase)
         
         self.plot = QPushButton("Plot")
+        self.livebutton = QPushButton("Live view of log")
         
         layout = QVBoxLayout()
         layout.addLayout(filelayout)
         layout.addLayout(buttonlayout)
         layout.addLayout(chooselayout)
         layout.addWidget(self.plot)
+        layout.addWidget(self.livebutton)
         self.setLayout(layout)
         
         self.filebutton.clicked.connect(self.open_file)
@@ -140,12 +336,21 @@ class SinglePhasePlot(QGroupBox):
         self.regenbutton.pressed.connect(self.press_regen)
         self.regbutton.pressed.connect(self.press_reg) 
         self.plot.clicked.connect(self.show_plot)
+        self.livebutton.clicked.connect(self.show_live)
     
     def open_file(self):
         path = QFileDialog.getOpenFileName(self, "Open")[0]
         if path:
-            self.logs = cryo.split_107(cryo.load_107(path))
-            self.filelabel.setText(str(self.logs[0]['log1'].iloc[0,0])[:10] + ' log') 
+            self.path = path
+            self.cryostat = int(self.choosemodel.currentText())
+            self.logs = cryo.split_log(cryo.load_log(path, self.cryostat), cryostat=self.cryostat)
+            self.filelabel.setText(str(self.logs[0]['log1']['Date/Time'].iloc[0])[:10] + ' log') 
+            
+    def show_live(self):
+        #Follows the chosen log as it is written (e.g. during an active hold)
+        if getattr(self, 'path', None):
+            self.livewindow = LiveWindow(self.path, self.cryostat)
+            self.livewindow.show()
             
     def press_cool(self):
         options = ["cooldown", "warmup"]
@@ -170,13 +375,16 @@ class SinglePhasePlot(QGroupBox):
         self.phaseindex = self.choosephase.currentIndex()
         if self.phasetype == 0: 
             if self.phaseindex == 0:
-                cryo.cooldown_plot(self.logs[0]['log1'],self.plotwindow)
+                key = 'log1'
             elif self.phaseindex == 1: 
-                cryo.cooldown_plot(self.logs[0]['log{}'.format(len(self.logs[0]))],self.plotwindow)
+                key = 'log{}'.format(len(self.logs[0]))
+            cached_plot(FIGURE_CACHE, [self.path], cryo.cooldown_plot, (self.logs[0][key],), self.plotwindow, {'phase':key, 'cryostat':self.cryostat})
         if self.phasetype ==1: 
-            cryo.regen_plot(self.logs[1]['regen{}'.format(self.phaseindex+1)],self.plotwindow)
+            key = 'regen{}'.format(self.phaseindex+1)
+            cached_plot(FIGURE_CACHE, [self.path], cryo.regen_plot, (self.logs[1][key],), self.plotwindow, {'phase':key, 'cryostat':self.cryostat})
         if self.phasetype ==2: 
-            cryo.reg_plot(self.logs[2]['reg{}'.format(self.phaseindex+1)],self.plotwindow)
+            key = 'reg{}'.format(self.phaseindex+1)
+            cached_plot(FIGURE_CACHE, [self.path], cryo.reg_plot, (self.logs[2][key],), self.plotwindow, {'phase':key, 'cryostat':self.cryostat})
         self.plotwindow.show()
         
 class MultiplePhasePlot(QGroupBox):
@@ -187,8 +395,12 @@ class MultiplePhasePlot(QGroupBox):
         
         self.filebutton = QPushButton("Choose File")
         self.filelabel = QLabel("")
+        #Cryostat model of the chosen log (see cryo.LOG_SCHEMAS)
+        self.choosemodel = QComboBox()
+        self.choosemodel.addItems([str(cryostat) for cryostat in cryo.LOG_SCHEMAS])
         
         filelayout = QHBoxLayout()
+        filelayout.addWidget(self.choosemodel)
         filelayout.addWidget(self.filebutton)
         filelayout.addWidget(self.filelabel) 
         
@@ -197,6 +409,7 @@ class MultiplePhasePlot(QGroupBox):
         self.regtempbutton = QRadioButton("Temp hold 50 mK temp")
         self.regmagbutton = QRadioButton("Temp hold current")
         self.reg3kbutton = QRadioButton("Temp hold 3K temp")
+        self.regoverlaybutton = QRadioButton("Temp hold 50 mK overlay")
         
         buttonlayout = QVBoxLayout()
         buttonlayout.addWidget(self.regentempbutton)
@@ -204,6 +417,7 @@ class MultiplePhasePlot(QGroupBox):
         buttonlayout.addWidget(self.regtempbutton)
         buttonlayout.addWidget(self.regmagbutton)
         buttonlayout.addWidget(self.reg3kbutton)
+        buttonlayout.addWidget(self.regoverlaybutton)
     
         self.plotbutton = QPushButton("Plot")
         
@@ -219,13 +433,15 @@ class MultiplePhasePlot(QGroupBox):
         self.regtempbutton.pressed.connect(self.chooseplottype)
         self.regmagbutton.pressed.connect(self.chooseplottype)
         self.reg3kbutton.pressed.connect(self.chooseplottype)
+        self.regoverlaybutton.pressed.connect(self.chooseplottype)
         self.plotbutton.pressed.connect(self.show_plot)
         
     def open_file(self):
         path = QFileDialog.getOpenFileName(self, "Open")[0]
         if path:
-            self.logs = cryo.split_107(cryo.load_107(path))
-            self.filelabel.setText(str(self.logs[0]['log1'].iloc[0,0])[:10] + ' log') 
+            cryostat = int(self.choosemodel.currentText())
+            self.logs = cryo.split_log(cryo.load_log(path, cryostat), cryostat=cryostat)
+            self.filelabel.setText(str(self.logs[0]['log1']['Date/Time'].iloc[0])[:10] + ' log') 
             cryo.temp_hold(self.logs[2])
     
     def chooseplottype(self): 
@@ -233,12 +449,18 @@ class MultiplePhasePlot(QGroupBox):
         self.plottype = sender.text()
         
     def show_plot(self):
-        self.plotwindow = PlotWindow()
-        typefunc = {"Mag cycle 50 mK temp":cryo.regen_temp_plots, "Mag cycle current":cryo.regen_mag_plots, "Temp hold 50 mK temp": cryo.reg_temp_plots, "Temp hold current": cryo.reg_mag_plots, "Temp hold 3K temp":cryo.reg_3K_plots}
+        typefunc = {"Mag cycle 50 mK temp":cryo.regen_temp_plots, "Mag cycle current":cryo.regen_mag_plots, "Temp hold 50 mK temp": cryo.reg_temp_plots, "Temp hold current": cryo.reg_mag_plots, "Temp hold 3K temp":cryo.reg_3K_plots, "Temp hold 50 mK overlay":cryo.reg_overlay_plots}
         if 'Mag cycle' in self.plottype:
-            typefunc[self.plottype](self.logs[1],self.plotwindow)
+            phasefiles = self.logs[1]
         elif "Temp hold" in self.plottype:
-            typefunc[self.plottype](self.logs[2],self.plotwindow)
+            phasefiles = self.logs[2]
+        #Plots with one subplot per phase are drawn a page at a time 
+        if typefunc[self.plottype].__name__ in cryo.PAGED_PLOTS:
+            self.plotwindow = PagedPlotWindow(phasefiles, typefunc[self.plottype].__name__)
+        else:
+            self.plotwindow = PlotWindow()
+            typefunc[self.plottype](phasefiles,self.plotwindow)
+        self.plotwindow.show()
         
         
     
@@ -258,6 +480,9 @@ class SummaryPlot(QGroupBox):
         self.maxcurrentbutton = QRadioButton("Max current vs. hold time")
         self.stddevbutton = QRadioButton("50 mK std dev vs. date")
         self.tempqtysbutton = QRadioButton("Temperature qtys vs. date")
+        self.anomalybutton = QRadioButton("Anomalous holds/cycles vs. date")
+        self.trendbutton = QRadioButton("Temperature trend vs. date")
+        self.noisebutton = QRadioButton("50 mK noise spectra of all holds")
         
         self.setpoint = QLineEdit("Enter 50 mK setpoint (e.g. 0.06)")
         self.choosetemp = QComboBox() 
@@ -275,6 +500,9 @@ class SummaryPlot(QGroupBox):
         buttonlayout.addLayout(currentlayout)
         buttonlayout.addWidget(self.stddevbutton)
         buttonlayout.addLayout(templayout)
+        buttonlayout.addWidget(self.trendbutton)
+        buttonlayout.addWidget(self.noisebutton)
+        buttonlayout.addWidget(self.anomalybutton)
         
         self.plotbutton = QPushButton("Plot")
         
@@ -288,6 +516,9 @@ class SummaryPlot(QGroupBox):
         self.maxcurrentbutton.pressed.connect(self.chooseplottype)
         self.stddevbutton.pressed.connect(self.chooseplottype)
         self.tempqtysbutton.pressed.connect(self.chooseplottype)
+        self.anomalybutton.pressed.connect(self.chooseplottype)
+        self.trendbutton.pressed.connect(self.chooseplottype)
+        self.noisebutton.pressed.connect(self.chooseplottype)
         self.plotbutton.pressed.connect(self.show_plot)
         
     def open_files(self):
@@ -295,7 +526,8 @@ class SummaryPlot(QGroupBox):
         if self.paths: 
             dates = ""
             for i in self.paths: 
-                firstrows = pd.read_csv(r'{}'.format(i), nrows = 3)
+                with cryo.open_log(i) as f:
+                    firstrows = pd.read_csv(f, nrows = 3)
                 dates += str(firstrows.iloc[2,0][:10] + ' log')  + '\n'
             self.filelabel.setText(dates) 
     
@@ -305,14 +537,68 @@ class SummaryPlot(QGroupBox):
     
     def show_plot(self): 
         self.plotwindow = PlotWindow()
-        typefunc = {"Max current vs. hold time":cryo.maxcurrent_holdtime, "50 mK std dev vs. date":cryo.stddev_time, "Temperature qtys vs. date":cryo.temp_minmaxmean}
+        typefunc = {"Max current vs. hold time":cryo.maxcurrent_holdtime, "50 mK std dev vs. date":cryo.stddev_time, "Temperature qtys vs. date":cryo.temp_minmaxmean, "Anomalous holds/cycles vs. date":cryo.anomaly_time, "50 mK noise spectra of all holds":cryo.noise_waterfall}
         if self.plottype == "Max current vs. hold time":
-            typefunc[self.plottype](self.paths,float(self.setpoint.text()), self.plotwindow)
+            setpoint = float(self.setpoint.text())
+            self.stream_plot(typefunc[self.plottype], (setpoint,), {'setpoint':setpoint})
         elif self.plottype == "Temperature qtys vs. date":
             self.temptext = self.choosetemp.currentText()
-            typefunc[self.plottype](self.paths, self.temptext, self.plotwindow)
+            self.stream_plot(typefunc[self.plottype], (self.temptext,), {'temp':self.temptext})
+        elif self.plottype == "50 mK std dev vs. date":
+            self.stream_plot(typefunc[self.plottype])
+        elif self.plottype == "Anomalous holds/cycles vs. date":
+            holds, regens = typefunc[self.plottype](self.paths, self.plotwindow)
+            #Show table of flagged phases next to the plot 
+            flagged = pd.concat([holds.loc[holds['Anomaly']], regens.loc[regens['Anomaly']]]).sort_index()
+            self.tablewindow = TableWindow(flagged)
+            self.tablewindow.show()
+            self.plotwindow.show()
+        elif self.plottype == "Temperature trend vs. date":
+            #Trend is drawn from the aggregate pyramids and reads finer levels on zoom, so it is not cached as a figure
+            self.trendview = cryostat_pyramid.trend_plot(self.paths, self.choosetemp.currentText(), self.plotwindow)
+            self.plotwindow.show()
+        elif self.plottype == "50 mK noise spectra of all holds":
+            #Figure descriptions keep neither color meshes nor tick labels, so the waterfall is not cached as a figure
+            typefunc[self.plottype](self.paths, self.plotwindow)
+            self.plotwindow.show()
         else:
-            typefunc[self.plottype](self.paths,self.plotwindow)
+            cached_plot(FIGURE_CACHE, self.paths, typefunc[self.plottype], (self.paths,), self.plotwindow)
+            self.plotwindow.show()
+    
+    def stream_plot(self, plotfunc, args=(), params=None):
+        #Cached plots are redrawn at once; otherwise the points of each file are added as soon as they are calculated 
+        key = cache_key(self.paths, plotfunc, params)
+        desc = FIGURE_CACHE.get(key)
+        if desc is not None:
+            restore_figure(desc, self.plotwindow.canvas.fig)
+        else:
+            self.plotwindow = StreamingPlotWindow(self.paths, plotfunc.__name__, args, key)
+        self.plotwindow.show()
+        
+class SummaryWorker(QThread):
+    #Emits the loaded Run once all of its summary tables are memoized, with the error message of each table that 
+    #failed, or an error message if the log cannot be loaded
+    finished_run = pyqtSignal(object, object)
+    failed = pyqtSignal(object, str)
+    
+    def __init__(self, path, cryostat=107):
+        super(SummaryWorker, self).__init__()
+        self.path = path
+        self.cryostat = cryostat
+        
+    def run(self):
+        try:
+            run = Run.from_file(self.path, cryostat=self.cryostat)
+        except Exception as error:
+            self.failed.emit((self.path, self.cryostat), str(error))
+            return
+        errors = {}
+        for name, table in SUMMARY_TABLES.items():
+            try:
+                table(run)
+            except Exception as error:
+                errors[name] = str(error)
+        self.finished_run.emit(run, errors)
         
 class SummaryData(QGroupBox):
     def __init__(self):
@@ -322,21 +608,33 @@ class SummaryData(QGroupBox):
         
         self.filebutton = QPushButton("Choose File")
         self.filelabel = QLabel("")
+        #Cryostat model of the chosen log (see cryo.LOG_SCHEMAS)
+        self.choosemodel = QComboBox()
+        self.choosemodel.addItems([str(cryostat) for cryostat in cryo.LOG_SCHEMAS])
+        self.statuslabel = QLabel("")
         
         filelayout = QHBoxLayout()
+        filelayout.addWidget(self.choosemodel)
         filelayout.addWidget(self.filebutton)
         filelayout.addWidget(self.filelabel) 
+        filelayout.addWidget(self.statuslabel)
         
         self.tempdatabutton = QRadioButton("Temperature summary qtys")
         self.magdatabutton = QRadioButton("Magnet summary qtys")
         self.regendatabutton = QRadioButton("Regen summary qtys")
+        self.noisedatabutton = QRadioButton("50 mK noise summary qtys")
+        self.decaydatabutton = QRadioButton("Hold decay fit qtys")
         self.coolwarmbutton = QRadioButton("Cooldown/warmup time")
+        self.crossingbutton = QRadioButton("Cooldown/warmup threshold crossings")
     
         buttonlayout = QVBoxLayout()
         buttonlayout.addWidget(self.tempdatabutton)
         buttonlayout.addWidget(self.magdatabutton)
         buttonlayout.addWidget(self.regendatabutton)
+        buttonlayout.addWidget(self.noisedatabutton)
+        buttonlayout.addWidget(self.decaydatabutton)
         buttonlayout.addWidget(self.coolwarmbutton)
+        buttonlayout.addWidget(self.crossingbutton)
         
         self.viewbutton = QPushButton("View data")
         self.savebutton = QPushButton("Save data")
@@ -355,37 +653,90 @@ class SummaryData(QGroupBox):
         self.tempdatabutton.pressed.connect(self.choosecsvtype)
         self.magdatabutton.pressed.connect(self.choosecsvtype)
         self.regendatabutton.pressed.connect(self.choosecsvtype)
+        self.noisedatabutton.pressed.connect(self.choosecsvtype)
+        self.decaydatabutton.pressed.connect(self.choosecsvtype)
         self.coolwarmbutton.pressed.connect(self.choosecsvtype)
+        self.crossingbutton.pressed.connect(self.choosecsvtype)
         self.viewbutton.clicked.connect(self.viewdata)
         self.savebutton.clicked.connect(self.save_file)
+        
+        self.runs = {} #Loaded runs of this session, keyed by filepath and cryostat model 
+        self.workers = {} #Running summary workers, keyed as above 
+        self.errors = {} #Error messages of the summary tables that failed, keyed as above 
+        self.run = None
+        self.csvtype = None
+        self.set_pending(False)
     
     def open_file(self):
         path = QFileDialog.getOpenFileName(self, "Open")[0]
         if path:
-            self.logs = cryo.split_107(cryo.load_107(path))
-            self.filelabel.setText(str(self.logs[0]['log1'].iloc[0,0])[:10] + ' log') 
-            cryo.temp_hold(self.logs[2])
+            self.key = (path, int(self.choosemodel.currentText()))
+            if self.key in self.runs:
+                self.show_run(self.runs[self.key])
+            else:
+                #Load the log and compute every summary table in the background 
+                self.run = None
+                self.filelabel.setText(os.path.basename(path))
+                self.set_pending(True)
+                if self.key not in self.workers:
+                    worker = SummaryWorker(*self.key)
+                    worker.finished_run.connect(self.finish_run)
+                    worker.failed.connect(self.fail_run)
+                    self.workers[self.key] = worker
+                    worker.start()
+    
+    def finish_run(self, run, errors):
+        key = (run.path, run.cryostat)
+        self.runs[key] = run
+        self.errors[key] = errors
+        self.workers.pop(key)
+        if key == self.key:
+            self.show_run(run)
+    
+    def fail_run(self, key, error):
+        self.workers.pop(key)
+        if key == self.key:
+            self.statuslabel.setText("Error: " + error)
+    
+    def show_run(self, run):
+        self.run = run
+        self.filelabel.setText(run.label + ' log') 
+        self.set_pending(False)
+        if self.csvtype is not None:
+            self.select_data()
+    
+    def set_pending(self, pending):
+        #Data can only be viewed or saved once the summaries of the chosen file are computed 
+        self.statuslabel.setText("Computing summaries..." if pending else "")
+        self.viewbutton.setEnabled(not pending)
+        self.savebutton.setEnabled(not pending)
     
     def choosecsvtype(self): 
         sender = self.sender()
         self.csvtype = sender.text()
-        if self.csvtype == "Temperature summary qtys":
-            tempqtys = cryo.temp_summary(self.logs[2], 107)
-            self.data = cryo.temp_summary_combine(tempqtys, 107)
-        elif self.csvtype == "Magnet summary qtys":
-            self.data = cryo.hold_summary(self.logs[2])
-        elif self.csvtype == "Regen summary qtys":
-            self.data = cryo.regen_summary(self.logs[1])
-        elif self.csvtype == "Cooldown/warmup time":
-            self.coollog = self.logs[0]['log1']
-            self.warmlog = self.logs[0]['log{}'.format(str(len(self.logs[0])))]
+        if self.run is not None:
+            self.select_data()
+    
+    def select_data(self):
+        #Summaries are memoized on the run by SummaryWorker, so switching between views is immediate 
+        #A table that failed shows its error and cannot be viewed or saved; the other tables are unaffected 
+        error = self.errors.get(self.key, {}).get(self.csvtype)
+        self.statuslabel.setText("" if error is None else "Error: " + error)
+        self.viewbutton.setEnabled(error is None)
+        self.savebutton.setEnabled(error is None)
+        if error is not None:
+            return
+        if self.csvtype == "Cooldown/warmup time":
+            self.cooltime, self.warmtime = SUMMARY_TABLES[self.csvtype](self.run)
+        else:
+            self.data = SUMMARY_TABLES[self.csvtype](self.run)
 
     def viewdata(self):
         if self.csvtype != "Cooldown/warmup time":
             self.tablewindow = TableWindow(self.data)
             self.tablewindow.show() 
         elif self.csvtype == "Cooldown/warmup time":
-            self.coolwarmdialog = CoolWarmWindow(self.coollog,self.warmlog) 
+            self.coolwarmdialog = CoolWarmWindow(self.cooltime,self.warmtime) 
             self.coolwarmdialog.show()    
     
     def save_file(self):
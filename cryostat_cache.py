@@ -0,0 +1,347 @@
+import os
+import glob
+import json
+import pickle
+import hashlib
+import inspect
+
+import numpy as np
+from matplotlib.collections import LineCollection, PathCollection, PolyCollection
+from matplotlib.container import ErrorbarContainer
+from matplotlib.transforms import IdentityTransform
+
+
+'''
+
+The functions below cache rendered figures on disk
+Entries are keyed by the content of the input log files, the plot function (and the source file defining it) and its parameters
+Each entry is a PNG and SVG of the figure plus a pickled description of its artists, which restore_figure()
+redraws as an interactive figure without loading any log data
+
+'''
+
+
+#Default cache directory and size limit
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cryostat_cache', 'figures')
+CACHE_BYTES = 500 * 2**20
+#Version of the figure descriptions, part of every cache key so entries described differently are never restored
+CACHE_SCHEMA = 2
+#Coordinate systems of described artists, and the transform of each on an axes
+COORDINATES = {'data':lambda ax: ax.transData, 'axes':lambda ax: ax.transAxes,
+               'xaxis':lambda ax: ax.get_xaxis_transform(), 'yaxis':lambda ax: ax.get_yaxis_transform()}
+
+#In-process memo of file hashes, keyed by (filepath, size, modification time)
+_file_hashes = {}
+
+
+def file_hash(path):
+    '''
+    Calculates the SHA-1 hash of a file's content. Hashes are memoized until the file's size or modification time changes
+
+    Parameters
+    ----------
+    path : str
+        Filepath
+
+    Returns
+    -------
+    digest : str
+        Hex digest of the file content
+
+    '''
+    stat = os.stat(path)
+    memo = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo not in _file_hashes:
+        sha = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(2**20), b''):
+                sha.update(chunk)
+        _file_hashes[memo] = sha.hexdigest()
+    return _file_hashes[memo]
+
+def cache_key(paths, plotfunc, params=None):
+    '''
+    Creates the cache key of a plot
+
+    Parameters
+    ----------
+    paths : list
+        Filepaths of the log files the plot is made from
+    plotfunc : function or str
+        Plot function (e.g. cryo.reg_plot) or its name. For a function, the hash of the file defining it is part of the key,
+        so changing the plotting code (including the functions it calls in that file) does not restore old figures
+    params : dict, optional
+        Other parameters that change the plot (e.g. {'phase':'reg3'} or {'setpoint':0.06})
+
+    Returns
+    -------
+    key : str
+        Hex digest identifying the plot
+
+    '''
+    if isinstance(plotfunc, str):
+        name, code = plotfunc, None
+    else:
+        source = inspect.getsourcefile(plotfunc)
+        name, code = plotfunc.__module__ + '.' + plotfunc.__name__, file_hash(source) if source else None
+    content = json.dumps([CACHE_SCHEMA, [file_hash(path) for path in paths], name, code, sorted((params or {}).items())], default=str)
+    return hashlib.sha1(content.encode()).hexdigest()
+
+def coordinates(artist, ax):
+    '''
+    Coordinate system of an artist on an axes, a key of COORDINATES (e.g. 'yaxis' for axhline(): x in axes, y in data coordinates)
+
+    '''
+    transform = artist.get_transform()
+    for name, axtransform in COORDINATES.items():
+        if transform == axtransform(ax):
+            return name
+    return 'data'
+
+def set_axis_units(axis, converter, units):
+    '''
+    Sets the unit converter and units of an axis (e.g. the date converter of an axis of timestamps), with the tick 
+    locators and formatters the converter chooses for them
+
+    '''
+    axis.set_converter(converter)
+    axis.set_units(units)
+    info = converter.axisinfo(units, axis)
+    if info is None:
+        return
+    for setter, value in ((axis.set_major_locator, info.majloc), (axis.set_minor_locator, info.minloc),
+                          (axis.set_major_formatter, info.majfmt), (axis.set_minor_formatter, info.minfmt)):
+        if value is not None:
+            setter(value)
+
+def describe_figure(fig):
+    '''
+    Creates a lightweight, picklable description of the axes and artists of a figure
+    Lines, scatter points, line collections, filled areas, texts, error bar containers, titles, labels, limits, legends
+    and the unit converters of both axes (e.g. dates) are described. Data are stored converted to axis units, together 
+    with the coordinate system of each artist
+
+    Parameters
+    ----------
+    fig : Figure
+        Figure to describe
+
+    Returns
+    -------
+    desc : list
+        One dictionary per axes
+
+    '''
+    desc = []
+    for ax in fig.axes:
+        legend = ax.get_legend()
+        axdesc = {'position':ax.get_position().bounds, 'title':ax.get_title(), 'xlabel':ax.get_xlabel(), 'ylabel':ax.get_ylabel(),
+                  'xlim':ax.get_xlim(), 'ylim':ax.get_ylim(), 'xscale':ax.get_xscale(), 'yscale':ax.get_yscale(),
+                  'xunits':(ax.xaxis.get_converter(), ax.xaxis.get_units()), 'yunits':(ax.yaxis.get_converter(), ax.yaxis.get_units()),
+                  'right':ax.yaxis.get_label_position() == 'right', 'frame':ax.patch.get_visible(),
+                  'legend':None if legend is None else (getattr(legend, '_loc', 'best'), [text.get_text() for text in legend.get_texts()]), 
+                  'lines':[], 'collections':[], 'texts':[], 'containers':[]}
+        artists = {} #Described lines and collections by id, for containers 
+        for line in ax.lines:
+            artists[id(line)] = ('lines', len(axdesc['lines']))
+            axdesc['lines'].append({'x':np.asarray(line.get_xdata(orig=False)), 'y':np.asarray(line.get_ydata(orig=False)), 'color':line.get_color(), 
+                                    'linestyle':line.get_linestyle(), 'linewidth':line.get_linewidth(), 'marker':line.get_marker(), 
+                                    'markersize':line.get_markersize(), 'label':line.get_label(), 'coordinates':coordinates(line, ax)})
+        for coll in ax.collections:
+            kind = 'scatter' if isinstance(coll, PathCollection) else 'lines' if isinstance(coll, LineCollection) else 'fill' if isinstance(coll, PolyCollection) else None
+            if kind is None:
+                continue
+            artists[id(coll)] = ('collections', len(axdesc['collections']))
+            item = {'kind':kind, 'label':coll.get_label(), 'facecolors':coll.get_facecolors(), 'edgecolors':coll.get_edgecolors(), 'alpha':coll.get_alpha()}
+            if kind == 'scatter':
+                item.update({'offsets':np.asarray(coll.get_offsets()), 'sizes':coll.get_sizes(), 'markers':coll.get_paths()})
+            elif kind == 'lines':
+                item.update({'segments':[np.asarray(seg) for seg in coll.get_segments()], 'colors':coll.get_colors(), 'linewidths':coll.get_linewidths(),
+                             'coordinates':coordinates(coll, ax)})
+            else:
+                item.update({'paths':[path.vertices for path in coll.get_paths()], 'coordinates':coordinates(coll, ax)})
+            axdesc['collections'].append(item)
+        for text in ax.texts:
+            axdesc['texts'].append({'position':text.get_position(), 'text':text.get_text(), 'color':text.get_color(), 'fontsize':text.get_fontsize(),
+                                    'ha':text.get_horizontalalignment(), 'va':text.get_verticalalignment(), 'coordinates':coordinates(text, ax)})
+        for container in ax.containers:
+            #Error bars are a data line, cap lines and bar line collections
+            if not isinstance(container, ErrorbarContainer):
+                continue
+            dataline, caplines, barlinecols = container.lines
+            axdesc['containers'].append({'label':container.get_label(), 'xerr':container.has_xerr, 'yerr':container.has_yerr, 
+                                         'line':artists.get(id(dataline)), 'caplines':[artists.get(id(line)) for line in caplines],
+                                         'barlinecols':[artists.get(id(coll)) for coll in barlinecols]})
+        desc.append(axdesc)
+    return desc
+
+def restore_figure(desc, fig):
+    '''
+    Redraws a figure from its description
+
+    Parameters
+    ----------
+    desc : list
+        Return of describe_figure()
+    fig : Figure
+        Empty figure to draw on (e.g. window.canvas.fig)
+
+    Returns
+    -------
+    None.
+
+    '''
+    handles = {} #Restored artists by label, for legends that combine artists of twin axes 
+    legends = []
+    for axdesc in desc:
+        ax = fig.add_axes(axdesc['position'])
+        if axdesc['right']:
+            ax.yaxis.tick_right()
+            ax.yaxis.set_label_position('right')
+        ax.patch.set_visible(axdesc['frame'])
+        ax.set_xscale(axdesc['xscale'])
+        ax.set_yscale(axdesc['yscale'])
+        #Data are already converted, so the converters only choose ticks and tick labels 
+        for axis, (converter, units) in ((ax.xaxis, axdesc['xunits']), (ax.yaxis, axdesc['yunits'])):
+            if converter is not None:
+                set_axis_units(axis, converter, units)
+        restored = {'lines':[], 'collections':[]}
+        for line in axdesc['lines']:
+            restored['lines'].append(ax.plot(line['x'], line['y'], color=line['color'], linestyle=line['linestyle'], linewidth=line['linewidth'], marker=line['marker'],
+                                             markersize=line['markersize'], label=line['label'], transform=COORDINATES[line['coordinates']](ax))[0])
+            handles[line['label']] = restored['lines'][-1]
+        for item in axdesc['collections']:
+            if item['kind'] == 'scatter':
+                coll = PathCollection(item['markers'], sizes=item['sizes'], offsets=item['offsets'], offset_transform=ax.transData)
+                coll.set_transform(IdentityTransform())
+            elif item['kind'] == 'lines':
+                coll = LineCollection(item['segments'], colors=item['colors'], linewidths=item['linewidths'], transform=COORDINATES[item['coordinates']](ax))
+            else:
+                coll = PolyCollection(item['paths'], transform=COORDINATES[item['coordinates']](ax))
+            coll.set_facecolor(item['facecolors'])
+            coll.set_edgecolor(item['edgecolors'])
+            coll.set_alpha(item['alpha'])
+            coll.set_label(item['label'])
+            restored['collections'].append(ax.add_collection(coll))
+            handles[item['label']] = restored['collections'][-1]
+        for text in axdesc['texts']:
+            ax.text(*text['position'], text['text'], color=text['color'], fontsize=text['fontsize'], ha=text['ha'], va=text['va'], 
+                    transform=COORDINATES[text['coordinates']](ax))
+        for item in axdesc['containers']:
+            artist = lambda ref: None if ref is None else restored[ref[0]][ref[1]]
+            container = ErrorbarContainer((artist(item['line']), tuple(artist(ref) for ref in item['caplines']), tuple(artist(ref) for ref in item['barlinecols'])),
+                                          has_xerr=item['xerr'], has_yerr=item['yerr'], label=item['label'])
+            handles[item['label']] = ax.add_container(container)
+        ax.set_xlim(axdesc['xlim'])
+        ax.set_ylim(axdesc['ylim'])
+        ax.set_title(axdesc['title'])
+        ax.set_xlabel(axdesc['xlabel'])
+        ax.set_ylabel(axdesc['ylabel'])
+        if axdesc['legend'] is not None:
+            legends.append((ax, axdesc['legend']))
+    for ax, (loc, labels) in legends:
+        ax.legend([handles[label] for label in labels if label in handles], [label for label in labels if label in handles], loc=loc)
+
+class FigureCache:
+    '''
+    On-disk cache of rendered figures with least-recently-used eviction
+
+    Parameters
+    ----------
+    directory : str
+        Cache directory
+    max_bytes : int
+        Total size of cached files above which the least recently used entries are removed
+    formats : tuple
+        Image formats saved next to each description
+
+    '''
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_BYTES, formats=('png', 'svg')):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.formats = formats
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, ext):
+        return os.path.join(self.directory, '{}.{}'.format(key, ext))
+
+    def get(self, key):
+        '''
+        Returns the figure description of a cache entry, or None if the plot is not cached. Marks the entry as recently used
+
+        '''
+        path = self.path(key, 'pkl')
+        try:
+            with open(path, 'rb') as f:
+                desc = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        os.utime(path)
+        return desc
+
+    def put(self, key, fig):
+        '''
+        Saves a figure under a cache key, then evicts least recently used entries if the cache is too large
+
+        '''
+        for ext in self.formats:
+            fig.savefig(self.path(key, ext))
+        tmp = self.path(key, 'pkl.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(describe_figure(fig), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path(key, 'pkl'))
+        self.evict()
+
+    def evict(self):
+        '''
+        Removes least recently used entries until the total size of the cache is below max_bytes
+
+        '''
+        entries = {}
+        for path in glob.glob(os.path.join(self.directory, '*.*')):
+            key = os.path.basename(path).split('.')[0]
+            size, used = entries.get(key, (0, 0))
+            stat = os.stat(path)
+            #Last use of an entry is the modification time of its description
+            entries[key] = (size + stat.st_size, max(used, stat.st_mtime) if path.endswith('.pkl') else used)
+        total = sum(size for size, used in entries.values())
+        for key, (size, used) in sorted(entries.items(), key=lambda entry: entry[1][1]):
+            if total <= self.max_bytes:
+                break
+            for path in glob.glob(os.path.join(self.directory, key + '.*')):
+                os.remove(path)
+            total -= size
+
+def cached_plot(cache, paths, plotfunc, args, window, params=None):
+    '''
+    Draws a plot into a window from the figure cache, or with the plot function if it is not cached yet
+
+    Parameters
+    ----------
+    cache : FigureCache
+        Figure cache
+    paths : list
+        Filepaths of the log files the plot is made from
+    plotfunc : function
+        Plot function, called as plotfunc(*args, window)
+    args : tuple or function
+        Arguments of plotfunc before window. If a function, it is called to get the arguments only when the plot is not cached
+    window : PlotWindow
+        Window containing MatPlotLib canvas which gets plotted to
+    params : dict, optional
+        Other parameters that change the plot, used in the cache key
+
+    Returns
+    -------
+    result :
+        Return of plotfunc, or None if the plot was restored from the cache
+
+    '''
+    key = cache_key(paths, plotfunc, params)
+    desc = cache.get(key)
+    if desc is not None:
+        restore_figure(desc, window.canvas.fig)
+        return None
+    result = plotfunc(*(args() if callable(args) else args), window)
+    cache.put(key, window.canvas.fig)
+    return result
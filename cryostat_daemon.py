@@ -0,0 +1,274 @@
+import os
+import time
+import sqlite3
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import cryostat_functions as cryo
+import cryostat_export as export
+import cryostat_quality
+from cryostat_run import Run
+
+
+'''
+
+Watch-folder ingest daemon
+Watches the directory where the cryostat PCs write 107 (or, with --cryostat 102, 102) logs and keeps a local summary store (SQLite) and
+columnar cache (see cryostat_export.py) up to date. A log is processed once its size and modification time
+have not changed for a settle time, so partially written files are not parsed
+
+Usage: python cryostat_daemon.py <log directory> [--store summaries.db] [--cache cache_dir] [--workers 2] [--cryostat 107]
+
+'''
+
+
+logger = logging.getLogger('cryostat_daemon')
+
+
+class SummaryStore:
+    '''
+    SQLite store of summary tables for every processed log file
+    Tables are 'temps' (temp_summary_combine()), 'holds' (hold_summary()), 'regens' (regen_summary()), the last two 
+    with the energy columns of phase_energy(), 'decay'
+    (hold_decay() fits and predicted hold times), 'coolwarm' (cooldown and warmup times), 'crossings' 
+    (coolwarm_run() threshold crossings), 'quality' (quality_summary() of the log) and 'quality_phases' (quality counts 
+    per phase); every row carries the filepath of its log in the 'Path' column
+    The 'files' table records the size and modification time each log had when it was processed
+
+    Parameters
+    ----------
+    path : str
+        Filepath of the SQLite database
+
+    '''
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS files (Path TEXT PRIMARY KEY, Size INTEGER, Mtime REAL, Run TEXT, Error TEXT)')
+        self.connection.commit()
+
+    def processed(self):
+        '''Dictionary of processed filepaths and their (size, mtime) when processed '''
+        return {path:(size, mtime) for path, size, mtime in self.connection.execute('SELECT Path, Size, Mtime FROM files')}
+
+    def tables(self):
+        return [name for (name,) in self.connection.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != 'files'")]
+
+    def upsert(self, path, size, mtime, run=None, tables=None, error=None):
+        '''
+        Replaces all rows of a log file in the store with new summary tables, in one transaction
+
+        Parameters
+        ----------
+        path : str
+            Filepath of the log
+        size, mtime :
+            Size and modification time of the log when it was processed
+        run : str, optional
+            Run label of the log
+        tables : dict, optional
+            Summary DataFrames keyed by table name
+        error : str, optional
+            Error message if the log could not be processed
+
+        Returns
+        -------
+        None.
+
+        '''
+        with self.connection:
+            for name in self.tables():
+                self.connection.execute('DELETE FROM "{}" WHERE Path = ?'.format(name), (path,))
+            existing = self.tables()
+            for name, table in (tables or {}).items():
+                if name in existing:
+                    #Stores written before a table gained columns (e.g. the energy columns of 'holds') get them added
+                    columns = [column for (_, column, *_) in self.connection.execute('PRAGMA table_info("{}")'.format(name))]
+                    for column in table.columns:
+                        if column not in columns:
+                            self.connection.execute('ALTER TABLE "{}" ADD COLUMN "{}"'.format(name, column))
+                table.to_sql(name, self.connection, if_exists='append', index=False)
+            self.connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)', (path, size, mtime, run, error))
+
+    def read(self, name, path=None):
+        '''
+        Reads a summary table, optionally only the rows of one log file
+
+        '''
+        if path is None:
+            return pd.read_sql('SELECT * FROM "{}"'.format(name), self.connection)
+        return pd.read_sql('SELECT * FROM "{}" WHERE Path = ?'.format(name), self.connection, params=(path,))
+
+def coolwarm_table(run):
+    #Cooldown and warmup times; coolwarm_time() returns a message instead of a number if there is no full cooldown or warmup
+    cooltime, warmtime = run.coolwarm_time()
+    return pd.DataFrame({'Phase':['cooldown','warmup'], 'Hours':[t if not isinstance(t, str) else None for t in (cooltime, warmtime)]})
+
+#Summary tables of the store, each computed from a Run
+TABLES = {'temps':lambda run: run.temp_summary_combine().astype(float).rename_axis('Date/Time').reset_index(),
+          'holds':lambda run: run.hold_summary(energy=True).astype(float).rename_axis('Date/Time').reset_index(),
+          'regens':lambda run: run.regen_summary(energy=True).astype(float).rename_axis('Regen').reset_index(),
+          'decay':lambda run: run.hold_decay().astype(float).rename_axis('Date/Time').reset_index(),
+          'crossings':lambda run: run.coolwarm_crossings(),
+          'coolwarm':coolwarm_table,
+          'quality':lambda run: pd.DataFrame([cryostat_quality.quality_summary(run.quality)]),
+          'quality_phases':lambda run: run.quality['phases'].rename_axis('Phase').reset_index()}
+
+def summarize_log(path, cache=None, cryostat=107):
+    '''
+    Loads, splits and summarizes one log file, and exports it to the columnar cache. Runs in a worker process
+    Each summary table is computed on its own, so a table that fails (e.g. 'holds' of a log without temperature holds)
+    does not keep the other tables of the log out of the store
+
+    Parameters
+    ----------
+    path : str
+        Filepath of a log
+    cache : str, optional
+        Root directory of the columnar cache. Not exported if None
+    cryostat : int
+        Cryostat model of the log (107 or 102)
+
+    Returns
+    -------
+    run : str
+        Run label of the log
+    tables : dict
+        Summary DataFrames keyed by table name, each with 'Path' and 'Run' columns
+    errors : dict
+        Error messages of the tables that failed, keyed by table name
+
+    '''
+    run = Run.from_file(path, cryostat=cryostat)
+    tables, errors = {}, {}
+    for name, table in TABLES.items():
+        try:
+            tables[name] = table(run)
+        except Exception as error:
+            errors[name] = str(error)
+    for table in tables.values():
+        table.insert(0, 'Run', run.label)
+        table.insert(0, 'Path', path)
+    #A changed log rewrites its run in the cache, unless the run is exported from another, larger log (see export_logs())
+    if cache is not None and not export.source_conflict(cache, export.run_name(run.log), path):
+        export.export_run(run, cache, holds=run.holds, source=path, overwrite=True)
+    return run.label, tables, errors
+
+class Watcher:
+    '''
+    Polls a log directory and processes new or changed logs on a small process pool
+    At most 'backlog' logs are in flight at once; further logs wait in a queue, so a burst of files does not overload the machine
+
+    Parameters
+    ----------
+    directory : str
+        Directory the cryostat PCs write logs to
+    store : SummaryStore
+        Summary store to upsert results into
+    cache : str, optional
+        Root directory of the columnar cache
+    workers : int
+        Number of worker processes
+    settle : float
+        Seconds a file's size and modification time must stay unchanged before it is processed
+    backlog : int, optional
+        Maximum number of logs in flight. Defaults to twice the number of workers
+    cryostat : int
+        Cryostat model of the logs in the directory (107 or 102)
+
+    '''
+    def __init__(self, directory, store, cache=None, workers=2, settle=30, backlog=None, cryostat=107):
+        self.directory = directory
+        self.store = store
+        self.cache = cache
+        self.cryostat = cryostat
+        self.settle = settle
+        self.backlog = backlog or 2 * workers
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.seen = {} #Filepath -> ((size, mtime), time first seen with that size and mtime)
+        self.queue = deque() #Settled logs waiting for a worker
+        self.inflight = {} #Future -> (filepath, size, mtime)
+
+    def scan(self):
+        '''Finds logs that are new or changed since they were processed and have settled, and queues them '''
+        now = time.time()
+        processed = self.store.processed()
+        queued = {path for path, size, mtime in self.queue} | {path for path, size, mtime in self.inflight.values()}
+        for path in cryo.log_files(self.directory):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            state = (stat.st_size, stat.st_mtime)
+            if state != self.seen.get(path, (None,))[0]:
+                #File is new or still being written: restart its settle time
+                self.seen[path] = (state, now)
+                continue
+            if now - self.seen[path][1] >= self.settle and processed.get(path) != state and path not in queued:
+                self.queue.append((path,) + state)
+
+    def submit(self):
+        '''Starts queued logs while fewer than backlog logs are in flight '''
+        while self.queue and len(self.inflight) < self.backlog:
+            path, size, mtime = self.queue.popleft()
+            self.inflight[self.executor.submit(summarize_log, path, self.cache, self.cryostat)] = (path, size, mtime)
+
+    def collect(self):
+        '''Upserts results of finished logs into the summary store '''
+        for future in [future for future in self.inflight if future.done()]:
+            path, size, mtime = self.inflight.pop(future)
+            try:
+                run, tables, errors = future.result()
+            except Exception as error:
+                logger.warning('Failed to process %s: %s', path, error)
+                self.store.upsert(path, size, mtime, error=str(error))
+            else:
+                #Tables that failed are recorded in the error of the log; the others are stored
+                error = '; '.join('{}: {}'.format(name, message) for name, message in errors.items()) or None
+                if error:
+                    logger.warning('Processed %s (%s) without some tables: %s', path, run, error)
+                else:
+                    logger.info('Processed %s (%s)', path, run)
+                self.store.upsert(path, size, mtime, run, tables, error)
+
+    def poll(self):
+        self.collect()
+        self.scan()
+        self.submit()
+
+    def run(self, interval=5, once=False):
+        '''
+        Polls the directory every interval seconds. With once=True, returns when every settled log is processed
+
+        '''
+        try:
+            while True:
+                self.poll()
+                settled = all(time.time() - t >= self.settle for state, t in self.seen.values())
+                if once and settled and not self.queue and not self.inflight:
+                    return
+                time.sleep(interval)
+        finally:
+            self.executor.shutdown()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Watch a directory of cryostat logs and keep summaries up to date')
+    parser.add_argument('directory', help='Directory the cryostat PCs write logs to')
+    parser.add_argument('--store', default='summaries.db', help='SQLite summary store (default: summaries.db)')
+    parser.add_argument('--cache', default=None, help='Root directory of the columnar cache (default: no export)')
+    parser.add_argument('--workers', type=int, default=2, help='Number of worker processes (default: 2)')
+    parser.add_argument('--interval', type=float, default=5, help='Seconds between directory scans (default: 5)')
+    parser.add_argument('--settle', type=float, default=30, help='Seconds a file must stay unchanged before it is processed (default: 30)')
+    parser.add_argument('--once', action='store_true', help='Process the current logs and exit')
+    parser.add_argument('--cryostat', type=int, default=107, choices=sorted(cryo.LOG_SCHEMAS), help='Cryostat model of the logs (default: 107)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    watcher = Watcher(args.directory, SummaryStore(args.store), args.cache, args.workers, args.settle, cryostat=args.cryostat)
+    watcher.run(args.interval, args.once)
+
+
+if __name__ == "__main__":
+    main()
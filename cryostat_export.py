@@ -0,0 +1,285 @@
+import os
+import glob
+import json
+import shutil
+
+import pandas as pd
+
+import cryostat_functions as cryo
+
+
+'''
+
+The functions below export split cryostat logs to a partitioned columnar dataset
+
+Dataset layout is <dest>/run=<run>/kind=<kind>/phase=<n>/part.<parquet|h5>, where kind is
+'log' (all phases), 'regen' (magnet cycles), 'reg' (temperature holds) or 'hold' (temperature holds after temp_hold())
+A run is complete once <dest>/run=<run>/_manifest.json exists. Partitions are not overwritten (unless export_run() is called
+with overwrite=True), so an interrupted export resumes where it stopped
+Each run is exported from one source log. export_logs() skips other logs of the same run (e.g. a second export of it)
+unless they are larger than the source, in which case they replace it
+
+'''
+
+
+#Partition kind and index into the return of split_log()
+KINDS = {'log':0, 'regen':1, 'reg':2}
+#File extension for each export format
+EXTENSIONS = {'parquet':'parquet', 'hdf5':'h5'}
+
+
+def run_name(log):
+    '''
+    Creates the run partition name of a log from its first timestamp
+
+    Parameters
+    ----------
+    log : DataFrame
+        Reformatted log or any phase log of it
+
+    Returns
+    -------
+    name : str
+        Run name, e.g. '20200601_103000'
+
+    '''
+    return pd.Timestamp(log.iloc[0,0]).strftime('%Y%m%d_%H%M%S')
+
+def typed_phase(phase):
+    '''
+    Casts a phase log to fixed column types: datetime64 'Date/Time', float64 channels and str 'Notes'
+
+    Parameters
+    ----------
+    phase : DataFrame
+        Phase log
+
+    Returns
+    -------
+    phase : DataFrame
+        Copy of the phase log with a default index and typed columns
+
+    '''
+    types = {column:'float64' for column in phase.columns if column not in ('Date/Time','Notes')}
+    types['Notes'] = 'str'
+    phase = phase.astype(types).reset_index(drop=True)
+    phase['Date/Time'] = pd.to_datetime(phase['Date/Time'])
+    return phase
+
+def write_partition(phase, path, fmt='parquet', compression=None):
+    '''
+    Writes one phase log to a partition file. The file is written under a temporary name and renamed when complete
+
+    Parameters
+    ----------
+    phase : DataFrame
+        Phase log
+    path : str
+        Partition filepath
+    fmt : str
+        'parquet' (needs pyarrow) or 'hdf5' (needs PyTables)
+    compression : str, optional
+        Parquet codec (default 'zstd') or HDF5 complib (default 'blosc:zstd')
+
+    Returns
+    -------
+    None.
+
+    '''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    if fmt == 'parquet':
+        phase.to_parquet(tmp, compression=compression or 'zstd', index=False)
+    elif fmt == 'hdf5':
+        phase.to_hdf(tmp, key='phase', mode='w', format='table', complib=compression or 'blosc:zstd', complevel=5, index=False)
+    else:
+        raise ValueError('Unknown export format: {}'.format(fmt))
+    os.replace(tmp, path)
+
+def export_run(logs, dest, holds=None, source=None, fmt='parquet', compression=None, overwrite=False):
+    '''
+    Exports all phases of a split log to the partitioned dataset
+    Existing partitions are kept unless overwrite is True, so the export can be resumed or rerun without rewriting data
+    Partitions of phases the split log does not have (e.g. from an earlier export of a changed log) are removed
+
+    Parameters
+    ----------
+    logs : tuple
+        Return of split_log(), split_107() or split_102()
+    dest : str
+        Dataset root directory
+    holds : dict, optional
+        Return of temp_hold() for this log. Computed from a copy of logs[2] if None
+    source : str, optional
+        Filepath of the log, recorded in the run manifest
+    fmt : str
+        'parquet' or 'hdf5'
+    compression : str, optional
+        Codec passed to write_partition()
+    overwrite : bool
+        Rewrite existing partitions (e.g. when the log has grown since it was exported)
+
+    Returns
+    -------
+    written : list
+        Filepaths of partitions written by this call
+
+    '''
+    if holds is None:
+        holds = cryo.temp_hold(dict(logs[2]))
+    run = run_name(logs[0]['log1'])
+    rundir = os.path.join(dest, 'run={}'.format(run))
+    phases = {kind:logs[index] for kind, index in KINDS.items()}
+    phases['hold'] = holds
+    written = []
+    counts = {}
+    for kind, files in phases.items():
+        counts[kind] = len(files)
+        numbers = set()
+        for key, phase in files.items():
+            #Phase number is the numeric suffix of the dictionary key (e.g. 'reg12' -> 12)
+            number = int(key.lstrip('abcdefghijklmnopqrstuvwxyz'))
+            numbers.add(number)
+            path = os.path.join(rundir, 'kind={}'.format(kind), 'phase={}'.format(number), 'part.{}'.format(EXTENSIONS[fmt]))
+            if overwrite or not os.path.exists(path):
+                write_partition(typed_phase(phase), path, fmt, compression)
+                written.append(path)
+        #Remove stale partitions of phases this log no longer has
+        for phasedir in glob.glob(os.path.join(rundir, 'kind={}'.format(kind), 'phase=*')):
+            if int(phasedir.rsplit('=', 1)[1]) not in numbers:
+                shutil.rmtree(phasedir)
+    #Manifest is written last and marks the run as complete
+    manifest = {'run':run, 'format':fmt, 'phases':counts}
+    if source is not None:
+        stat = os.stat(source)
+        manifest.update({'source':os.path.abspath(source), 'size':stat.st_size, 'mtime':stat.st_mtime})
+    tmp = os.path.join(rundir, '_manifest.json.{}.tmp'.format(os.getpid()))
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(rundir, '_manifest.json'))
+    return written
+
+def exported_sources(dest):
+    '''
+    Lists source logs of all completely exported runs in a dataset
+
+    Parameters
+    ----------
+    dest : str
+        Dataset root directory
+
+    Returns
+    -------
+    sources : dict
+        Keys are absolute source filepaths, values are (size, mtime) of the source when it was exported
+
+    '''
+    sources = {}
+    for path in glob.glob(os.path.join(dest, 'run=*', '_manifest.json')):
+        with open(path) as f:
+            manifest = json.load(f)
+        if 'source' in manifest:
+            sources[manifest['source']] = (manifest['size'], manifest['mtime'])
+    return sources
+
+def run_source(dest, run):
+    '''
+    Absolute filepath of the source log of a completely exported run, or None if the run is not exported
+
+    '''
+    try:
+        with open(os.path.join(dest, 'run={}'.format(run), '_manifest.json')) as f:
+            return json.load(f).get('source')
+    except (OSError, ValueError):
+        return None
+
+def source_conflict(dest, run, path):
+    '''
+    Checks whether a run is exported from a source log other than path that still exists and is at least as large as path,
+    in which case path (e.g. a second export of the run) is not exported so the two logs do not replace each other's partitions
+
+    '''
+    other = run_source(dest, run)
+    if other in (None, os.path.abspath(path)) or not os.path.exists(other):
+        return False
+    return os.path.getsize(other) >= os.path.getsize(path)
+
+def export_logs(loglist, dest, fmt='parquet', compression=None, cryostat=107):
+    '''
+    Exports multiple log files to the partitioned dataset, skipping logs that are already exported and unchanged
+    Logs that changed since they were exported are exported again with overwrite=True, replacing their partitions
+    A log of a run that is exported from another source log (e.g. a second export of the run) is skipped, unless the
+    other source no longer exists or is smaller, in which case the log replaces all of its partitions
+
+    Parameters
+    ----------
+    loglist : list
+        List of log filepaths
+    dest : str
+        Dataset root directory
+    fmt : str
+        'parquet' or 'hdf5'
+    compression : str, optional
+        Codec passed to write_partition()
+    cryostat : int
+        Cryostat model of the logs (107 or 102), passed to load_log() and split_log()
+
+    Returns
+    -------
+    exported : list
+        Filepaths of logs exported by this call
+
+    '''
+    done = exported_sources(dest)
+    exported = []
+    for path in loglist:
+        stat = os.stat(path)
+        previous = done.get(os.path.abspath(path))
+        if previous == (stat.st_size, stat.st_mtime):
+            continue
+        #Only the first row is parsed to find the run
+        run = run_name(cryo.load_log(path, cryostat, rows=(0,1)))
+        if source_conflict(dest, run, path):
+            continue
+        #A run exported from this or a replaced source log is rewritten entirely
+        logs = cryo.split_log(cryo.load_log(path, cryostat), cryostat=cryostat)
+        export_run(logs, dest, source=path, fmt=fmt, compression=compression, overwrite=run_source(dest, run) is not None)
+        exported.append(path)
+    return exported
+
+def read_phase(dest, kind, phase, runs=None, columns=None):
+    '''
+    Reads the same phase from every exported run (e.g. the third temperature hold across 50 runs)
+
+    Parameters
+    ----------
+    dest : str
+        Dataset root directory
+    kind : str
+        'log', 'regen', 'reg' or 'hold'
+    phase : int
+        Phase number (e.g. 3 for 'reg3')
+    runs : list, optional
+        Run names to read. All runs are read if None
+    columns : list, optional
+        Columns to read. All columns are read if None
+
+    Returns
+    -------
+    phases : dict
+        Keys are run names, values are phase logs
+
+    '''
+    phases = {}
+    pattern = os.path.join(dest, 'run=*', 'kind={}'.format(kind), 'phase={}'.format(phase), 'part.*')
+    for path in sorted(glob.glob(pattern)):
+        if path.endswith('.tmp'):
+            continue
+        run = path.split('run=')[-1].split(os.sep)[0]
+        if runs is not None and run not in runs:
+            continue
+        if path.endswith('.parquet'):
+            phases[run] = pd.read_parquet(path, columns=columns)
+        else:
+            phases[run] = pd.read_hdf(path, key='phase', columns=columns)
+    return phases
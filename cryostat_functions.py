@@ -1,6 +1,18 @@
+import io
+import os
+import json
+import gzip
+import hashlib
+import functools
+import lzma
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 from scipy import stats
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import pandas as pd
 
 
@@ -11,41 +23,222 @@ The functions below load, reformat, split, revise, and sort cryostat log files
 '''
 
 
-def load_107(filepath):
+#Log file extensions read by open_log(). Compressed logs are decompressed while they are parsed
+LOG_EXTENSIONS = ('.csv', '.csv.gz', '.csv.xz', '.csv.zst')
+#Directory of the chunk indexes of chunk_index()
+INDEX_DIR = os.path.join(os.path.expanduser('~'), '.cryostat_cache', 'indexes')
+#Thresholds of the validity rules of split_107(), temp_hold() and sort_reg() 
+#Pass a changed copy as the rules argument of these functions, or re-evaluate many rule sets quickly with RuleSweep
+SEGMENT_RULES = {'regen_current':15, #Magnet cycle is kept if the current reaches above this (A)
+                 'regen_min_hours':3, 'regen_max_hours':5, #and the cycle lasts between these (hours)
+                 'reg_min_current':0.1, 'reg_max_current':2, #Temperature hold is kept if the current is not all below min and never above max (A)
+                 'magnet_on_current':0.085, #Magnet is on above this current (A); temp_hold() removes the other rows
+                 'poor_hold_current':0.3} #Temperature hold is poor if the current is always below this (A)
+#Layout of the logs of each cryostat model, used by load_log(), phase_bounds() and the summaries:
+#raw columns read and their order and names in the reformatted log, number of header and unit rows, the column of each
+#temperature stage, the Notes events that start magnet cycles and temperature holds, and the validity rules
+#Columns the models share (e.g. 'Magnet Current', 'Notes') have the same names, so functions address them by name for either model
+LOG_SCHEMAS = {107:{'usecols':[0,1,2,3,5,7,8,9,12,13,18], 'header_rows':3, 'column_order':[0,2,3,4,6,7,5,10,8,9,1],
+                    'columns':['Date/Time','Hours after Start','50 mK FAA','He-3','3K Stage Diode','Magnet Diode','50K Stage Diode','Temperature Setpoint','Magnet Current','Magnet Voltage','Notes'],
+                    'recalculate_hours':False,
+                    'stages':{'50 mK':'50 mK FAA', 'He-3':'He-3', '3 K':'3K Stage Diode', '50 K':'50K Stage Diode'},
+                    'regen_events':('Start Mag Cycle',), 'reg_events':('Mag Cycle complete','Mag Cycle Canceled'),
+                    'rules':SEGMENT_RULES},
+               102:{'usecols':[0,1,2,3,5,8,10,11,12,13,15], 'header_rows':1, 'column_order':[0,1,6,10,8,9,7,5,4,3,2],
+                    'columns':['Date/Time','Hours after Start','50 mK FAA','ADR 1K','3K Stage Diode','Magnet Diode','60K Stage Diode','Temperature Setpoint','Magnet Current','Magnet Voltage','Notes'],
+                    'recalculate_hours':True,
+                    'stages':{'50 mK':'50 mK FAA', '1 K':'ADR 1K', '3 K':'Magnet Diode', '60 K':'60K Stage Diode'},
+                    'regen_events':('Start Mag Cycle',), 'reg_events':('Mag Cycle complete','Mag Cycle Canceled'),
+                    'rules':SEGMENT_RULES}}
+
+
+class StreamingDecompressor(io.RawIOBase):
+    '''
+    Read-only file object that decompresses a compressed log in a background thread 
+    Decompressed chunks are passed through a bounded queue, so decompression overlaps with parsing without 
+    holding the whole decompressed log in memory 
+
+    Parameters
+    ----------
+    stream : file object
+        Decompressing reader (e.g. gzip.open(path, 'rb'))
+    chunksize : int
+        Size of decompressed chunks in bytes
+    depth : int
+        Maximum number of decompressed chunks waiting to be parsed
+
+    '''
+    def __init__(self, stream, chunksize=2**22, depth=4):
+        super(StreamingDecompressor, self).__init__()
+        self.stream = stream
+        self.chunksize = chunksize
+        self.chunks = queue.Queue(maxsize=depth)
+        self.buffer = b''
+        self.stopped = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self.decompress, daemon=True)
+        self.thread.start()
+
+    def decompress(self):
+        try:
+            while not self.stopped.is_set():
+                chunk = self.stream.read(self.chunksize)
+                self.put(chunk)
+                if not chunk:
+                    break
+        except Exception as error:
+            self.error = error
+            self.put(b'')
+        finally:
+            self.stream.close()
+
+    def put(self, chunk):
+        #Wait for room in the queue, but give up if the reader is closed early (e.g. only the first rows were read)
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.buffer:
+            chunk = self.chunks.get()
+            if not chunk:
+                #Put the end marker back so later reads also see the end of the file 
+                self.chunks.put(b'')
+                if self.error is not None:
+                    raise self.error
+                return 0
+            self.buffer = chunk
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+    def close(self):
+        self.stopped.set()
+        super(StreamingDecompressor, self).close()
+
+def open_log(filepath):
     '''
-    Loads and reformats relevant columns of a 107 log 
+    Opens a plain or compressed (.gz, .xz, .zst) log file for reading 
+    Compressed logs are decompressed in a background thread while pandas parses them; .zst needs the zstandard package
 
     Parameters
     ----------
     filepath : str
-        Filepath of individual, complete 107 log 
+        Filepath of a log file
 
     Returns
     -------
-    log_107 : DataFrame
-        Loaded, reformatted 107 log
+    f : file object
+        Binary file object. Use as a context manager, e.g. with open_log(path) as f: pd.read_csv(f) 
+
+    '''
+    path = str(filepath)
+    if path.endswith('.gz'):
+        stream = gzip.open(path, 'rb')
+    elif path.endswith('.xz'):
+        stream = lzma.open(path, 'rb')
+    elif path.endswith('.zst'):
+        import zstandard
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+    else:
+        return open(path, 'rb')
+    return io.BufferedReader(StreamingDecompressor(stream), buffer_size=2**20)
+
+def log_files(directory):
+    '''
+    Lists plain and compressed log files in a directory
+
+    Parameters
+    ----------
+    directory : str
+        Directory of log files
+
+    Returns
+    -------
+    paths : list
+        Sorted filepaths of files ending with one of LOG_EXTENSIONS
+
+    '''
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(LOG_EXTENSIONS))
+
+def load_log(filepath, cryostat=107, rows=None):
+    '''
+    Loads and reformats the relevant columns of a log of either cryostat model, as described by LOG_SCHEMAS
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of individual, complete log. May be compressed (see open_log())
+    cryostat : int
+        Cryostat model (107 or 102)
+    rows : tuple, optional
+        (first row, row after the last row) to load, e.g. a row range from segment_index(). Rows before the range are 
+        skipped without being parsed and the index keeps the row numbers of the entire log. The entire log is loaded if None
+
+    Returns
+    -------
+    log : DataFrame
+        Loaded, reformatted log, with the columns of LOG_SCHEMAS[cryostat]['columns']
 
     '''
-    #Load relevant columns 107 log
+    schema = LOG_SCHEMAS[cryostat]
+    #Load relevant columns of log
     log_filepath = r'{}'.format(filepath)
-    log_107 = pd.read_csv(log_filepath, usecols = [0,1,2,3,5,7,8,9,12,13,18], skiprows = [1,2], na_filter=False)
+    with open_log(log_filepath) as f:
+        if rows is None:
+            log = pd.read_csv(f, usecols = schema['usecols'], skiprows = list(range(1, schema['header_rows'])), na_filter=False)
+        else:
+            #Skip the header, any unit rows and the rows before the range
+            for line in range(rows[0]+schema['header_rows']):
+                f.readline()
+            log = pd.read_csv(f, usecols = schema['usecols'], header = None, nrows = rows[1]-rows[0], na_filter=False)
+            log.index = range(rows[0], rows[0]+len(log))
     #Reorder and rename columns
-    column_order = [0,2,3,4,6,7,5,10,8,9,1]
-    column_names = ['Date/Time','Hours after Start','50 mK FAA','He-3','3K Stage Diode','Magnet Diode','50K Stage Diode','Temperature Setpoint','Magnet Current','Magnet Voltage','Notes']
-    log_107 = log_107[[log_107.columns[i] for i in column_order]]
-    log_107.columns = column_names 
+    log = log[[log.columns[i] for i in schema['column_order']]]
+    log.columns = schema['columns']
     #Convert type of "Date/Time" column from string to datetime 
-    log_107['Date/Time'] = pd.to_datetime(log_107['Date/Time'], infer_datetime_format=True)
-    return log_107
+    log['Date/Time'] = pd.to_datetime(log['Date/Time'], infer_datetime_format=True)
+    if schema['recalculate_hours']:
+        #Recalculate "Hours after Start" column from "Date/Time" column
+        log["Hours after Start"] = (log['Date/Time']-log['Date/Time'].iloc[0]).dt.total_seconds()/3600
+    return log
+
+def load_107(filepath, rows=None):
+    '''
+    Loads and reformats relevant columns of a 107 log. Same as load_log(filepath, 107, rows)
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of individual, complete 107 log. May be compressed (see open_log())
+    rows : tuple, optional
+        Row range to load (see load_log()). The entire log is loaded if None
+
+    Returns
+    -------
+    log_107 : DataFrame
+        Loaded, reformatted 107 log
+
+    '''
+    return load_log(filepath, 107, rows)
 
-def load_102(filepath):
+def load_102(filepath, rows=None):
     '''
-    Loads and reformats relevant columns of a 102 log 
+    Loads and reformats relevant columns of a 102 log. Same as load_log(filepath, 102, rows)
 
     Parameters
     ----------
     filepath : str
-        Filepath of individual, complete 102 log 
+        Filepath of individual, complete 102 log. May be compressed (see open_log())
+    rows : tuple, optional
+        Row range to load (see load_log()). The entire log is loaded if None
 
     Returns
     -------
@@ -53,29 +246,104 @@ def load_102(filepath):
         Loaded, reformatted 102 log
 
     '''
-    #Load relevant columns of 102 log
-    log_filepath = r'{}'.format(filepath) 
-    log_102=pd.read_csv(log_filepath, usecols = [0,1,2,3,5,8,10,11,12,13,15], na_filter=False)
-    #Reorder and rename columns
-    column_order = [0,1,6,10,8,9,7,5,4,3,2]
-    column_names = ['Date/Time','Hours after Start','50 mK FAA','ADR 1K', '3K Stage Diode','Magnet Diode','60K Stage Diode','Temperature Setpoint','Magnet Current','Magnet Voltage','Notes']
-    log_102 = log_102[[log_102.columns[i] for i in column_order]]
-    log_102.columns = column_names 
-    #Convert type of "Date/Time" column from string to datetime 
-    log_102['Date/Time'] = pd.to_datetime(log_102['Date/Time'], infer_datetime_format=True)
-    #Recalculate "Hours after Start" column from "Date/Time" column
-    log_102["Hours after Start"] = (log_102['Date/Time']-log_102.iloc[0,0]).dt.total_seconds()/3600
-    return log_102
+    return load_log(filepath, 102, rows)
+
+def log_model(log):
+    '''
+    Cryostat model (107 or 102) of a reformatted log, from its column names 
+
+    '''
+    columns = set(log.columns)
+    for cryostat, schema in LOG_SCHEMAS.items():
+        if set(schema['stages'].values()) <= columns:
+            return cryostat
+    return 107
+
+def notes_events(notes, events):
+    '''
+    Boolean array, True for each row whose Notes contain any of the event strings (e.g. LOG_SCHEMAS[107]['regen_events'])
+
+    '''
+    notes = notes.astype(str)
+    found = np.zeros(len(notes), dtype=bool)
+    for event in events:
+        found |= notes.str.contains(event, regex=False).to_numpy(dtype=bool)
+    return found
+
+def phase_bounds(log, rules=None, cryostat=None):
+    '''
+    Finds the row ranges of the phases of a reformatted log, as split by split_log()
+    Regen phases are kept if the magnet turns on and the cycle lasts 3 to 5 hours; reg phases are kept if the magnet current is reasonable
+    The checks of all phases are made at once from cumulative counts over the "Magnet Current" column
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted log. Return of load_log(), load_107() or load_102()
+    rules : dict, optional
+        Thresholds of the rules (see SEGMENT_RULES). Defaults to the rules of the cryostat's schema
+    cryostat : int, optional
+        Cryostat model (107 or 102), for the event strings of LOG_SCHEMAS. Found from the columns of the log if None
+
+    Returns
+    -------
+    logbounds : dict
+        Keys are 'log1','log2','log3',... as in split_log(). Values are (first row, row after the last row) of the phase in the log
+    regenbounds : dict
+        Keys are 'regen1','regen2','regen3',... as in split_log(). Values are row ranges as above
+    regbounds : dict
+        Keys are 'reg1','reg2','reg3',... as in split_log(). Values are row ranges as above
+
+    '''
+    schema = LOG_SCHEMAS[log_model(log) if cryostat is None else cryostat]
+    rules = schema['rules'] if rules is None else rules
+    #Determine ADR cycle start and completion via Notes column
+    regen_booleans = notes_events(log['Notes'], schema['regen_events'])
+    reg_booleans = notes_events(log['Notes'], schema['reg_events'])
+    all_booleans = regen_booleans | reg_booleans
+    all_booleans[[0,-1]] = True
+    #Rows where run starts, run completes, ADR cycle starts, and ADR cycle completes
+    all_rows = np.flatnonzero(all_booleans)
+    logbounds = {'log{}'.format(x+1):(int(start),int(end)) for x,(start,end) in enumerate(zip(all_rows[:-1], all_rows[1:]))}
+    
+    #Cumulative counts of rows above and below the current thresholds, so each check is a difference of two counts
+    current = log['Magnet Current'].to_numpy(dtype=float)
+    counts = lambda booleans: np.concatenate([[0], np.cumsum(booleans)])
+    seconds = (log['Date/Time'].to_numpy() - log['Date/Time'].to_numpy()[0])/np.timedelta64(1, 's')
+    
+    def following(booleans):
+        #Rows where phases of one kind start, and the next boundary after each (the last row has no phase after it)
+        starts = np.flatnonzero(booleans[:-1])
+        return starts, all_rows[np.searchsorted(all_rows, starts, side='right')]
+    
+    #Check if magnet turns on (current reaches above 15 A) and if magnet cycle lasts appropriate length of time (between 3 to 5 hours)
+    starts, ends = following(regen_booleans)
+    above = counts(current>rules['regen_current'])
+    hours = (seconds[ends]-seconds[starts])/3600
+    kept = (above[ends]-above[starts] > 0) & (rules['regen_min_hours']<hours) & (hours<rules['regen_max_hours'])
+    regenbounds = {'regen{}'.format(x+1):(int(start),int(end)) for x,(start,end) in enumerate(zip(starts[kept], ends[kept]))}
+    
+    #Check if magnet current is reasonable (above 0.1 A and below 2 A)
+    starts, ends = following(reg_booleans)
+    below, above = counts(current<rules['reg_min_current']), counts(current>rules['reg_max_current'])
+    kept = (below[ends]-below[starts] < ends-starts) & (above[ends]-above[starts] == 0)
+    regbounds = {'reg{}'.format(x+1):(int(start),int(end)) for x,(start,end) in enumerate(zip(starts[kept], ends[kept]))}
+    
+    return (logbounds,regenbounds,regbounds)
 
-def split_107(log):
+def split_log(log, rules=None, cryostat=None):
     '''
-    Splits a reformatted 107 log into separate logs for separate phases (i.e. cooldown, regen, reg, and warmup phases)
+    Splits a reformatted log of either cryostat model into separate logs for separate phases (i.e. cooldown, regen, reg, and warmup phases)
     Stores separated logs into 3 dictionaries
     
     Parameters
     ----------
     log : DataFrame
-        Entire, reformatted 107 log. Return of load_107(). 
+        Entire, reformatted log. Return of load_log(), load_107() or load_102()
+    rules : dict, optional
+        Thresholds of the validity rules (see SEGMENT_RULES). Defaults to the rules of the cryostat's schema
+    cryostat : int, optional
+        Cryostat model (107 or 102). Found from the columns of the log if None
 
     Returns
     -------
@@ -93,63 +361,137 @@ def split_107(log):
         Logs are reformatted: index and 'Hours from Start' start at 0 for each phase
         Logs are sorted: if the magnet current is too small/large, it is excluded from this dictionary
     '''
-    #Create a dictionary storing logs of all phases 
-    
-    #Determine ADR cycle start and completion via Notes column
-    all_booleans = log['Notes'].map(lambda x:'Start Mag Cycle' in x or 'Mag Cycle complete' in x or 'Mag Cycle Canceled' in x).to_list() 
-    all_booleans[0] = True
-    all_booleans[-1] = True
-    #Create list of indicies where run starts, run completes, ADR cycle starts, and ADR cycle completes
-    all_indicies = log.index[all_booleans].to_list() 
-    logs = {} #Initialize dictionary 
-    for x in range(len(all_indicies)-1):
-        #Add each log to dictionary 
-        logs['log{}'.format(x+1)]=log.iloc[all_indicies[x]:all_indicies[x+1],:] 
+    #Row ranges of all phases and of the regen and reg phases that pass the checks
+    logbounds, regenbounds, regbounds = phase_bounds(log, rules, cryostat)
     
+    #Create a dictionary storing logs of all phases 
+    logs = {key:log.iloc[start:end,:] for key,(start,end) in logbounds.items()}
     
     #Create a dictionary storing regen logs
-    
-    #Determine ADR cycle start via Notes column
-    regen_booleans = log['Notes'].map(lambda x:'Start Mag Cycle' in x).to_list() 
-    #Create list of indicies where ADR cycle starts
-    regen_indicies = log.index[regen_booleans].to_list() 
     regenfiles = {} #Initialize dictionary 
-    regen_count = 0 #Counter variable for naming dictionary keys 
-    for x in range(len(regen_indicies)):
-        #Check if magnet turns on (current reaches above 15 A) and if magnet cycle lasts appropriate length of time (between 3 to 5 hours)
-        if log.iloc[regen_indicies[x]:all_indicies[all_indicies.index(regen_indicies[x])+1],8].map(lambda x:x>15).any() and \
-        3<((log.iloc[all_indicies[all_indicies.index(regen_indicies[x])+1],0]-log.iloc[regen_indicies[x],0]).total_seconds()/3600)<5:
-            regen_count += 1 
-            #Add regen log to dictionary and reset index 
-            regenfiles['regen{}'.format(regen_count)]=log.iloc[regen_indicies[x]:all_indicies[all_indicies.index(regen_indicies[x])+1],:].reset_index(drop=True) 
-            #Reset "Hours from Start" column 
-            regenfiles['regen{}'.format(regen_count)]["Hours after Start"] = (regenfiles['regen{}'.format(regen_count)]['Date/Time']-regenfiles['regen{}'.format(regen_count)].iloc[0,0]).dt.total_seconds()/3600 
-    
+    for key,(start,end) in regenbounds.items():
+        #Add regen log to dictionary and reset index 
+        regenfiles[key] = log.iloc[start:end,:].reset_index(drop=True) 
+        #Reset "Hours from Start" column 
+        regenfiles[key]["Hours after Start"] = (regenfiles[key]['Date/Time']-regenfiles[key]['Date/Time'].iloc[0]).dt.total_seconds()/3600 
     
     #Create a dictionary storing reg logs
-    
-    #Determine ADR cycle completion via Notes column
-    reg_booleans = log['Notes'].map(lambda x:'Mag Cycle complete' in x or 'Mag Cycle Canceled' in x).to_list() 
-    #Create list of indicies where ADR cycle completes
-    reg_indicies = log.index[reg_booleans].to_list() 
     regfiles = {} #Initialize dictionary 
-    reg_count = 0 #Counter variable for naming dictionary keys 
-    for x in range(len(reg_indicies)):
-        #Check if magnet current is reasonable (above 0.1 A and below 2 A)
-        if not log.iloc[reg_indicies[x]:all_indicies[all_indicies.index(reg_indicies[x])+1],8].map(lambda x:x<0.1).all() and \
-        not log.iloc[reg_indicies[x]:all_indicies[all_indicies.index(reg_indicies[x])+1],8].map(lambda x:x>2).any():
-            reg_count += 1 
-            #Add reg log to dictionary and reset index
-            regfiles['reg{}'.format(reg_count)]=log.iloc[reg_indicies[x]:all_indicies[all_indicies.index(reg_indicies[x])+1],:].reset_index(drop=True) 
-            #Reset "Hours from Start" column 
-            regfiles['reg{}'.format(reg_count)]["Hours after Start"] = (regfiles['reg{}'.format(reg_count)]['Date/Time']-regfiles['reg{}'.format(reg_count)].iloc[0,0]).dt.total_seconds()/3600 
-            #Replace 0 values in "50 mK FAA" column with NaN 
-            regfiles['reg{}'.format(reg_count)]['50 mK FAA'].replace(0,np.nan,inplace=True) 
+    for key,(start,end) in regbounds.items():
+        #Add reg log to dictionary and reset index
+        regfiles[key] = log.iloc[start:end,:].reset_index(drop=True) 
+        #Reset "Hours from Start" column 
+        regfiles[key]["Hours after Start"] = (regfiles[key]['Date/Time']-regfiles[key]['Date/Time'].iloc[0]).dt.total_seconds()/3600 
+        #Replace 0 values in "50 mK FAA" column with NaN 
+        regfiles[key]['50 mK FAA'].replace(0,np.nan,inplace=True) 
     
     
     return (logs,regenfiles,regfiles)
 
-def temp_hold(regfiles):
+def split_107(log, rules=None):
+    '''
+    Splits a reformatted 107 log into separate logs for separate phases. Same as split_log(log, rules, 107)
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted 107 log. Return of load_107(). 
+    rules : dict, optional
+        Thresholds of the validity rules (see SEGMENT_RULES). Defaults to SEGMENT_RULES
+
+    Returns
+    -------
+    logs, regenfiles, regfiles : dict
+        As returned by split_log()
+
+    '''
+    return split_log(log, rules, 107)
+
+def split_102(log, rules=None):
+    '''
+    Splits a reformatted 102 log into separate logs for separate phases. Same as split_log(log, rules, 102)
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted 102 log. Return of load_102(). 
+    rules : dict, optional
+        Thresholds of the validity rules (see SEGMENT_RULES). Defaults to SEGMENT_RULES
+
+    Returns
+    -------
+    logs, regenfiles, regfiles : dict
+        As returned by split_log()
+
+    '''
+    return split_log(log, rules, 102)
+
+def phase_executor(workers=None):
+    '''
+    Creates a thread pool for the per-phase work of temp_hold(), temp_summary(), hold_summary() and regen_summary()
+    NumPy and pandas release the GIL for most of this work, so phases of one large log are processed in parallel
+
+    Parameters
+    ----------
+    workers : int, optional
+        Number of worker threads. Defaults to the number of CPUs
+
+    Returns
+    -------
+    executor : ThreadPoolExecutor
+        Pass as the executor argument of the functions above; use as a context manager to shut it down 
+
+    '''
+    return ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+
+def phase_map(func, phases, executor=None):
+    '''
+    Applies a function to every phase log, serially or on an executor. Results are in the order of the phases either way 
+
+    Parameters
+    ----------
+    func : function
+        Function of one phase log
+    phases : iterable
+        Phase logs (e.g. regfiles.values())
+    executor : Executor, optional
+        Executor to run func on (e.g. return of phase_executor()). Runs serially if None
+
+    Returns
+    -------
+    results : list
+        Return of func for each phase log 
+
+    '''
+    if executor is None:
+        return [func(phase) for phase in phases]
+    return list(executor.map(func, phases))
+
+def magnet_on(reg, rules=None):
+    '''
+    Removes the portion of one temperature hold log where the magnet is off. Used by temp_hold()
+
+    Parameters
+    ----------
+    reg : DataFrame
+        Temperature hold phase log
+    rules : dict, optional
+        Thresholds of the validity rules (see SEGMENT_RULES). Defaults to SEGMENT_RULES
+
+    Returns
+    -------
+    reg : DataFrame
+        Revised temperature hold phase log, with index and "Hours after Start" starting at 0 
+
+    '''
+    #Remove parts of temperature regulation phase log where magnet is off
+    reg = reg.loc[reg['Magnet Current']>(SEGMENT_RULES if rules is None else rules)['magnet_on_current']]
+    #Reset index and "Hours after Start" to start at 0 
+    reg.reset_index(drop=True, inplace = True)
+    reg["Hours after Start"] = (reg['Date/Time']-reg['Date/Time'].iloc[0]).dt.total_seconds()/3600
+    return reg
+
+def temp_hold(regfiles, executor=None, rules=None):
     '''
     Removes portions of temperature hold logs where the magnet is off (i.e. current is less than 0.085 A)
     E.g. if a temperature hold log includes a warmup, the warmup is removed 
@@ -158,6 +500,10 @@ def temp_hold(regfiles):
     ----------
     regfiles : dict
         Dictionary of all temperature hold phase logs. Return of split_107(). 
+    executor : Executor, optional
+        Executor to process the phases on (see phase_executor()). Processed serially if None
+    rules : dict, optional
+        Thresholds of the validity rules (see SEGMENT_RULES). Defaults to SEGMENT_RULES
 
     Returns
     -------
@@ -165,15 +511,11 @@ def temp_hold(regfiles):
         Dictionary of revised temperature regulation phase logs.
 
     '''
-    for key,reg in regfiles.items():
-        #Remove parts of temperature regulation phase logs where magnet is off
-        regfiles[key] = reg.loc[reg['Magnet Current']>0.085]
-        #Reset index and "Hours after Start" to start at 0 
-        regfiles[key].reset_index(drop=True, inplace = True)
-        regfiles[key]["Hours after Start"] = (regfiles[key]['Date/Time']-regfiles[key].iloc[0,0]).dt.total_seconds()/3600
+    for key,reg in zip(list(regfiles.keys()), phase_map(lambda reg: magnet_on(reg, rules), list(regfiles.values()), executor)):
+        regfiles[key] = reg
     return regfiles
 
-def sort_reg(regfiles):
+def sort_reg(regfiles, rules=None):
     '''
     Separates 5 hour holds from 25 hour holds in June 2020 107 log
 
@@ -181,6 +523,8 @@ def sort_reg(regfiles):
     ----------
     regfiles : dict
         Dictionary containing all temperature hold logs
+    rules : dict, optional
+        Thresholds of the validity rules (see SEGMENT_RULES). Defaults to SEGMENT_RULES
 
     Returns
     -------
@@ -190,12 +534,625 @@ def sort_reg(regfiles):
         Dictionary containing temperature hold logs where maximum magnet current is above 0.3 A
 
     '''
-    poor_holds = {k:v for k,v in regfiles.items() if v['Magnet Current'].map(lambda x:x<0.3).all()}
-    holds = {k:v for k,v in regfiles.items() if v['Magnet Current'].map(lambda x:x>0.3).any()}
+    poor = (SEGMENT_RULES if rules is None else rules)['poor_hold_current']
+    poor_holds = {k:v for k,v in regfiles.items() if v['Magnet Current'].map(lambda x:x<poor).all()}
+    holds = {k:v for k,v in regfiles.items() if v['Magnet Current'].map(lambda x:x>poor).any()}
     for new,old in zip(range(1,4),range(10,13)):
         holds['reg{}'.format(new)] = holds.pop('reg{}'.format(old))
     return (poor_holds,holds)
 
+class RuleSweep:
+    '''
+    Re-evaluates the validity rules of split_107(), temp_hold() and sort_reg() for other thresholds without re-splitting the log
+    The log is reduced once to the phases between Notes events (first and end row, kind, length and maximum magnet current)
+    and its time and current arrays are kept, so evaluating a rule set takes a few array comparisons
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted log. Return of load_log(), load_107() or load_102()
+    cryostat : int, optional
+        Cryostat model (107 or 102), for the event strings of LOG_SCHEMAS. Found from the columns of the log if None
+
+    Examples
+    --------
+    >>> sweep = RuleSweep(load_107(path))
+    >>> sweep.sweep('magnet_on_current', np.linspace(0.05, 0.2, 16))
+
+    '''
+    def __init__(self, log, cryostat=None):
+        schema = LOG_SCHEMAS[log_model(log) if cryostat is None else cryostat]
+        #Phase boundaries as in phase_bounds()
+        regen = notes_events(log['Notes'], schema['regen_events'])
+        reg = notes_events(log['Notes'], schema['reg_events'])
+        boundaries = regen | reg
+        boundaries[0] = True
+        boundaries[-1] = True
+        rows = np.flatnonzero(boundaries)
+        self.seconds = (log['Date/Time'].to_numpy() - log['Date/Time'].to_numpy()[0]) / np.timedelta64(1, 's')
+        self.current = log['Magnet Current'].to_numpy(dtype=float)
+        self.starts, self.ends = rows[:-1], rows[1:]
+        self.regen, self.reg = regen[self.starts], reg[self.starts]
+        #Per-phase reductions: length to the next boundary (hours) and maximum current (NaN counts as no current)
+        #The maximum is taken over rows start to end-1, as split by phase_bounds(), with reduceat over interleaved 
+        #(start, end) indices as in segment_energy(); every second result is the boundary row between phases
+        self.hours = (self.seconds[self.ends] - self.seconds[self.starts]) / 3600
+        current = np.where(np.isnan(self.current), -np.inf, self.current)
+        self.maxcurrent = np.fmax.reduceat(current, np.column_stack([self.starts, self.ends]).ravel())[::2]
+
+    def bounds(self, rules=None):
+        '''
+        Row ranges of the regen and reg phases kept under a rule set, as returned by phase_bounds()
+
+        Parameters
+        ----------
+        rules : dict, optional
+            Thresholds (see SEGMENT_RULES). Missing thresholds default to SEGMENT_RULES
+
+        Returns
+        -------
+        regenbounds, regbounds : dict
+            Keys are 'regen1',... and 'reg1',..., values are (first row, row after the last row)
+
+        '''
+        rules = dict(SEGMENT_RULES, **(rules or {}))
+        regen = self.regen & (self.maxcurrent > rules['regen_current']) & (self.hours > rules['regen_min_hours']) & (self.hours < rules['regen_max_hours'])
+        reg = self.reg & (self.maxcurrent >= rules['reg_min_current']) & (self.maxcurrent <= rules['reg_max_current'])
+        regenbounds = {'regen{}'.format(n+1):(int(self.starts[i]),int(self.ends[i])) for n,i in enumerate(np.flatnonzero(regen))}
+        regbounds = {'reg{}'.format(n+1):(int(self.starts[i]),int(self.ends[i])) for n,i in enumerate(np.flatnonzero(reg))}
+        return (regenbounds, regbounds)
+
+    def holds(self, rules=None):
+        '''
+        Temperature holds kept under a rule set, after temp_hold(), with their hold time and maximum current as in hold_summary()
+
+        Parameters
+        ----------
+        rules : dict, optional
+            Thresholds (see SEGMENT_RULES). Missing thresholds default to SEGMENT_RULES
+
+        Returns
+        -------
+        holds : DataFrame
+            Index is the key of the hold ('reg1',...). Columns are 'Start' and 'End' (rows of the reg phase), 
+            'Hold Time' (hours from maximum current to the last row where the magnet is on), 'Max Current' and 'Poor' (see sort_reg())
+
+        '''
+        rules = dict(SEGMENT_RULES, **(rules or {}))
+        regbounds = self.bounds(rules)[1]
+        qtys = []
+        for key,(start,end) in regbounds.items():
+            current = self.current[start:end]
+            on = np.flatnonzero(current > rules['magnet_on_current'])
+            if len(on) == 0:
+                qtys.append([start, end, np.nan, np.nan, True])
+                continue
+            peak = on[np.argmax(current[on])]
+            maxcurrent = current[peak]
+            qtys.append([start, end, (self.seconds[start+on[-1]] - self.seconds[start+peak]) / 3600, maxcurrent, 
+                         not (current[on] > rules['poor_hold_current']).any()])
+        holds = pd.DataFrame(qtys, index=list(regbounds), columns=['Start','End','Hold Time','Max Current','Poor'])
+        return holds.astype({'Start':int, 'End':int, 'Poor':bool})
+
+    def evaluate(self, rules=None):
+        '''
+        Counts and summary of the phases kept under a rule set
+
+        Returns
+        -------
+        result : dict
+            'Regens', 'Holds' and 'Poor Holds' counts, and 'Mean Hold Time' and 'Mean Max Current' of the holds that are not poor
+
+        '''
+        regenbounds = self.bounds(rules)[0]
+        holds = self.holds(rules)
+        good = holds.loc[~holds['Poor']]
+        return {'Regens':len(regenbounds), 'Holds':len(holds), 'Poor Holds':int(holds['Poor'].sum()),
+                'Mean Hold Time':good['Hold Time'].mean(), 'Mean Max Current':good['Max Current'].mean()}
+
+    def sweep(self, name, values, rules=None):
+        '''
+        Evaluates a rule set for each value of one threshold
+
+        Parameters
+        ----------
+        name : str
+            Threshold to sweep (a key of SEGMENT_RULES)
+        values : iterable
+            Values of the threshold
+        rules : dict, optional
+            Other thresholds. Missing thresholds default to SEGMENT_RULES
+
+        Returns
+        -------
+        results : DataFrame
+            Index is the threshold value, columns are the keys returned by evaluate()
+
+        '''
+        values = list(values)
+        results = [self.evaluate(dict(rules or {}, **{name:value})) for value in values]
+        return pd.DataFrame(results, index=pd.Index(values, name=name))
+
+def run_lengths(values):
+    '''
+    Run-length encodes an array
+
+    Parameters
+    ----------
+    values : array-like
+        Values of a column (e.g. "Temperature Setpoint")
+
+    Returns
+    -------
+    starts : ndarray
+        First row of each run of equal consecutive values
+    ends : ndarray
+        Row after the last row of each run
+    run_values : ndarray
+        Value of each run
+
+    '''
+    values = np.asarray(values)
+    changes = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.r_[0, changes] if len(values) else changes
+    ends = np.r_[changes, len(values)] if len(values) else changes
+    return (starts, ends, values[starts])
+
+def segments_path(filepath, directory=None):
+    '''
+    Filepath of the segment index of a log file: next to the log, or in directory if given
+    Names in directory include a hash of the log's absolute path, as in chunks_path()
+
+    '''
+    if directory is None:
+        return str(filepath) + '.segments.json'
+    digest = hashlib.sha1(os.path.abspath(str(filepath)).encode()).hexdigest()[:12]
+    return os.path.join(directory, '{}.{}.segments.json'.format(os.path.basename(str(filepath)), digest))
+
+def build_segments(log):
+    '''
+    Creates the segment index of a reformatted log: run-length encoded "Temperature Setpoint", magnet-on intervals
+    (current above 0.085 A, as in magnet_on()) and the row range of each temperature hold after temp_hold()
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted log. Return of load_log(), load_107() or load_102()
+
+    Returns
+    -------
+    segments : dict
+        'start' : date and time of the first row
+        'rows' : number of rows
+        'setpoint' : [first row, row after the last row, setpoint] of each run of constant setpoint
+        'magnet_on' : [first row, row after the last row] of each interval where the magnet is on 
+        'holds' : keys are 'reg1','reg2','reg3',... as in split_log(), values are [first row, row after the last row] 
+            from the first to the last row where the magnet is on in the temperature hold
+
+    '''
+    starts, ends, setpoints = run_lengths(log['Temperature Setpoint'].to_numpy(dtype=float))
+    on = log['Magnet Current'].to_numpy(dtype=float) > SEGMENT_RULES['magnet_on_current']
+    onstarts, onends, onvalues = run_lengths(on)
+    holds = {}
+    for key,(start,end) in phase_bounds(log)[2].items():
+        rows = np.flatnonzero(on[start:end])
+        holds[key] = [int(start+rows[0]), int(start+rows[-1]+1)]
+    return {'start':str(log['Date/Time'].iloc[0]), 'rows':len(log),
+            'setpoint':[[int(a), int(b), float(v)] for a,b,v in zip(starts, ends, setpoints)],
+            'magnet_on':[[int(a), int(b)] for a,b,v in zip(onstarts, onends, onvalues) if v], 'holds':holds}
+
+def segment_index(filepath, cryostat=107, directory=None):
+    '''
+    Loads the segment index of a log file (see build_segments())
+    The index is saved next to the log (or in directory) and created again when the log's size or modification time 
+    changes, so only the first call loads the entire log
+    If it cannot be saved (e.g. the log directory is read-only), it is created in memory on every call
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of individual, complete log
+    cryostat : int
+        Cryostat model of the log (107 or 102)
+    directory : str, optional
+        Directory of the index (see segments_path()). Saved next to the log if None
+
+    Returns
+    -------
+    segments : dict
+        Return of build_segments()
+
+    '''
+    stat = os.stat(filepath)
+    path = segments_path(filepath, directory)
+    try:
+        with open(path) as f:
+            segments = json.load(f)
+        if segments['source'] == [stat.st_size, stat.st_mtime, cryostat]:
+            return segments
+    except (OSError, ValueError, KeyError):
+        pass
+    segments = build_segments(load_log(filepath, cryostat))
+    segments['source'] = [stat.st_size, stat.st_mtime, cryostat]
+    tmp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+    try:
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        with open(tmp, 'w') as f:
+            json.dump(segments, f)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return segments
+
+def holds_at_setpoint(segments, setpoint, tol=1e-4):
+    '''
+    Finds the temperature holds of a log at a setpoint, from its segment index
+    The setpoint of a hold is the setpoint at its first row, as in maxcurrent_holdtime()
+
+    Parameters
+    ----------
+    segments : dict
+        Return of segment_index()
+    setpoint : float
+        50 mK stage setpoint of interest (e.g. 0.06)
+    tol : float
+        Largest difference (K) between the setpoint of a hold and the setpoint of interest
+
+    Returns
+    -------
+    holds : dict
+        Keys are 'reg1','reg2','reg3',... as in split_107(), values are (first row, row after the last row) of the hold
+
+    '''
+    runs = np.asarray(segments['setpoint'], dtype=float).reshape(-1,3)
+    holds = {}
+    for key,(start,end) in segments['holds'].items():
+        #Run of constant setpoint containing the first row of the hold
+        run = np.searchsorted(runs[:,0], start, side='right') - 1
+        if abs(runs[run,2] - setpoint) <= tol:
+            holds[key] = (start,end)
+    return holds
+
+def load_hold(filepath, rows, cryostat=107):
+    '''
+    Loads one temperature hold of a log from its row range, revised as by split_log() and temp_hold()
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of individual, complete log
+    rows : tuple
+        (first row, row after the last row) of the hold, e.g. from holds_at_setpoint()
+    cryostat : int
+        Cryostat model of the log (107 or 102)
+
+    Returns
+    -------
+    reg : DataFrame
+        Revised temperature hold log, with index and "Hours after Start" starting at 0
+
+    '''
+    reg = load_log(filepath, cryostat, rows)
+    #Replace 0 values in "50 mK FAA" column with NaN 
+    reg['50 mK FAA'] = reg['50 mK FAA'].replace(0,np.nan)
+    return magnet_on(reg)
+
+
+'''
+
+The functions below find data that is repeated across log files: logs exported more than once, and logs whose time
+ranges overlap (e.g. after the logger was restarted)
+Each log is cut into content-defined chunks (consecutive rows logged in the same clock hour) that are hashed without
+parsing the rows. Chunk indexes are saved in a cache directory (INDEX_DIR). Chunks of one log that repeat, or
+overlap in time with, chunks of an earlier log are skipped, so multi-file functions load and split only unique rows
+
+'''
+
+
+def chunks_path(filepath, directory=INDEX_DIR):
+    '''
+    Filepath of the chunk index of a log file: in directory, or next to the log if directory is None
+    Names in directory include a hash of the log's absolute path, so logs of the same name in different folders 
+    (e.g. two exports of a run) have separate indexes
+
+    '''
+    if directory is None:
+        return str(filepath) + '.chunks.json'
+    digest = hashlib.sha1(os.path.abspath(str(filepath)).encode()).hexdigest()[:12]
+    return os.path.join(directory, '{}.{}.chunks.json'.format(os.path.basename(str(filepath)), digest))
+
+def build_chunks(filepath, cryostat=107):
+    '''
+    Creates the chunk index of a log file by hashing its rows in chunks, without parsing them
+    A chunk is a run of consecutive rows whose timestamps fall in the same clock hour, so the same data gives the 
+    same chunks whatever row it starts at
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of a log. May be compressed (see open_log())
+    cryostat : int
+        Cryostat model of the log (107 or 102), for the number of header rows in LOG_SCHEMAS
+
+    Returns
+    -------
+    chunks : dict
+        'rows' : number of rows
+        'chunks' : [first row, row after the last row, first timestamp, last timestamp, hash] of each chunk
+
+    '''
+    chunks = []
+    digest, key, first, row = None, None, None, 0
+    with open_log(filepath) as f:
+        #Skip the header and any unit rows
+        for line in range(LOG_SCHEMAS[cryostat]['header_rows']):
+            f.readline()
+        for line in f:
+            line = line.rstrip(b'\r\n')
+            if not line:
+                continue
+            timestamp = line.split(b',', 1)[0]
+            #Date and hour of the timestamp, e.g. b'06/01/2020 13'
+            hour = timestamp.split(b':', 1)[0]
+            if hour != key:
+                if digest is not None:
+                    chunks.append([start, row, first.decode(), last.decode(), digest.hexdigest()])
+                digest, key, first, start = hashlib.blake2b(digest_size=16), hour, timestamp, row
+            digest.update(line + b'\n')
+            last = timestamp
+            row += 1
+    if digest is not None:
+        chunks.append([start, row, first.decode(), last.decode(), digest.hexdigest()])
+    return {'rows':row, 'chunks':chunks}
+
+def chunk_index(filepath, directory=INDEX_DIR, cryostat=107):
+    '''
+    Loads the chunk index of a log file (see build_chunks())
+    The index is saved in directory and created again when the log's size or modification time changes
+    If it cannot be saved (e.g. the directory is read-only), it is created in memory on every call
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of a log
+    directory : str, optional
+        Directory of the index (see chunks_path()). Saved next to the log if None
+    cryostat : int
+        Cryostat model of the log (107 or 102)
+
+    Returns
+    -------
+    chunks : dict
+        Return of build_chunks()
+
+    '''
+    stat = os.stat(filepath)
+    path = chunks_path(filepath, directory)
+    try:
+        with open(path) as f:
+            chunks = json.load(f)
+        if chunks['source'] == [stat.st_size, stat.st_mtime, cryostat]:
+            return chunks
+    except (OSError, ValueError, KeyError):
+        pass
+    chunks = build_chunks(filepath, cryostat)
+    chunks['source'] = [stat.st_size, stat.st_mtime, cryostat]
+    tmp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+    try:
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        with open(tmp, 'w') as f:
+            json.dump(chunks, f)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return chunks
+
+def chunk_table(filepath, directory=INDEX_DIR, cryostat=107):
+    '''
+    Chunk index of a log file as a DataFrame with columns 'Path', 'First Row', 'End Row', 'Start', 'End' and 'Hash'
+    Raises OSError if the log cannot be read and ValueError if its timestamps cannot be parsed
+
+    '''
+    table = pd.DataFrame(chunk_index(filepath, directory, cryostat)['chunks'], columns=['First Row','End Row','Start','End','Hash'])
+    table['Start'] = pd.to_datetime(table['Start'], infer_datetime_format=True)
+    table['End'] = pd.to_datetime(table['End'], infer_datetime_format=True)
+    table.insert(0, 'Path', filepath)
+    return table
+
+class ChunkFilter:
+    '''
+    Classifies the chunks of log files as unique, duplicate or overlapping, one log at a time
+    A chunk is a duplicate if a chunk with the same hash is in a log added before, and overlapping if its time range 
+    overlaps the kept chunks of a log added before with different data. chunk_report() adds logs in order of their 
+    first timestamp; streamed plots add each log as it is processed, so no log waits for the others to be hashed
+    Logs may be added from several threads
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory of the chunk indexes (see chunk_index())
+    cryostat : int
+        Cryostat model of the logs (107 or 102)
+
+    '''
+    def __init__(self, directory=INDEX_DIR, cryostat=107):
+        self.directory = directory
+        self.cryostat = cryostat
+        self.sources = {} #Hash -> log holding the chunk
+        self.covered = np.empty((0,2), dtype='datetime64[ns]') #Sorted, merged time ranges of kept chunks 
+        self.owners = [] #Log holding each covered range 
+        self.lock = threading.Lock()
+
+    def classify(self, table):
+        '''
+        Adds the 'Status' ('unique', 'duplicate' or 'overlap') and 'Source' (log holding the data the chunk repeats or 
+        overlaps, None for unique chunks) columns to the return of chunk_table() for one log, and records its kept chunks
+
+        '''
+        with self.lock:
+            starts, ends = table['Start'].to_numpy(), table['End'].to_numpy()
+            #First covered range ending at or after each chunk start; the chunk overlaps it if that range starts before the chunk ends
+            nearest = np.searchsorted(self.covered[:,1], starts)
+            inside = nearest < len(self.covered)
+            overlap = np.zeros(len(table), dtype=bool)
+            overlap[inside] = self.covered[nearest[inside],0] <= ends[inside]
+            duplicate = table['Hash'].map(lambda digest:digest in self.sources).to_numpy(dtype=bool)
+            table['Status'] = np.where(duplicate, 'duplicate', np.where(overlap, 'overlap', 'unique'))
+            table['Source'] = [self.sources[digest] if dup else self.owners[index] if over else None 
+                               for digest, dup, over, index in zip(table['Hash'], duplicate, overlap, nearest)]
+            #Kept chunks of this log cover their time ranges for the logs after it
+            kept = table['Status'].to_numpy() == 'unique'
+            self.sources.update({digest:path for digest, path in zip(table['Hash'], table['Path'])})
+            if kept.any():
+                ranges = np.concatenate([self.covered, np.column_stack([starts[kept], ends[kept]])])
+                paths = self.owners + [table['Path'].iloc[0]]*int(kept.sum())
+                sort = np.argsort(ranges[:,0], kind='stable')
+                covered, owners = ranges[sort], [paths[i] for i in sort]
+                #Merge overlapping ranges, keeping the owner of the first one 
+                merged = [0]
+                for i in range(1, len(covered)):
+                    if covered[i,0] <= covered[merged[-1],1]:
+                        covered[merged[-1],1] = max(covered[merged[-1],1], covered[i,1])
+                    else:
+                        merged.append(i)
+                self.covered, self.owners = covered[merged], [owners[i] for i in merged]
+        return table
+
+    def spans(self, filepath):
+        '''
+        Classifies the chunks of one log file and returns its unique row ranges, as in unique_spans()
+        Returns None (the entire log is kept) if its chunk index cannot be created, so the log is loaded and any error 
+        is reported by the function that loads it
+
+        '''
+        try:
+            table = chunk_table(filepath, self.directory, self.cryostat)
+        except (OSError, ValueError):
+            return None
+        return kept_spans(self.classify(table))
+
+def chunk_report(loglist, directory=INDEX_DIR, cryostat=107):
+    '''
+    Classifies every chunk of multiple log files as unique, duplicate or overlapping (see ChunkFilter)
+    Logs are taken in order of their first timestamp (longer logs first on ties), so the first export of a run is kept
+    Logs whose chunk index cannot be created (e.g. missing or malformed logs) are left out of the report
+    Pass log_files(directory) to check an entire log directory
+
+    Parameters
+    ----------
+    loglist : list
+        List of log filepaths
+    directory : str, optional
+        Directory of the chunk indexes (see chunk_index())
+    cryostat : int
+        Cryostat model of the logs (107 or 102)
+
+    Returns
+    -------
+    report : DataFrame
+        One row per chunk, with columns 'Path', 'First Row', 'End Row', 'Start', 'End', 'Status' ('unique', 'duplicate' or
+        'overlap') and 'Source' (log holding the data the chunk repeats or overlaps, None for unique chunks)
+
+    '''
+    tables = []
+    for path in loglist:
+        try:
+            tables.append(chunk_table(path, directory, cryostat))
+        except (OSError, ValueError):
+            continue
+    rows = [table['End Row'].max() if len(table) else 0 for table in tables]
+    order = sorted(range(len(tables)), key=lambda n:(tables[n]['Start'].min() if len(tables[n]) else pd.Timestamp.max, -rows[n]))
+    chunks = ChunkFilter(directory, cryostat)
+    for n in order:
+        chunks.classify(tables[n])
+    if not tables:
+        return pd.DataFrame(columns=['Path','First Row','End Row','Start','End','Status','Source'])
+    return pd.concat(tables, ignore_index=True).drop(columns='Hash')
+
+def kept_spans(chunks):
+    '''
+    Row ranges of the unique chunks of one log file, from its rows of chunk_report() 
+    Ranges shorter than 2 rows are dropped, since they hold no phase (see phase_bounds())
+
+    Returns
+    -------
+    spans : list or None
+        None if the entire log is unique, [] if none of it is, and otherwise a list of (first row, row after the last row)
+        of each range of consecutive unique chunks
+
+    '''
+    kept = (chunks['Status'] == 'unique').to_numpy()
+    if kept.all():
+        return None
+    #Consecutive kept chunks form one range
+    first, end = chunks['First Row'].to_numpy()[kept], chunks['End Row'].to_numpy()[kept]
+    breaks = np.flatnonzero(first[1:] != end[:-1]) + 1
+    spans = [(int(a[0]), int(b[-1])) for a, b in zip(np.split(first, breaks), np.split(end, breaks))] if len(first) else []
+    return [(start, end) for start, end in spans if end - start >= 2]
+
+def unique_spans(loglist, directory=INDEX_DIR, cryostat=107):
+    '''
+    Finds the row ranges of multiple log files that hold unique data (see chunk_report())
+
+    Parameters
+    ----------
+    loglist : list
+        List of log filepaths
+    directory : str, optional
+        Directory of the chunk indexes (see chunk_index())
+    cryostat : int
+        Cryostat model of the logs (107 or 102)
+
+    Returns
+    -------
+    spans : dict
+        Keys are the filepaths of loglist. Values are None if the entire log is unique (or its chunk index cannot be 
+        created), [] if none of it is, and otherwise a list of (first row, row after the last row) of each range of 
+        consecutive unique chunks, as returned by kept_spans()
+
+    '''
+    report = chunk_report(loglist, directory, cryostat)
+    return {path:kept_spans(report.loc[report['Path'] == path]) for path in loglist}
+
+def split_unique(filepath, spans=None, rules=None, cryostat=107):
+    '''
+    Loads and splits the unique row ranges of a log file
+    Each range is loaded with load_log() and split on its own with split_log(); phases are numbered in order across ranges
+    Ranges shorter than 2 rows hold no phase and are skipped
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of a log
+    spans : list, optional
+        Row ranges of the log to load, from unique_spans(). The entire log is loaded if None
+    rules : dict, optional
+        Thresholds of the validity rules (see SEGMENT_RULES)
+    cryostat : int
+        Cryostat model of the log (107 or 102)
+
+    Returns
+    -------
+    logs, regenfiles, regfiles : dict
+        As returned by split_log()
+
+    '''
+    if spans is None:
+        return split_log(load_log(filepath, cryostat), rules, cryostat)
+    split = ({}, {}, {})
+    for span in spans:
+        if span[1] - span[0] < 2:
+            continue
+        #phase_bounds() needs an index starting at 0
+        for files, prefix, phases in zip(split, ['log','regen','reg'], split_log(load_log(filepath, cryostat, span).reset_index(drop=True), rules, cryostat)):
+            for phase in phases.values():
+                files['{}{}'.format(prefix, len(files)+1)] = phase
+    return split
+
 
 '''
 
@@ -221,17 +1178,12 @@ def cooldown_plot(cooldown_log,window):
 
     '''
     ax = window.canvas.fig.add_subplot(111)
-    #Plot 50 mK stage
-    ax.plot(cooldown_log.iloc[:,1], cooldown_log.iloc[:,2], '-', label="50 mK FAA") 
-    #Plot He-3 or ADR 1K stage for 107 or 102 logs, respectively 
-    ax.plot(cooldown_log.iloc[:,1], cooldown_log.iloc[:,3], '-', label= cooldown_log.columns[3]) 
-    #Plot 3K Stage Diode or Magnet Diode for 107 and 102 logs, respectively 
-    if cooldown_log.iloc[0,4]==500:
-        ax.plot(cooldown_log.iloc[:,1], cooldown_log.iloc[:,5], '-', label="Magnet Diode") 
-    else:    
-        ax.plot(cooldown_log.iloc[:,1], cooldown_log.iloc[:,4], '-', label="3K Stage Diode") 
-    #Plot 50 K or 60 K stage for 107 and 102 logs, respectively 
-    ax.plot(cooldown_log.iloc[:,1], cooldown_log.iloc[:,6], '-', label= cooldown_log.columns[6]) 
+    #Plot each temperature stage of the 107 or 102 log (see LOG_SCHEMAS)
+    for stage, column in LOG_SCHEMAS[log_model(cooldown_log)]['stages'].items():
+        if stage == '3 K':
+            #Plot Magnet Diode if the 3K Stage Diode is disconnected (reads 500)
+            column = 'Magnet Diode' if cooldown_log['3K Stage Diode'].iloc[0]==500 else '3K Stage Diode'
+        ax.plot(cooldown_log['Hours after Start'], cooldown_log[column], '-', label=column) 
     ax.set_xlabel('Time after start (hrs)')
     ax.set_ylabel('Temperature (K)')
     ax.legend(loc='upper right')
@@ -258,9 +1210,9 @@ def regen_plot(regen_log,window):
     #Temperature subplot
     
     #Plot 50 mK stage
-    ax1.plot(regen_log.iloc[:,1], regen_log.iloc[:,2], '-', label='50 mK FAA') 
+    ax1.plot(regen_log['Hours after Start'], regen_log['50 mK FAA'], '-', label='50 mK FAA') 
     #Plot temperature setpoint
-    ax1.plot(regen_log.iloc[:,1], regen_log.iloc[:,7], '-', label='Temperature Setpoint')
+    ax1.plot(regen_log['Hours after Start'], regen_log['Temperature Setpoint'], '-', label='Temperature Setpoint')
     ax1.set_xlabel('Time after start (hrs)')
     ax1.set_ylabel('Temperature (K)')
     ax1.legend(loc='upper right')
@@ -268,12 +1220,12 @@ def regen_plot(regen_log,window):
     #Magnet current and voltage subplot
     
     #Plot magnet current 
-    PS_I=ax2.plot(regen_log.iloc[:,1], regen_log.iloc[:,8], 'g-', label='Magnet Current') 
+    PS_I=ax2.plot(regen_log['Hours after Start'], regen_log['Magnet Current'], 'g-', label='Magnet Current') 
     ax2.set_xlabel('Time after start (hrs)')
     ax2.set_ylabel('Magnet Current (A)')
     ax3 = ax2.twinx()
     #Plot magnet voltage
-    PS_V=ax3.plot(regen_log.iloc[:,1], regen_log.iloc[:,9],'r-', label='Magnet Voltage') 
+    PS_V=ax3.plot(regen_log['Hours after Start'], regen_log['Magnet Voltage'],'r-', label='Magnet Voltage') 
     ax3.set_ylabel('Magnet Voltage (V)')
     axs = PS_I+PS_V
     labs = [l.get_label() for l in axs]
@@ -303,9 +1255,9 @@ def reg_plot(reg_log,window):
     #Temperature subplot
     
     #Plot 50 mK stage
-    ax1.plot(reg_log.iloc[:,1], reg_log.iloc[:,2], '-', label='50 mK FAA') 
+    ax1.plot(reg_log['Hours after Start'], reg_log['50 mK FAA'], '-', label='50 mK FAA') 
     #Plot temperature setpoint
-    ax1.plot(reg_log.iloc[:,1], reg_log.iloc[:,7], '-', label='Temperature Setpoint') 
+    ax1.plot(reg_log['Hours after Start'], reg_log['Temperature Setpoint'], '-', label='Temperature Setpoint') 
     ax1.set_xlabel('Time after start (hrs)')
     ax1.set_ylabel('Temperature (K)')
     ax1.legend()
@@ -313,12 +1265,12 @@ def reg_plot(reg_log,window):
     #Magnet current and voltage subplot
     
     #Plot magnet current
-    PS_I=ax2.plot(reg_log.iloc[:,1], reg_log.iloc[:,8], 'g-', label='Magnet Current') 
+    PS_I=ax2.plot(reg_log['Hours after Start'], reg_log['Magnet Current'], 'g-', label='Magnet Current') 
     ax2.set_xlabel('Time after start (hrs)')
     ax2.set_ylabel('Magnet Current (A)')
     ax3 = ax2.twinx()
     #Plot magnet voltage
-    PS_V=ax3.plot(reg_log.iloc[:,1], reg_log.iloc[:,9],'r-', label='Magnet Voltage') 
+    PS_V=ax3.plot(reg_log['Hours after Start'], reg_log['Magnet Voltage'],'r-', label='Magnet Voltage') 
     ax3.set_ylabel('Magnet Voltage (V)')
     axs = PS_I+PS_V
     labs = [l.get_label() for l in axs]
@@ -356,20 +1308,20 @@ def regen_temp_plots(regenfiles,window):
     row += tot % col
     position = range(1,tot + 1)
     #Determine length of longest magnet cycle 
-    maxtime = np.max([regen.iloc[-1,1] for regen in regenfiles.values()]) 
+    maxtime = np.max([regen['Hours after Start'].iloc[-1] for regen in regenfiles.values()]) 
     for i in range(tot):
         ax = window.canvas.fig.add_subplot(row,col,position[i])
         #Plot 50 mK stage
-        ax.plot(regenfiles['regen{}'.format(i+1)].iloc[:,1], regenfiles['regen{}'.format(i+1)].iloc[:,2], '-', label='50 mK FAA') 
+        ax.plot(regenfiles['regen{}'.format(i+1)]['Hours after Start'], regenfiles['regen{}'.format(i+1)]['50 mK FAA'], '-', label='50 mK FAA') 
         #Plot temperature setpoint
-        ax.plot(regenfiles['regen{}'.format(i+1)].iloc[:,1], regenfiles['regen{}'.format(i+1)].iloc[:,7], '-', label='Temperature Setpoint') 
+        ax.plot(regenfiles['regen{}'.format(i+1)]['Hours after Start'], regenfiles['regen{}'.format(i+1)]['Temperature Setpoint'], '-', label='Temperature Setpoint') 
         ax.set_xlabel('Hours after Regen')
         ax.set_ylabel('Temperature (K)')
         ax.set_xlim(-0.25,maxtime+0.25) #Set x axis limits based on longest magnet cycle
         ax.set_ylim(0,6)
         ax.legend(loc='upper right')  
-        ax.set_title('Regen {} '.format(i+1) + str(regenfiles['regen{}'.format(i+1)].iloc[0,0])[:10])
-        plt.subplots_adjust(wspace = 0.5, hspace=0.5)
+        ax.set_title('Regen {} '.format(i+1) + str(regenfiles['regen{}'.format(i+1)]['Date/Time'].iloc[0])[:10])
+    plt.subplots_adjust(wspace = 0.5, hspace=0.5)
 
 def regen_mag_plots(regenfiles, window):
     '''
@@ -395,25 +1347,25 @@ def regen_mag_plots(regenfiles, window):
     row += tot % col
     position = range(1,tot + 1)
     #Determine length of longest magnet cycle 
-    maxtime = np.max([regen.iloc[-1,1] for regen in regenfiles.values()]) 
+    maxtime = np.max([regen['Hours after Start'].iloc[-1] for regen in regenfiles.values()]) 
     for i in range(tot):
         ax = window.canvas.fig.add_subplot(row,col,position[i])
         #Plot magnet current
-        PS_I=ax.plot(regenfiles['regen{}'.format(i+1)].iloc[:,1], regenfiles['regen{}'.format(i+1)].iloc[:,8], 'g-', label='Magnet Current') 
+        PS_I=ax.plot(regenfiles['regen{}'.format(i+1)]['Hours after Start'], regenfiles['regen{}'.format(i+1)]['Magnet Current'], 'g-', label='Magnet Current') 
         ax.set_xlabel('Hours after Regen')
         ax.set_ylabel('Magnet Current (A)')
         ax.set_xlim(-0.25,maxtime+0.25) #Set x axis limits based on longest magnet cycle
         ax.set_ylim(0,20)
         ax2 = ax.twinx()
         #Plot magnet voltage
-        PS_V=ax2.plot(regenfiles['regen{}'.format(i+1)].iloc[:,1], regenfiles['regen{}'.format(i+1)].iloc[:,9],'r-', label='Magnet Voltage') 
+        PS_V=ax2.plot(regenfiles['regen{}'.format(i+1)]['Hours after Start'], regenfiles['regen{}'.format(i+1)]['Magnet Voltage'],'r-', label='Magnet Voltage') 
         ax2.set_ylabel('Magnet Voltage (V)')
         ax2.set_ylim(0,3)
         axs = PS_I+PS_V
         labs = [l.get_label() for l in axs]
         ax.legend(axs, labs, loc='center')
-        ax.set_title('Regen {} '.format(i+1) + str(regenfiles['regen{}'.format(i+1)].iloc[0,0])[:10])
-        plt.subplots_adjust(wspace = 0.5, hspace=0.5)
+        ax.set_title('Regen {} '.format(i+1) + str(regenfiles['regen{}'.format(i+1)]['Date/Time'].iloc[0])[:10])
+    plt.subplots_adjust(wspace = 0.5, hspace=0.5)
 
 def reg_temp_plots(regfiles, window):
     '''
@@ -440,20 +1392,20 @@ def reg_temp_plots(regfiles, window):
     row += tot % col
     position = range(1,tot + 1)
     #Determine length of longest temperature hold
-    maxtime = np.max([reg.iloc[-1,1] for reg in regfiles.values()]) 
+    maxtime = np.max([reg['Hours after Start'].iloc[-1] for reg in regfiles.values()]) 
     for i in range(tot):
         ax = window.canvas.fig.add_subplot(row,col,position[i])
         #Plot 50 mK stage
-        ax.plot(regfiles['reg{}'.format(i+1)].iloc[:,1], regfiles['reg{}'.format(i+1)].iloc[:,2], '-', label='50 mK FAA') 
+        ax.plot(regfiles['reg{}'.format(i+1)]['Hours after Start'], regfiles['reg{}'.format(i+1)]['50 mK FAA'], '-', label='50 mK FAA') 
         #Plot temperature setpoint
-        ax.plot(regfiles['reg{}'.format(i+1)].iloc[:,1], regfiles['reg{}'.format(i+1)].iloc[:,7], '-', label='Temperature Setpoint') 
+        ax.plot(regfiles['reg{}'.format(i+1)]['Hours after Start'], regfiles['reg{}'.format(i+1)]['Temperature Setpoint'], '-', label='Temperature Setpoint') 
         ax.set_xlabel('Hours after Reg')
         ax.set_ylabel('Temperature (K)')
         ax.set_xlim(-1,maxtime+1) #Set x axis limits based on longest temperature hold
         ax.set_ylim(0.030,0.080)
         ax.legend(loc='upper right')
-        ax.set_title('Reg {} '.format(i+1) + str(regfiles['reg{}'.format(i+1)].iloc[0,0])[:10])
-        plt.subplots_adjust(wspace = 0.5, hspace=0.5)
+        ax.set_title('Reg {} '.format(i+1) + str(regfiles['reg{}'.format(i+1)]['Date/Time'].iloc[0])[:10])
+    plt.subplots_adjust(wspace = 0.5, hspace=0.5)
 
 def reg_mag_plots(regfiles, window):
     '''
@@ -479,62 +1431,569 @@ def reg_mag_plots(regfiles, window):
     row += tot % col
     position = range(1,tot + 1)
     #Determine length of longest temperature hold
-    maxtime = np.max([reg.iloc[-1,1] for reg in regfiles.values()]) 
+    maxtime = np.max([reg['Hours after Start'].iloc[-1] for reg in regfiles.values()]) 
     for i in range(tot):
         ax = window.canvas.fig.add_subplot(row,col,position[i])
         #Plot magnet current
-        PS_I=ax.plot(regfiles['reg{}'.format(i+1)].iloc[:,1], regfiles['reg{}'.format(i+1)].iloc[:,8], 'g-', label='Magnet Current') 
+        PS_I=ax.plot(regfiles['reg{}'.format(i+1)]['Hours after Start'], regfiles['reg{}'.format(i+1)]['Magnet Current'], 'g-', label='Magnet Current') 
         ax.set_xlabel('Hours after Reg')
         ax.set_ylabel('Magnet Current (A)')
         ax.set_xlim(-1,maxtime+1) #Set x axis limits based on longest temperature hold
         ax.set_ylim(0,0.8)
         ax2 = ax.twinx()
         #Plot magnet voltage
-        PS_V=ax2.plot(regfiles['reg{}'.format(i+1)].iloc[:,1], regfiles['reg{}'.format(i+1)].iloc[:,9],'r-', label='Magnet Voltage') 
+        PS_V=ax2.plot(regfiles['reg{}'.format(i+1)]['Hours after Start'], regfiles['reg{}'.format(i+1)]['Magnet Voltage'],'r-', label='Magnet Voltage') 
         ax2.set_ylabel('Magnet Voltage (V)')
         ax2.set_ylim(0,8)
         axs = PS_I+PS_V
         labs = [l.get_label() for l in axs]
         ax.legend(axs, labs, loc='upper right')
-        ax.set_title('Reg {} '.format(i+1) + str(regfiles['reg{}'.format(i+1)].iloc[0,0])[:10])
-        plt.subplots_adjust(wspace = 0.5, hspace=0.75)
+        ax.set_title('Reg {} '.format(i+1) + str(regfiles['reg{}'.format(i+1)]['Date/Time'].iloc[0])[:10])
+    plt.subplots_adjust(wspace = 0.5, hspace=0.75)
+
+def reg_3K_plots(regfiles, window):
+    '''
+    Creates temperature plots of 3K stage for all temperature hold phases of a run 
+    Figure containing a variable number of subplots depending on the number of temperature holds in a run
+    Each subplot shows temperature of 3K stage versus time 
+
+    Parameters
+    ----------
+    regfiles : dict
+        Dictionary containing all temperature hold logs in a run 
+    window : PlotWindow
+        Window containing MatPlotLib canvas which gets plotted to 
+
+    Returns
+    -------
+    None.
+        
+    '''
+    tot = len(regfiles)
+    col = 3
+    row = tot // col
+    row += tot % col
+    position = range(1,tot + 1)
+    #Determine length of longest temperature hold
+    maxtime = np.max([reg['Hours after Start'].iloc[-1] for reg in regfiles.values()]) 
+    for i in range(tot):
+        ax = window.canvas.fig.add_subplot(row,col,position[i])
+        #Plot 3K stage
+        ax.plot(regfiles['reg{}'.format(i+1)]['Hours after Start'], regfiles['reg{}'.format(i+1)]['3K Stage Diode'], '-', label='3K Stage Diode') 
+        ax.set_xlabel('Hours after Reg')
+        ax.set_ylabel('Temperature (K)')
+        ax.set_xlim(-1,maxtime+1) #Set x axis limits based on longest temperature hold
+        ax.set_ylim(2.3,3.7)
+        ax.legend(loc='upper left', fontsize = 5) 
+        ax.set_title('Reg {} '.format(i+1) + str(regfiles['reg{}'.format(i+1)]['Date/Time'].iloc[0])[:10])
+    plt.subplots_adjust(wspace = 0.5, hspace=0.5)
+
+
+#Settings of the paged versions of the multiple phase plots above
+#Each series is (column, color, label, axis), with axis 0 for the left y-axis and 1 for the right (twin) y-axis
+PAGED_PLOTS = {
+    'regen_temp_plots': {'phase':'Regen', 'xlabel':'Hours after Regen', 'xpad':0.25, 'ylabels':['Temperature (K)'], 'ylims':[(0,6)], 'legend':'upper right', 'hspace':0.5,
+                         'series':[('50 mK FAA','C0','50 mK FAA',0), ('Temperature Setpoint','C1','Temperature Setpoint',0)]},
+    'regen_mag_plots': {'phase':'Regen', 'xlabel':'Hours after Regen', 'xpad':0.25, 'ylabels':['Magnet Current (A)','Magnet Voltage (V)'], 'ylims':[(0,20),(0,3)], 'legend':'center', 'hspace':0.5,
+                        'series':[('Magnet Current','g','Magnet Current',0), ('Magnet Voltage','r','Magnet Voltage',1)]},
+    'reg_temp_plots': {'phase':'Reg', 'xlabel':'Hours after Reg', 'xpad':1, 'ylabels':['Temperature (K)'], 'ylims':[(0.030,0.080)], 'legend':'upper right', 'hspace':0.5,
+                       'series':[('50 mK FAA','C0','50 mK FAA',0), ('Temperature Setpoint','C1','Temperature Setpoint',0)]},
+    'reg_mag_plots': {'phase':'Reg', 'xlabel':'Hours after Reg', 'xpad':1, 'ylabels':['Magnet Current (A)','Magnet Voltage (V)'], 'ylims':[(0,0.8),(0,8)], 'legend':'upper right', 'hspace':0.75,
+                      'series':[('Magnet Current','g','Magnet Current',0), ('Magnet Voltage','r','Magnet Voltage',1)]},
+    'reg_3K_plots': {'phase':'Reg', 'xlabel':'Hours after Reg', 'xpad':1, 'ylabels':['Temperature (K)'], 'ylims':[(2.3,3.7)], 'legend':'upper left', 'hspace':0.5,
+                     'series':[('3K Stage Diode','C0','3K Stage Diode',0)]},
+    }
+
+class PhasePager:
+    '''
+    Draws the multiple phase plots above one page at a time on a fixed grid of axes 
+    Axes, LineCollections, labels and legends are created once; turning the page only replaces line data and titles 
+    and blits them onto a cached background, so a page takes the same time to draw however many phases the run has 
+
+    Parameters
+    ----------
+    fig : Figure
+        Figure to draw on (e.g. window.canvas.fig)
+    phasefiles : dict
+        Dictionary containing magnet cycle or temperature hold stage logs
+    plottype : str
+        Key of PAGED_PLOTS (e.g. 'reg_temp_plots')
+    rows, col : int
+        Grid size of one page 
+    max_points : int
+        Lines are decimated to at most this many points 
+
+    '''
+    def __init__(self, fig, phasefiles, plottype, rows=3, col=3, max_points=2000):
+        self.fig = fig
+        self.phasefiles = phasefiles
+        self.keys = list(phasefiles.keys())
+        self.spec = PAGED_PLOTS[plottype]
+        self.perpage = rows * col
+        self.pages = max(1, -(-len(self.keys) // self.perpage))
+        self.page = 0
+        self.max_points = max_points
+        self.background = None
+        self.capturing = False
+        #Determine length of longest phase 
+        maxtime = np.max([phase['Hours after Start'].iloc[-1] for phase in phasefiles.values()]) 
+        self.slots = []
+        for i in range(self.perpage):
+            ax = fig.add_subplot(rows, col, i+1)
+            axes = [ax, ax.twinx()] if len(self.spec['ylims']) == 2 else [ax]
+            lines = []
+            for column, color, label, axis in self.spec['series']:
+                lines.append(axes[axis].add_collection(LineCollection([], colors=color, label=label)))
+            for axis, ylabel, ylim in zip(axes, self.spec['ylabels'], self.spec['ylims']):
+                axis.set_ylabel(ylabel)
+                axis.set_ylim(*ylim)
+            ax.set_xlabel(self.spec['xlabel'])
+            ax.set_xlim(-self.spec['xpad'], maxtime + self.spec['xpad']) #Set x axis limits based on longest phase 
+            ax.legend(lines, [line.get_label() for line in lines], loc=self.spec['legend'], fontsize=5)
+            self.slots.append((axes, lines, ax.set_title('')))
+        fig.subplots_adjust(wspace = 0.5, hspace=self.spec['hspace'])
+        fig.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def on_draw(self, event):
+        #Any full redraw not made by capture() (resize, zoom, pan) invalidates the cached background 
+        if not self.capturing:
+            self.background = None
+
+    def capture(self):
+        '''Draws the page without lines and titles and caches it as the background for blitting '''
+        self.capturing = True
+        for axes, lines, title in self.slots:
+            for artist in lines + [title]:
+                artist.set_visible(False)
+        self.fig.canvas.draw()
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.capturing = False
+
+    def show(self, page):
+        '''
+        Draws one page of phases 
+
+        Parameters
+        ----------
+        page : int
+            Page number, starting at 0. Clipped to the available pages 
+
+        Returns
+        -------
+        None.
+
+        '''
+        self.page = min(max(page, 0), self.pages - 1)
+        if self.background is None:
+            self.capture()
+        self.fig.canvas.restore_region(self.background)
+        for i, (axes, lines, title) in enumerate(self.slots):
+            index = self.page * self.perpage + i
+            if index < len(self.keys):
+                key = self.keys[index]
+                phase = self.phasefiles[key]
+                stride = max(1, -(-len(phase) // self.max_points))
+                hours = phase['Hours after Start'].to_numpy(dtype=float)[::stride]
+                for line, (column, color, label, axis) in zip(lines, self.spec['series']):
+                    line.set_segments([np.column_stack([hours, phase[column].to_numpy(dtype=float)[::stride]])])
+                    line.set_visible(True)
+                title.set_text('{} {} '.format(self.spec['phase'], key.lstrip('regn')) + str(phase['Date/Time'].iloc[0])[:10])
+                title.set_visible(True)
+            else:
+                for artist in lines + [title]:
+                    artist.set_visible(False)
+            for line, (column, color, label, axis) in zip(lines, self.spec['series']):
+                axes[axis].draw_artist(line)
+            axes[0].draw_artist(title)
+        self.fig.canvas.blit(self.fig.bbox)
+
+    def next_page(self):
+        self.show(self.page + 1)
+
+    def prev_page(self):
+        self.show(self.page - 1)
+
+
+'''
+
+The functions below align phases from one or more runs onto a common relative-time grid and plot them together
+
+'''
+
+
+def collect_phases(runs, phasetype='reg', keys=None):
+    '''
+    Gathers magnet cycle or temperature hold logs from several runs into a single dictionary
+
+    Parameters
+    ----------
+    runs : dict
+        Dictionary of split runs. Keys are run labels (e.g. '2020-06-01'), values are returns of split_107() 
+    phasetype : str
+        'regen' for magnet cycles or 'reg' for temperature holds
+    keys : list, optional
+        Phase keys to keep from every run (e.g. ['reg1','reg2']). All phases are kept if None
+
+    Returns
+    -------
+    phases : dict
+        Keys are '<run label> <phase key>' (e.g. '2020-06-01 reg3'), values are phase logs 
+
+    '''
+    index = 1 if phasetype == 'regen' else 2
+    phases = {}
+    for label, logs in runs.items():
+        for key, log in logs[index].items():
+            if keys is None or key in keys:
+                phases['{} {}'.format(label, key)] = log
+    return phases
+
+def align_phases(phases, column='50 mK FAA', step=None, tmax=None):
+    '''
+    Resamples one column of several phase logs onto a shared relative-time grid and stacks them into one 2-D array
+    All phases are interpolated with a single np.interp call: each phase's time axis is shifted by a row offset so 
+    the concatenated time axis stays increasing, and the grid is shifted the same way 
+
+    Parameters
+    ----------
+    phases : dict
+        Dictionary of phase logs (e.g. regfiles, regenfiles or return of collect_phases()) 
+        "Hours after Start" must start at 0 for each phase
+    column : str
+        Column to resample (e.g. '50 mK FAA', 'Magnet Current') 
+    step : float, optional
+        Grid spacing in hours. Defaults to the median sample spacing of all phases 
+    tmax : float, optional
+        Grid end in hours. Defaults to the length of the longest phase 
+
+    Returns
+    -------
+    grid : ndarray
+        Relative time grid in hours, shape (npoints,)
+    stack : ndarray
+        Resampled values, shape (number of phases, npoints). Grid points past the end of a phase are NaN 
+    labels : list
+        Phase keys in row order 
+
+    '''
+    labels = list(phases.keys())
+    times = [log['Hours after Start'].to_numpy(dtype=float) for log in phases.values()]
+    values = [log[column].to_numpy(dtype=float) for log in phases.values()]
+    lengths = np.array([len(t) for t in times])
+    ends = np.array([t[-1] for t in times])
+    if step is None:
+        step = np.nanmedian(np.concatenate([np.diff(t) for t in times]))
+    if tmax is None:
+        tmax = np.max(ends)
+    grid = np.arange(0, tmax + step/2, step)
+    #Offset each phase by a multiple of the longest span so the concatenated time axis is increasing
+    span = max(np.max(ends), grid[-1]) + 1
+    offsets = np.arange(len(times)) * span
+    xp = np.concatenate(times) + np.repeat(offsets, lengths)
+    fp = np.concatenate(values)
+    x = grid[None,:] + offsets[:,None]
+    stack = np.interp(x.ravel(), xp, fp).reshape(x.shape)
+    #Do not extrapolate past the end of each phase 
+    stack[grid[None,:] > ends[:,None]] = np.nan
+    return grid, stack, labels
+
+def aligned_overlay_plot(grid, stack, labels, window, ylabel='Temperature (K)', position=111):
+    '''
+    Overlays all aligned phases on a single axis 
+    Lines are drawn as one LineCollection so hundreds of phases draw quickly 
+
+    Parameters
+    ----------
+    grid, stack, labels : 
+        Return of align_phases()
+    window : PlotWindow
+        Window containing MatPlotLib canvas which gets plotted to 
+    ylabel : str
+        Y-axis label 
+    position : int
+        Subplot position passed to add_subplot (e.g. 121) 
+
+    Returns
+    -------
+    None.
+
+    '''
+    ax = window.canvas.fig.add_subplot(position)
+    segments = np.stack(np.broadcast_arrays(grid[None,:], stack), axis=-1)
+    lines = LineCollection(segments, linewidths=0.75, colors=plt.cm.viridis(np.linspace(0, 1, len(labels))))
+    ax.add_collection(lines)
+    ax.set_xlim(grid[0], grid[-1])
+    ax.set_ylim(np.nanmin(stack), np.nanmax(stack))
+    ax.set_xlabel('Hours after start of phase')
+    ax.set_ylabel(ylabel)
+    ax.set_title('{} phases'.format(len(labels)))
+
+def aligned_band_plot(grid, stack, window, percentiles=(10, 90), ylabel='Temperature (K)', position=111):
+    '''
+    Plots the median of all aligned phases with a shaded percentile band 
+
+    Parameters
+    ----------
+    grid, stack : 
+        Return of align_phases()
+    window : PlotWindow
+        Window containing MatPlotLib canvas which gets plotted to 
+    percentiles : tuple
+        Lower and upper percentiles of the shaded band 
+    ylabel : str
+        Y-axis label 
+    position : int
+        Subplot position passed to add_subplot (e.g. 121) 
+
+    Returns
+    -------
+    None.
+
+    '''
+    ax = window.canvas.fig.add_subplot(position)
+    low, median, high = np.nanpercentile(stack, [percentiles[0], 50, percentiles[1]], axis=0)
+    ax.fill_between(grid, low, high, alpha=0.3, label='{}-{} percentile'.format(*percentiles))
+    ax.plot(grid, median, '-', label='Median')
+    ax.set_xlabel('Hours after start of phase')
+    ax.set_ylabel(ylabel)
+    ax.legend(loc='upper right')
+
+def aligned_difference_plot(grid, stack, labels, window, reference=None, ylabel='Difference (K)', position=111):
+    '''
+    Plots the difference of every aligned phase from a reference phase or from the median of all phases 
+
+    Parameters
+    ----------
+    grid, stack, labels : 
+        Return of align_phases()
+    window : PlotWindow
+        Window containing MatPlotLib canvas which gets plotted to 
+    reference : str, optional
+        Label of the reference phase. The median of all phases is used if None 
+    ylabel : str
+        Y-axis label 
+    position : int
+        Subplot position passed to add_subplot (e.g. 121) 
+
+    Returns
+    -------
+    None.
+
+    '''
+    if reference is None:
+        ref = np.nanmedian(stack, axis=0)
+    else:
+        ref = stack[labels.index(reference)]
+    aligned_overlay_plot(grid, stack - ref[None,:], labels, window, ylabel=ylabel, position=position)
+    window.canvas.fig.axes[-1].axhline(0, color='k', lw=0.5)
+
+def reg_overlay_plots(regfiles, window):
+    '''
+    Overlays 50 mK temperature of all temperature holds in a run (left) and plots their median and 10-90 percentile band (right)
+
+    Parameters
+    ----------
+    regfiles : dict
+        Dictionary containing temperature hold stage logs
+    window : PlotWindow
+        Window containing MatPlotLib canvas which gets plotted to 
+
+    Returns
+    -------
+    None.
+
+    '''
+    grid, stack, labels = align_phases(regfiles, '50 mK FAA')
+    aligned_overlay_plot(grid, stack, labels, window, position=121)
+    aligned_band_plot(grid, stack, window, position=122)
+    plt.subplots_adjust(wspace = 0.5)
+
+def rule_sweep_plot(sweep, name, values, window):
+    '''
+    Plots number of magnet cycles, temperature holds and poor holds (left axis) and mean hold time (right axis) 
+    of one log versus the value of one validity threshold
+
+    Parameters
+    ----------
+    sweep : RuleSweep
+        Rule sweep of the log
+    name : str
+        Threshold to sweep (a key of SEGMENT_RULES)
+    values : iterable
+        Values of the threshold
+    window : PlotWindow
+        Window containing MatPlotLib canvas which gets plotted to 
+
+    Returns
+    -------
+    results : DataFrame
+        Return of RuleSweep.sweep()
+
+    '''
+    results = sweep.sweep(name, values)
+    ax1 = window.canvas.fig.add_subplot(111)
+    ax1.set_xlabel(name)
+    ax1.set_ylabel('Count')
+    ax1.step(results.index, results['Regens'], where='mid', color='b', label='Magnet cycles')
+    ax1.step(results.index, results['Holds'], where='mid', color='g', label='Temp holds')
+    ax1.step(results.index, results['Poor Holds'], where='mid', color='r', label='Poor holds')
+    ax1.axvline(SEGMENT_RULES[name], color='gray', ls='--', lw=1)
+    ax2 = ax1.twinx()
+    ax2.set_ylabel('Mean Hold Time (hrs)')
+    ax2.plot(results.index, results['Mean Hold Time'], '.k-', lw=1, label='Mean hold time')
+    lines = ax1.get_lines()[:3] + ax2.get_lines()
+    ax1.legend(lines, [line.get_label() for line in lines], loc='best')
+    return results
+
+
+'''
+
+The functions below calculate and plot noise spectra of temperature holds
+Holds are resampled onto a uniform grid with align_phases(), cut into overlapping segments, and the Welch power spectral
+densities (PSD) of all segments of all holds are computed with one batched FFT
+
+'''
+
+
+#Frequency bands (Hz) of the band-limited RMS columns of noise_summary()
+NOISE_BANDS = {'Drift':(0, 1e-3), 'Mid':(1e-3, 1e-2), 'Fast':(1e-2, np.inf)}
+
+
+def hold_psd(regfiles, column='50 mK FAA', segment=1.0, step=None):
+    '''
+    Calculates the Welch PSD of one column of every temperature hold (Hann window, 50% overlap, mean removed per segment)
+
+    Parameters
+    ----------
+    regfiles : dict
+        Dictionary of temperature hold logs after temp_hold() (or return of collect_phases() for holds of several runs)
+    column : str
+        Column to analyze
+    segment : float
+        Welch segment length in hours. The lowest resolved frequency is 1/segment
+    step : float, optional
+        Grid spacing in hours. Defaults to the median sample spacing of all holds
+
+    Returns
+    -------
+    freqs : ndarray
+        Frequencies in Hz, shape (nfreqs,)
+    psd : ndarray
+        One-sided PSD (K^2/Hz), shape (number of holds, nfreqs). Rows of holds shorter than one segment are NaN
+    labels : list
+        Hold keys in row order. All three are empty if there are no holds
+
+    '''
+    if not regfiles:
+        return np.empty(0), np.empty((0, 0)), []
+    #Missing readings are skipped, so the grid is interpolated across them
+    phases = {key:log.loc[log[column].notna()] for key,log in regfiles.items()}
+    grid, stack, labels = align_phases(phases, column, step)
+    step = grid[1] - grid[0]
+    fs = 1 / (step * 3600)
+    nperseg = int(round(segment / step))
+    hop = nperseg // 2
+    lengths = np.sum(~np.isnan(stack), axis=1)
+    nfreqs = nperseg // 2 + 1
+    if stack.shape[1] < nperseg:
+        return np.fft.rfftfreq(nperseg, 1/fs), np.full((len(labels), nfreqs), np.nan), labels
+    #Every segment start of every hold; keep segments that end within their hold 
+    windows = np.lib.stride_tricks.sliding_window_view(stack, nperseg, axis=1)[:, ::hop]
+    starts = np.arange(windows.shape[1]) * hop
+    valid = starts[None,:] + nperseg <= lengths[:,None]
+    segments = windows[valid]
+    rows = np.nonzero(valid)[0]
+    #One FFT for all segments of all holds
+    taper = np.hanning(nperseg + 1)[:-1]
+    spectra = np.abs(np.fft.rfft((segments - segments.mean(axis=1, keepdims=True)) * taper, axis=1))**2 / (fs * np.sum(taper**2))
+    spectra[:, 1:nfreqs - (nperseg % 2 == 0)] *= 2
+    #Average the segments of each hold
+    counts = np.bincount(rows, minlength=len(labels))
+    psd = np.zeros((len(labels), nfreqs))
+    np.add.at(psd, rows, spectra)
+    with np.errstate(invalid='ignore'):
+        psd /= counts[:,None]
+    return np.fft.rfftfreq(nperseg, 1/fs), psd, labels
+
+def band_rms(freqs, psd, bands=NOISE_BANDS):
+    '''
+    Integrates PSDs over frequency bands
+
+    Parameters
+    ----------
+    freqs, psd :
+        Return of hold_psd()
+    bands : dict
+        Band names and (low, high) frequencies in Hz. The DC bin is excluded
+
+    Returns
+    -------
+    rms : dict
+        Band names and RMS (square root of the integrated PSD) of each row of psd
+
+    '''
+    df = freqs[1] - freqs[0]
+    return {name:np.sqrt(np.sum(psd[:, (freqs > 0) & (freqs >= low) & (freqs < high)], axis=1) * df) for name,(low,high) in bands.items()}
+
+def noise_summary(regfiles, column='50 mK FAA', bands=NOISE_BANDS, segment=1.0, step=None):
+    '''
+    Creates spreadsheet of band-limited noise of the 50 mK stage for all temperature holds of a run
+    Separates slow drift from faster (e.g. pump or vibration) noise that the std dev of temp_summary() mixes together
+
+    Parameters
+    ----------
+    regfiles : dict
+        Dictionary of all temperature hold logs of a run, after temp_hold()
+    column : str
+        Column to analyze
+    bands : dict
+        Band names and (low, high) frequencies in Hz (see NOISE_BANDS)
+    segment, step : float
+        See hold_psd()
+
+    Returns
+    -------
+    noise_qtys : DataFrame
+        Index is date and time of the temperature hold 
+        Columns are '50 mK RMS <band>' (K) for each band. Empty if there are no holds
 
-def reg_3K_plots(regfiles, window):
     '''
-    Creates temperature plots of 3K stage for all temperature hold phases of a run 
-    Figure containing a variable number of subplots depending on the number of temperature holds in a run
-    Each subplot shows temperature of 3K stage versus time 
+    if not regfiles:
+        return pd.DataFrame(columns=['50 mK RMS {}'.format(name) for name in bands], index=pd.DatetimeIndex([]), dtype=float)
+    freqs, psd, labels = hold_psd(regfiles, column, segment, step)
+    rms = band_rms(freqs, psd, bands)
+    dates = [regfiles[key]['Date/Time'].iloc[0] for key in labels]
+    return pd.DataFrame({'50 mK RMS {}'.format(name):values for name,values in rms.items()}, index=dates).sort_index()
+
+def psd_waterfall(freqs, psd, labels, window, position=111):
+    '''
+    Plots PSDs of many holds as a waterfall: frequency (x), hold (y) and log PSD (color)
 
     Parameters
     ----------
-    regfiles : dict
-        Dictionary containing all temperature hold logs in a run 
+    freqs, psd, labels :
+        Return of hold_psd()
     window : PlotWindow
         Window containing MatPlotLib canvas which gets plotted to 
+    position : int
+        Subplot position passed to add_subplot (e.g. 121) 
 
     Returns
     -------
     None.
-        
+
     '''
-    tot = len(regfiles)
-    col = 3
-    row = tot // col
-    row += tot % col
-    position = range(1,tot + 1)
-    #Determine length of longest temperature hold
-    maxtime = np.max([reg.iloc[-1,1] for reg in regfiles.values()]) 
-    for i in range(tot):
-        ax = window.canvas.fig.add_subplot(row,col,position[i])
-        #Plot 3K stage
-        ax.plot(regfiles['reg{}'.format(i+1)].iloc[:,1], regfiles['reg{}'.format(i+1)].iloc[:,4], '-', label='3K Stage Diode') 
-        ax.set_xlabel('Hours after Reg')
-        ax.set_ylabel('Temperature (K)')
-        ax.set_xlim(-1,maxtime+1) #Set x axis limits based on longest temperature hold
-        ax.set_ylim(2.3,3.7)
-        ax.legend(loc='upper left', fontsize = 5) 
-        ax.set_title('Reg {} '.format(i+1) + str(regfiles['reg{}'.format(i+1)].iloc[0,0])[:10])
-        plt.subplots_adjust(wspace = 0.5, hspace=0.5)
+    ax = window.canvas.fig.add_subplot(position)
+    ax.set_xlabel('Frequency (Hz)')
+    if not labels:
+        ax.text(0.5, 0.5, 'No temperature holds', ha='center', va='center', transform=ax.transAxes)
+        return
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mesh = ax.pcolormesh(freqs[1:], np.arange(len(labels)), np.log10(psd[:,1:]), shading='nearest', cmap='viridis')
+    ax.set_xscale('log')
+    ax.set_yticks(np.arange(len(labels)))
+    ax.set_yticklabels(labels, fontsize='small')
+    window.canvas.fig.colorbar(mesh, ax=ax, label='log10 PSD (K$^2$/Hz)')
 
 
 '''
@@ -544,7 +2003,7 @@ The functions below calculate various summary quantities
 '''
 
 
-def temp_summary(regfiles, cryostat):
+def temp_summary(regfiles, cryostat, executor=None):
     '''
     Creates dictionary of temperature-related summary quantities for all temperature stages (i.e. 50 mK, 3K, etc) 
     and all temperature hold phases of a run.
@@ -553,6 +2012,10 @@ def temp_summary(regfiles, cryostat):
     ----------
     regfiles : dict
         Dictionary of all temperature hold logs of a run
+    cryostat : int
+        Cryostat model (107 or 102), for the temperature stages of LOG_SCHEMAS
+    executor : Executor, optional
+        Executor to process the phases on (see phase_executor()). Processed serially if None
 
     Returns
     -------
@@ -563,19 +2026,21 @@ def temp_summary(regfiles, cryostat):
             Columns are summary quantities for the given temperature stage (i.e. minimum, maximum, range, mean, standard deviation) 
 
     '''
-    #Slightly different logic depending on cryostat model due to unique column names 
-    if cryostat == 107:
-        temps = ['50 mK','He-3','3 K','50 K']
-        columns = [2,3,4,6]
-    elif cryostat == 102: 
-        temps = ['50 mK','1 K', 'Magnet Diode','60 K']
-        columns = [2,3,5,6]
+    #Temperature stages and their columns for the cryostat model
+    stages = LOG_SCHEMAS[cryostat]['stages']
+    columns = list(stages.values())
+    #For each temperature hold, the date and an array of summary quantities with one row per temperature stage
+    def stage_qtys(log):
+        values = log[columns].to_numpy(dtype=float)
+        low, high = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+        return log['Date/Time'].iloc[0], np.column_stack([low, high, high-low, np.nanmean(values, axis=0), np.nanstd(values, axis=0)])
+    all_qtys = phase_map(stage_qtys, regfiles.values(), executor)
+    dates = pd.DatetimeIndex([date for date, qtys in all_qtys])
+    qtys = np.array([qtys for date, qtys in all_qtys]).reshape(len(all_qtys), len(stages), 5)
     temp_qtys = {} #Initialize dictionary 
-    for i,j in zip(columns,temps): #Loop through each temperature stage
-        #Create an array of lists. Each list contains the date and summary quantities for a single temperature hold. 
-        qtys = np.array([[log.iloc[0,0], np.nanmin(log.iloc[:,i]), np.nanmax(log.iloc[:,i]), np.nanmax(log.iloc[:,i])-np.nanmin(log.iloc[:,i]), np.nanmean(log.iloc[:,i]), np.nanstd(log.iloc[:,i])] for log in regfiles.values()])
-        #Create DataFrame from array and store in dictionary 
-        temp_qtys[j] = pd.DataFrame(data=qtys[:,1:],index = qtys[:,0],columns = ['{} min'.format(j), '{} max'.format(j),'{} range'.format(j),'{} mean'.format(j),'{} std dev'.format(j)]).sort_index()
+    for n,j in enumerate(stages): #Loop through each temperature stage
+        #Create DataFrame of the summary quantities of the stage for all temperature holds and store in dictionary 
+        temp_qtys[j] = pd.DataFrame(data=qtys[:,n],index = dates,columns = ['{} min'.format(j), '{} max'.format(j),'{} range'.format(j),'{} mean'.format(j),'{} std dev'.format(j)]).sort_index()
     return temp_qtys
 
 def temp_summary_combine(temp_qtys, cryostat):
@@ -587,6 +2052,8 @@ def temp_summary_combine(temp_qtys, cryostat):
     ----------
     temp_qtys : dict
         Return of temp_summary(regfiles)
+    cryostat : int
+        Cryostat model (107 or 102)
 
     Returns
     -------
@@ -596,14 +2063,159 @@ def temp_summary_combine(temp_qtys, cryostat):
         Columns are summary quantities for all temperature stages (i.e. 50 mK min, 50 mK max, ... 50 K mean, 50 K std dev) 
 
     '''
-    #Slightly different logic depending on cryostat model due to unique column names 
-    if cryostat == 107:
-        temp_qtys_combined = pd.concat([temp_qtys['50 mK'],temp_qtys['He-3'],temp_qtys['3 K'],temp_qtys['50 K']],axis=1)
-    elif cryostat == 102:
-        temp_qtys_combined = pd.concat([temp_qtys['50 mK'],temp_qtys['1 K'],temp_qtys['3 K'],temp_qtys['60 K']],axis=1)
+    #Temperature stages in the order of the schema of the cryostat model
+    temp_qtys_combined = pd.concat([temp_qtys[stage] for stage in LOG_SCHEMAS[cryostat]['stages']],axis=1)
     return temp_qtys_combined
 
-def hold_summary(regfiles):
+def segment_energy(seconds, current, voltage, starts, ends):
+    '''
+    Integrates magnet power and current over many row ranges of the same arrays at once
+    Cumulative trapezoid sums are taken once over all rows; the integral over a row range is the difference of the
+    cumulative sums at its first and last rows, so steps between ranges are never counted
+
+    Parameters
+    ----------
+    seconds : ndarray
+        Time of each row in seconds
+    current, voltage : ndarray
+        Magnet current (A) and voltage (V) of each row
+    starts, ends : ndarray
+        First row and row after the last row of each range
+
+    Returns
+    -------
+    qtys : ndarray
+        Shape (number of ranges, 4): energy delivered (J), peak power (W), ramp-up charge (C) from the first row to the
+        row of maximum current, and ramp-down charge (C) from the row of maximum current to the last row
+
+    '''
+    starts, ends = np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+    current = np.nan_to_num(np.asarray(current, dtype=float))
+    power = current * np.nan_to_num(np.asarray(voltage, dtype=float))
+    dt = np.diff(seconds)
+    #Cumulative trapezoid integrals, with cumulative[k] the integral from row 0 to row k
+    energy = np.r_[0, np.cumsum(0.5 * (power[1:] + power[:-1]) * dt)]
+    charge = np.r_[0, np.cumsum(0.5 * (current[1:] + current[:-1]) * dt)]
+    last = ends - 1
+    #Maximum of each range with reduceat over interleaved (start, end) indices; every second result is a gap between ranges
+    edges = np.column_stack([starts, np.minimum(ends, len(current))]).ravel()
+    reduce = lambda ufunc, values: ufunc.reduceat(np.r_[values, values[-1]], edges)[::2]
+    peakpower = reduce(np.maximum, power)
+    #First row of maximum current in each range
+    maxcurrent = reduce(np.maximum, current)
+    lengths = ends - starts
+    ranges = np.repeat(np.arange(len(starts)), lengths)
+    inrange = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+    first = np.full(len(starts), np.iinfo(np.int64).max)
+    atmax = current[inrange] == maxcurrent[ranges]
+    np.minimum.at(first, ranges[atmax], inrange[atmax])
+    return np.column_stack([energy[last] - energy[starts], peakpower, charge[first] - charge[starts], charge[last] - charge[first]])
+
+def phase_energy(phases):
+    '''
+    Calculates magnet energy and power quantities of every phase log in a dictionary
+    The columns of all phases are joined into single arrays for segment_energy(), so no per-phase work is done in pandas
+
+    Parameters
+    ----------
+    phases : dict
+        Dictionary of phase logs (e.g. regenfiles or regfiles)
+
+    Returns
+    -------
+    energy_qtys : DataFrame
+        Index is the dictionary key of the phase 
+        Columns are 'Energy (J)', 'Peak Power (W)', 'Ramp-up Charge (C)' and 'Ramp-down Charge (C)'
+
+    '''
+    columns = ['Energy (J)', 'Peak Power (W)', 'Ramp-up Charge (C)', 'Ramp-down Charge (C)']
+    if not phases:
+        return pd.DataFrame(columns=columns)
+    lengths = np.array([len(log) for log in phases.values()])
+    ends = np.cumsum(lengths)
+    seconds = np.concatenate([(log['Date/Time'].to_numpy() - log['Date/Time'].to_numpy()[0]) / np.timedelta64(1, 's') for log in phases.values()])
+    current = np.concatenate([log['Magnet Current'].to_numpy(dtype=float) for log in phases.values()])
+    voltage = np.concatenate([log['Magnet Voltage'].to_numpy(dtype=float) for log in phases.values()])
+    return pd.DataFrame(segment_energy(seconds, current, voltage, ends - lengths, ends), index=list(phases.keys()), columns=columns)
+
+def log_phase_energy(log, bounds):
+    '''
+    Calculates magnet energy and power quantities of phases from the entire log and their row ranges, without slicing the log
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted log. Return of load_log(), load_107() or load_102()
+    bounds : dict
+        Row ranges of phases (e.g. one of the dictionaries returned by phase_bounds())
+
+    Returns
+    -------
+    energy_qtys : DataFrame
+        As returned by phase_energy()
+
+    '''
+    seconds = (log['Date/Time'].to_numpy() - log['Date/Time'].to_numpy()[0]) / np.timedelta64(1, 's')
+    starts, ends = np.array(list(bounds.values()), dtype=np.int64).reshape(-1, 2).T
+    qtys = segment_energy(seconds, log['Magnet Current'].to_numpy(dtype=float), log['Magnet Voltage'].to_numpy(dtype=float), starts, ends)
+    return pd.DataFrame(qtys, index=list(bounds.keys()), columns=['Energy (J)', 'Peak Power (W)', 'Ramp-up Charge (C)', 'Ramp-down Charge (C)'])
+
+def hold_current_qtys(times, current):
+    '''
+    Calculates the hold time, max current and rates of magnet current decrease of one temperature hold from its arrays
+    The hold starts at the row of maximum current. Used by hold_phase_qtys() and Phase.hold_qtys (see cryostat_run.py)
+
+    Parameters
+    ----------
+    times : ndarray
+        "Date/Time" of each row (datetime64)
+    current : ndarray
+        Magnet current of each row (A)
+
+    Returns
+    -------
+    qtys : list
+        Hold time, max current, and current rates 1, 2 and 3 of the temperature hold 
+
+    '''
+    #Start from when magnet reaches maximum current (missing readings are skipped) and reset hours to 0
+    start = int(np.argmax(np.where(np.isnan(current), -np.inf, current)))
+    hours = (times[start:]-times[start])/np.timedelta64(1, 's')/3600
+    current = current[start:]
+    holdtime = hours[-1] #Hold time = last entry of hours
+    maxcurrent = np.nanmax(current) #Find max current
+    #Calculate rate of magnet current decrease 3 different ways
+    slope1 = stats.linregress(hours,current)[0] #scipy linear regression
+    slope2 = (current[-1]-current[0])/hours[-1] #maximum current / hold time
+    slope3 = np.mean(np.diff(current)/np.diff(hours)) #average rate of change 
+    return [holdtime, maxcurrent, slope1, slope2, slope3]
+
+def hold_table(qtys):
+    '''
+    Creates the spreadsheet of hold_summary() from the [date, hold time, max current, rates 1, 2, 3] of each temperature hold 
+
+    '''
+    qtys = np.array(qtys, dtype=object).reshape(-1, 6)
+    return pd.DataFrame(data=qtys[:,1:],index = qtys[:,0],columns = ['Hold Time', 'Max Current','Current Rate 1','Current Rate 2','Current Rate 3'])
+
+def hold_phase_qtys(log):
+    '''
+    Calculates magnet-related summary quantities of one temperature hold. Used by hold_summary()
+
+    Parameters
+    ----------
+    log : DataFrame
+        Temperature hold log
+
+    Returns
+    -------
+    qtys : list
+        Date and time, hold time, max current, and current rates 1, 2 and 3 of the temperature hold 
+
+    '''
+    return [log['Date/Time'].iloc[0]] + hold_current_qtys(log['Date/Time'].to_numpy(), log['Magnet Current'].to_numpy(dtype=float))
+
+def hold_summary(regfiles, executor=None, energy=False):
     '''
     Creates spreadsheet of magnet-related summary quantities for all temperature holds of a run.
     
@@ -611,6 +2223,10 @@ def hold_summary(regfiles):
     ----------
     regfiles : dict
         Dictionary of all temperature hold logs of a run 
+    executor : Executor, optional
+        Executor to process the phases on (see phase_executor()). Processed serially if None
+    energy : bool
+        Add the magnet energy and power columns of phase_energy()
 
     Returns
     -------
@@ -620,23 +2236,205 @@ def hold_summary(regfiles):
         Columns are summary quantities (i.e. hold time, maximum current, rate of current decrease 1, etc) 
 
     '''
-    qtys = [] #Initialize list which will store lists of summary quantities for each temperature hold phase
-    for log in regfiles.values(): #Loop through all temperature hold phases in a run 
-        #Revise each log: select relevant rows, start log from when magnet reaches maximum current, and reset index and "Hours after Start" to 0
-        hold = log.iloc[np.argmax(log['Magnet Current']):,[0,1,8]].reset_index(drop=True)
-        hold["Hours after Start"] = (hold['Date/Time']-hold.iloc[0,0]).dt.total_seconds()/3600
-        holdtime = hold.iloc[-1,1] #Hold time = last entry of "Hours after Start" column 
-        maxcurrent = np.max(hold['Magnet Current']) #Find max current
-        #Calculate rate of magnet current decrease 3 different ways
-        slope1 = stats.linregress(hold['Hours after Start'],hold['Magnet Current'])[0] #scipy linear regression
-        slope2 = (hold.iloc[-1,2]-hold.iloc[0,2])/hold.iloc[-1,1] #maximum current / hold time
-        slope3 = np.mean(np.diff(hold['Magnet Current'])/np.diff(hold['Hours after Start'])) #average rate of change 
-        #Append list of summary quantities for a temp hold log to list
-        qtys.append([log.iloc[0,0], holdtime, maxcurrent, slope1, slope2, slope3])
-    qtys = np.asarray(qtys) #Convert to numpy array 
-    #Create Dataframe from array 
-    hold_qtys = pd.DataFrame(data=qtys[:,1:],index = qtys[:,0],columns = ['Hold Time', 'Max Current','Current Rate 1','Current Rate 2','Current Rate 3']).sort_index()
-    return hold_qtys
+    #List of summary quantities for each temperature hold phase in a run 
+    qtys = phase_map(hold_phase_qtys, regfiles.values(), executor)
+    #Create Dataframe from the lists
+    hold_qtys = hold_table(qtys)
+    if energy:
+        hold_qtys = pd.concat([hold_qtys, phase_energy(regfiles).set_axis(hold_qtys.index)], axis=1)
+    return hold_qtys.sort_index()
+
+#Columns of hold_decay()
+DECAY_COLUMNS = ['Decay Amplitude', 'Decay Amplitude Error', 'Decay Time', 'Decay Time Error', 'Decay Offset', 'Decay Offset Error',
+                 'Predicted Hold Time', 'Predicted Hold Time Error', 'Fit RMS']
+
+def stack_padded(arrays, fill=0.0):
+    '''
+    Stacks 1D arrays of different lengths into one padded 2D array
+
+    Returns
+    -------
+    stack : ndarray
+        Shape (number of arrays, longest length), rows padded with fill
+    mask : ndarray
+        True where stack holds a value of the arrays
+
+    '''
+    lengths = np.array([len(array) for array in arrays], dtype=np.int64)
+    mask = np.arange(lengths.max(initial=0)) < lengths[:,None]
+    stack = np.full(mask.shape, fill, dtype=float)
+    stack[mask] = np.concatenate(arrays) if len(arrays) else []
+    return stack, mask
+
+def fit_decay(times, currents, iterations=50, rates=np.logspace(-3, 1, 25)):
+    '''
+    Fits the decay model I(t) = a*exp(-k*t) + c to many current curves at once
+    The curves are stacked into padded arrays. Starting values come from a grid of rates k, where a and c follow from
+    linear least squares; they are refined by Levenberg-Marquardt (damped Gauss-Newton) steps taken for all curves together,
+    until the steps no longer lower the residual of any curve
+
+    Parameters
+    ----------
+    times : list
+        Arrays of times (hours) of each curve
+    currents : list
+        Arrays of magnet currents (A) of each curve
+    iterations : int
+        Maximum number of Gauss-Newton steps
+    rates : ndarray
+        Grid of rates k (1/hours) for the starting values
+
+    Returns
+    -------
+    params : ndarray
+        Shape (number of curves, 3): fitted a, k and c of each curve
+    cov : ndarray
+        Shape (number of curves, 3, 3): covariance of the fitted parameters. NaN for curves with 3 points or fewer
+    rms : ndarray
+        RMS residual (A) of each curve
+
+    '''
+    t, mask = stack_padded(times)
+    y, _ = stack_padded(currents)
+    #Remove missing readings from the fit
+    mask &= ~np.isnan(y)
+    y[~mask] = 0
+    weight = mask.astype(float)
+    points = weight.sum(axis=1)
+
+    def model(rows, a, k, c):
+        #Masked exp(-k*t) values, residuals and residual sum of squares of some curves
+        with np.errstate(over='ignore', invalid='ignore'):
+            e = np.exp(-k[:,None]*t[rows])*weight[rows]
+            r = (y[rows] - a[:,None]*e - c[:,None])*weight[rows]
+        return e, r, np.nan_to_num((r*r).sum(axis=1), nan=np.inf)
+
+    def normal(rows, a, e, r):
+        #J'J and J'r of the Jacobian columns exp(-k*t), -a*t*exp(-k*t) and 1, from sums over the points
+        te = t[rows]*e
+        see, stee, sttee, se, ste = (e*e).sum(1), (te*e).sum(1), (te*te).sum(1), e.sum(1), te.sum(1)
+        jtj = np.stack([np.stack([see, -a*stee, se], 1), np.stack([-a*stee, a*a*sttee, -a*ste], 1), np.stack([se, -a*ste, points[rows]], 1)], 1)
+        jtr = np.stack([(e*r).sum(1), -a*(te*r).sum(1), r.sum(1)], 1)
+        return jtj, jtr
+
+    #Starting values: best rate on the grid, with a and c from the 2x2 normal equations
+    #Every few points are enough for starting values
+    stride = max(1, t.shape[1]//256)
+    ts, ys, ws = t[:,::stride], y[:,::stride], weight[:,::stride]
+    ns, sy, syy = ws.sum(axis=1), ys.sum(axis=1), (ys*ys).sum(axis=1)
+    best = np.full(len(t), np.inf)
+    a, k, c = np.zeros(len(t)), np.full(len(t), rates[0]), np.zeros(len(t))
+    for rate in rates:
+        e = np.exp(-rate*ts)*ws
+        see, se, sey = (e*e).sum(1), e.sum(1), (e*ys).sum(1)
+        det = see*ns - se*se
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ra = np.where(det != 0, (sey*ns - se*sy)/det, 0)
+            rc = np.where(det != 0, (see*sy - se*sey)/det, sy/np.maximum(ns, 1))
+        #Residual sum of squares at the least-squares solution
+        rss = syy - ra*sey - rc*sy
+        better = rss < best
+        best[better], a[better], k[better], c[better] = rss[better], ra[better], rate, rc[better]
+
+    #Levenberg-Marquardt steps, accepted per curve only where they lower the residual
+    #Curves whose steps stop lowering the residual are dropped from later steps
+    active = np.arange(len(t))
+    damping = np.full(len(t), 1e-3)
+    e, r, rss = model(active, a, k, c)
+    for _ in range(iterations):
+        if not len(active):
+            break
+        jtj, jtr = normal(active, a[active], e, r)
+        damped = jtj + damping[active,None,None]*(jtj*np.eye(3)) + 1e-12*np.eye(3)
+        step = np.linalg.solve(damped, jtr[:,:,None])[:,:,0]
+        trial = np.column_stack([a[active], k[active], c[active]]) + step
+        te, tr, trss = model(active, *trial.T)
+        accept = trss < rss
+        #Keep curves whose step lowered the residual noticeably, or was rejected with damping still below its limit
+        keep = np.where(accept, rss - trss > 1e-10*rss, damping[active] < 1e5)
+        a[active[accept]], k[active[accept]], c[active[accept]] = trial[accept].T
+        damping[active] = np.where(accept, damping[active]/10, damping[active]*10)
+        e[accept], r[accept], rss[accept] = te[accept], tr[accept], trss[accept]
+        active, e, r, rss = active[keep], e[keep], r[keep], rss[keep]
+
+    #Covariance from the residual variance and the Jacobian at the solution
+    rows = np.arange(len(t))
+    e, r, rss = model(rows, a, k, c)
+    jtj = normal(rows, a, e, r)[0]
+    dof = points - 3
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = np.linalg.pinv(jtj)*np.where(dof > 0, rss/dof, np.nan)[:,None,None]
+        rms = np.sqrt(rss/points)
+    return np.column_stack([a, k, c]), cov, rms
+
+def decay_hold_time(params, cov, end_current):
+    '''
+    Predicts when fitted decays reach a current, with the uncertainty propagated from the fit covariance
+
+    Parameters
+    ----------
+    params, cov : ndarray
+        Return of fit_decay()
+    end_current : float
+        Magnet current (A) at which the temperature hold ends
+
+    Returns
+    -------
+    holdtime, error : ndarray
+        Predicted hours after the start of each curve, and its standard error
+        Infinite where the fitted offset is above end_current, 0 where the curve starts below it
+
+    '''
+    a, k, c = params.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u = (end_current - c)/a
+        holdtime = np.where(u <= 0, np.inf, np.where(u >= 1, 0.0, -np.log(u)/k))
+        #Gradient of -ln((end_current - c)/a)/k with respect to a, k and c
+        gradient = np.column_stack([1/(k*a), np.log(u)/k**2, 1/(k*(end_current - c))])
+        error = np.sqrt(np.einsum('ni,nij,nj->n', gradient, cov, gradient))
+    error = np.where(np.isfinite(holdtime) & (holdtime > 0), error, np.nan)
+    return holdtime, error
+
+def hold_decay(regfiles, end_current=None, iterations=50):
+    '''
+    Fits an exponential decay to the magnet current of every temperature hold at once and predicts the hold times
+    Like hold_summary(), each hold starts when the magnet reaches maximum current
+
+    Parameters
+    ----------
+    regfiles : dict
+        Dictionary of temperature hold logs (e.g. of one run, or of many runs with unique keys)
+    end_current : float, optional
+        Magnet current (A) at which a hold ends. Defaults to the 'magnet_on_current' rule of SEGMENT_RULES
+    iterations : int
+        Maximum number of Gauss-Newton steps of fit_decay()
+
+    Returns
+    -------
+    decay_qtys : DataFrame
+        Index is date and time of temperature hold
+        Columns are DECAY_COLUMNS: fitted amplitude (A), decay time 1/k (hours) and offset (A) of I(t) = a*exp(-t/tau) + c,
+        each with its standard error, the predicted hold time (hours after maximum current) with its standard error, 
+        and the RMS residual (A)
+
+    '''
+    if end_current is None:
+        end_current = SEGMENT_RULES['magnet_on_current']
+    dates, times, currents = [], [], []
+    for log in regfiles.values():
+        current = log['Magnet Current'].to_numpy(dtype=float)
+        peak = np.nanargmax(current)
+        dates.append(log['Date/Time'].iloc[0])
+        times.append((log['Date/Time'].to_numpy()[peak:] - log['Date/Time'].to_numpy()[peak])/np.timedelta64(1, 'h'))
+        currents.append(current[peak:])
+    if not dates:
+        return pd.DataFrame(columns=DECAY_COLUMNS)
+    params, cov, rms = fit_decay(times, currents, iterations)
+    holdtime, holderror = decay_hold_time(params, cov, end_current)
+    errors = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+    a, k, c = params.T
+    qtys = np.column_stack([a, errors[:,0], 1/k, errors[:,1]/k**2, c, errors[:,2], holdtime, holderror, rms])
+    return pd.DataFrame(qtys, index=dates, columns=DECAY_COLUMNS).sort_index()
 
 def coolwarm_time(coolwarm_log):
     '''
@@ -659,13 +2457,194 @@ def coolwarm_time(coolwarm_log):
         #Cooldown/warmup defined as 50 mK stage above 3.5 K and below 286 K
         coolwarm_log = coolwarm_log.loc[(coolwarm_log['50 mK FAA']<286) & (coolwarm_log['50 mK FAA']>3.5)]
         coolwarm_log.reset_index(drop=True, inplace = True)
-        coolwarm_log["Hours after Start"] = (coolwarm_log['Date/Time']-coolwarm_log.iloc[0,0]).dt.total_seconds()/3600
-        coolwarm_time = coolwarm_log.iloc[-1,1] #Cooldown/warmup time is last entry of "Hours after Start" column 
+        coolwarm_log["Hours after Start"] = (coolwarm_log['Date/Time']-coolwarm_log['Date/Time'].iloc[0]).dt.total_seconds()/3600
+        coolwarm_time = coolwarm_log['Hours after Start'].iloc[-1] #Cooldown/warmup time is last entry of "Hours after Start" column 
         return coolwarm_time
     #If there is no full cooldown or warmup, return error message
     else:
         return "No full cooldown or warmup logged"
     
+#Temperatures (K) whose first crossing is found by coolwarm_crossings()
+COOLWARM_THRESHOLDS = (286, 250, 200, 150, 100, 77, 50, 20, 10, 4, 3.5)
+
+def first_crossings(hours, values, thresholds, falling, rate_hours=0.25):
+    '''
+    Finds when a temperature first crosses each of several thresholds, in one vectorized search
+    Readings of 0 or 500 and above (missing or disconnected sensor) are ignored. A threshold counts as crossed only if
+    the first valid reading is on the other side of it
+
+    Parameters
+    ----------
+    hours : ndarray
+        Time of each row in hours
+    values : ndarray
+        Temperature of each row (K)
+    thresholds : ndarray
+        Temperatures (K) to cross
+    falling : bool
+        Find downward crossings (cooldown) if True, upward crossings (warmup) if False
+    rate_hours : float
+        Half width (hours) of the interval the rate is taken over, centered on the crossing
+
+    Returns
+    -------
+    times : ndarray
+        Hours of the first crossing of each threshold, interpolated between rows. NaN if not crossed
+    rates : ndarray
+        Rate of temperature change (K/hr) at each crossing. NaN if not crossed
+
+    '''
+    thresholds = np.asarray(thresholds, dtype=float)
+    valid = np.isfinite(values) & (values > 0) & (values < 500)
+    hours, values = hours[valid], values[valid]
+    if len(values) < 2:
+        return np.full(len(thresholds), np.nan), np.full(len(thresholds), np.nan)
+    #Rows x thresholds matrix of which side of each threshold every reading is on
+    crossed = values[:,None] <= thresholds if falling else values[:,None] >= thresholds
+    first = np.argmax(crossed, axis=0)
+    found = crossed.any(axis=0) & (first > 0)
+    after = np.where(found, first, 1)
+    h0, h1, v0, v1 = hours[after-1], hours[after], values[after-1], values[after]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(v1 != v0, (thresholds - v0)/(v1 - v0), 1.0)
+        times = np.where(found, h0 + fraction*(h1 - h0), np.nan)
+        early, late = np.maximum(times - rate_hours, hours[0]), np.minimum(times + rate_hours, hours[-1])
+        rates = (np.interp(late, hours, values) - np.interp(early, hours, values))/(late - early)
+    return times, np.where(found, rates, np.nan)
+
+def coolwarm_crossings(coolwarm_log, cryostat=107, thresholds=COOLWARM_THRESHOLDS, rate_hours=0.25):
+    '''
+    Calculates when every temperature stage of a cooldown or warmup crosses each of a set of thresholds, and its 
+    rate of temperature change at the crossing. Unlike coolwarm_time(), the log is not filtered or copied
+
+    Parameters
+    ----------
+    coolwarm_log : DataFrame
+        Cooldown or warmup log (e.g. the first or last log of split_107()). A cooldown if the 50 mK stage ends colder than it starts
+    cryostat : int
+        107 or 102, for the stage columns (see LOG_SCHEMAS)
+    thresholds : tuple
+        Temperatures (K) to cross
+    rate_hours : float
+        Half width (hours) of the interval the rate is taken over (see first_crossings())
+
+    Returns
+    -------
+    crossings : DataFrame
+        Index is the threshold temperature
+        Columns are '<stage> time' (hours after the start of the log, NaN if not crossed) and '<stage> rate' (K/hr) of each stage
+
+    '''
+    hours = (coolwarm_log['Date/Time'].to_numpy() - coolwarm_log['Date/Time'].to_numpy()[0])/np.timedelta64(1, 'h')
+    stages = LOG_SCHEMAS[cryostat]['stages']
+    values = coolwarm_log[list(stages.values())].to_numpy(dtype=float)
+    #Direction from the 50 mK stage, ignoring missing readings
+    faa = values[:,0][np.isfinite(values[:,0]) & (values[:,0] > 0) & (values[:,0] < 500)]
+    falling = len(faa) > 0 and faa[-1] < faa[0]
+    crossings = {}
+    for n, stage in enumerate(stages):
+        crossings['{} time'.format(stage)], crossings['{} rate'.format(stage)] = first_crossings(hours, values[:,n], thresholds, falling, rate_hours)
+    return pd.DataFrame(crossings, index=pd.Index(thresholds, name='Threshold (K)', dtype=float))
+
+def coolwarm_run(log, cryostat=107, thresholds=COOLWARM_THRESHOLDS):
+    '''
+    Calculates the threshold crossings of the cooldown and warmup of a run
+    The cooldown and warmup are the first and last phase logs, as in coolwarm_time()
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted log. Return of load_107() or load_102()
+    cryostat : int
+        107 or 102
+    thresholds : tuple
+        Temperatures (K) to cross
+
+    Returns
+    -------
+    crossings : DataFrame
+        Rows of coolwarm_crossings() for the cooldown and then the warmup, with a 'Phase' column and a default index
+
+    '''
+    bounds = list(phase_bounds(log, cryostat=cryostat)[0].values())
+    phases = []
+    for phase, (start, end) in zip(['cooldown','warmup'], [bounds[0], bounds[-1]]):
+        crossings = coolwarm_crossings(log.iloc[start:end], cryostat, thresholds).reset_index()
+        crossings.insert(0, 'Phase', phase)
+        phases.append(crossings)
+    return pd.concat(phases, ignore_index=True)
+
+def coolwarm_file(logpath, cryostat=107, thresholds=COOLWARM_THRESHOLDS):
+    '''
+    Calculates the threshold crossings of the cooldown and warmup of one log file. Used by coolwarm_survey()
+
+    Returns
+    -------
+    crossings : DataFrame
+        Return of coolwarm_run() with a 'Run' column, or None if the log cannot be loaded
+
+    '''
+    try:
+        log = load_log(logpath, cryostat)
+    except (OSError, ValueError, pd.errors.ParserError):
+        return None
+    crossings = coolwarm_run(log, cryostat, thresholds)
+    crossings.insert(0, 'Run', str(log['Date/Time'].iloc[0])[:10])
+    return crossings
+
+def coolwarm_survey(loglist, cryostat=107, thresholds=COOLWARM_THRESHOLDS, executor=None):
+    '''
+    Calculates the threshold crossings of the cooldown and warmup of many log files, to follow how cooldowns and 
+    warmups change over the lifetime of the cryostat
+
+    Parameters
+    ----------
+    loglist : list
+        List of log filepaths (e.g. log_files(directory))
+    cryostat : int
+        107 or 102
+    thresholds : tuple
+        Temperatures (K) to cross
+    executor : Executor, optional
+        Executor to process the log files on, e.g. a ProcessPoolExecutor. Processed serially if None
+
+    Returns
+    -------
+    crossings : DataFrame
+        One row per log file, phase and threshold: 'Run', 'Phase' ('cooldown' or 'warmup'), 'Threshold (K)' and the 
+        columns of coolwarm_crossings(), sorted by run. Log files that cannot be loaded are left out
+
+    '''
+    files = phase_map(functools.partial(coolwarm_file, cryostat=cryostat, thresholds=thresholds), loglist, executor)
+    files = [crossings for crossings in files if crossings is not None]
+    if not files:
+        return pd.DataFrame(columns=['Run','Phase','Threshold (K)'])
+    return pd.concat(files, ignore_index=True).sort_values(['Run','Phase'], kind='stable', ignore_index=True)
+
+def magnet_cycle_time(times, current):
+    '''
+    Calculates magnet cycle time in hours from the arrays of a magnet cycle log: the time between the first and last rows
+    where the magnet current is above 0.006 A. Used by regen_time() and Phase.regen_time (see cryostat_run.py)
+
+    Parameters
+    ----------
+    times : ndarray
+        "Date/Time" of each row (datetime64)
+    current : ndarray
+        Magnet current of each row (A)
+
+    '''
+    rows = np.flatnonzero(current>0.006)
+    return (times[rows[-1]]-times[rows[0]])/np.timedelta64(1, 's')/3600
+
+def regen_table(keys, times):
+    '''
+    Creates the DataFrame of regen_summary() from the keys ('regen1', 'regen2', ...) and times of the magnet cycles 
+
+    '''
+    qtys = np.array([np.array([key[5:],time]) for key, time in zip(keys, times)]).reshape(-1, 2)
+    return pd.DataFrame(data=qtys[:,1],index = qtys[:,0], columns = ['Regen times'])
+
 def regen_time(regen_log):
     '''
     Calculates magnet cycle time. 
@@ -681,14 +2660,9 @@ def regen_time(regen_log):
         Magnet cycle time in hours 
 
     '''
-    #Select rows where magnet current is above 0.006 A
-    regen_log = regen_log.loc[regen_log['Magnet Current']>0.006] 
-    regen_log.reset_index(drop=True, inplace = True)
-    regen_log["Hours after Start"] = (regen_log['Date/Time']-regen_log.iloc[0,0]).dt.total_seconds()/3600
-    regen_time = regen_log.iloc[-1,1] #Magnet cycle time is last entry of "Hours after Start" column 
-    return regen_time
+    return magnet_cycle_time(regen_log['Date/Time'].to_numpy(), regen_log['Magnet Current'].to_numpy(dtype=float))
 
-def regen_summary(regenfiles): 
+def regen_summary(regenfiles, executor=None, energy=False): 
     '''
     Creates DataFrame of magnet cycle times for all magnet cycles in a run
 
@@ -696,6 +2670,10 @@ def regen_summary(regenfiles):
     ----------
     regenfiles : dict
         Dictionary of all magnet cycle logs in a run
+    executor : Executor, optional
+        Executor to process the phases on (see phase_executor()). Processed serially if None
+    energy : bool
+        Add the magnet energy and power columns of phase_energy()
 
     Returns
     -------
@@ -705,10 +2683,137 @@ def regen_summary(regenfiles):
 
     '''
     #Create array of lists, with each list containing the magnet cycle number and magnet cycle time for a magnet cycle.
-    qtys = np.array([np.array([key[5:],regen_time(log)]) for key, log in regenfiles.items()])
-    #Create DataFrame from array 
-    regen_times = pd.DataFrame(data=qtys[:,1],index = qtys[:,0], columns = ['Regen times']).sort_index().reset_index(drop=True)
-    return regen_times
+    times = phase_map(regen_time, regenfiles.values(), executor)
+    #Create DataFrame from the cycle numbers and times
+    regen_times = regen_table(regenfiles.keys(), times)
+    if energy:
+        regen_times = pd.concat([regen_times, phase_energy(regenfiles).set_axis(regen_times.index)], axis=1)
+    return regen_times.sort_index().reset_index(drop=True)
+
+
+'''
+
+The functions below score summary quantities of many temperature holds and magnet cycles for anomalies
+
+'''
+
+
+def catalog_summary(loglist, dedup=True):
+    '''
+    Creates catalogs of per-hold and per-magnet-cycle summary quantities across multiple log files
+
+    Parameters
+    ----------
+    loglist : list
+        List of 107 log filepaths
+    dedup : bool
+        Skip data repeated across the log files (see unique_spans()), so no hold or magnet cycle is counted twice
+
+    Returns
+    -------
+    holds : DataFrame
+        One row per temperature hold of every log file 
+        Index is date and time of the temperature hold 
+        Columns are 'Run', 'Phase', 'Setpoint', the columns of hold_summary() and '50 mK std dev' 
+    regens : DataFrame
+        One row per magnet cycle of every log file 
+        Index is date and time of the magnet cycle 
+        Columns are 'Run', 'Phase' and 'Regen times' 
+
+    '''
+    holds = [] #Initialize lists which will store one DataFrame per log file 
+    regens = []
+    spans = unique_spans(loglist) if dedup else {}
+    for path in loglist: 
+        if spans.get(path) == []: #Log holds no unique data 
+            continue
+        dicts = split_unique(path, spans.get(path))
+        if not dicts[0]: #Log holds no phase 
+            continue
+        #Date of the first loaded row; the unique data of a log need not start at its first phase 
+        run = str(next(iter(dicts[0].values()))['Date/Time'].iloc[0])[:10]
+        regs = temp_hold(dicts[2]) 
+        if regs:
+            hold = hold_summary(regs).astype(float)
+            hold['50 mK std dev'] = temp_summary(regs,107)['50 mK']['50 mK std dev'].astype(float)
+            #Setpoint and key of each hold, indexed by date and time like hold_summary() 
+            info = pd.DataFrame({'Run':run, 'Phase':list(regs.keys()), 'Setpoint':[reg['Temperature Setpoint'].iloc[0] for reg in regs.values()]}, index=[reg['Date/Time'].iloc[0] for reg in regs.values()])
+            holds.append(info.join(hold))
+        if dicts[1]:
+            regens.append(pd.DataFrame({'Run':run, 'Phase':list(dicts[1].keys()), 'Regen times':[regen_time(regen) for regen in dicts[1].values()]}, index=[regen['Date/Time'].iloc[0] for regen in dicts[1].values()]))
+    #Without holds or magnet cycles the catalogs are empty but have every column, so anomaly_scores() can score them
+    holds = pd.concat(holds).sort_index() if holds else pd.DataFrame(columns=['Run','Phase','Setpoint'] + list(hold_table([]).columns) + ['50 mK std dev'])
+    regens = pd.concat(regens).sort_index() if regens else pd.DataFrame(columns=['Run','Phase','Regen times'])
+    return holds, regens
+
+def robust_zscores(qtys, groups=None):
+    '''
+    Calculates robust z-scores of summary quantities: (value - median) / (1.4826 * MAD), with median and MAD taken per group
+    All columns and groups are scored in one vectorized pass 
+    Groups with zero MAD are scaled by the mean absolute deviation instead; groups where every value is equal give NaN scores 
+
+    Parameters
+    ----------
+    qtys : DataFrame
+        Summary quantities to score, one column per quantity 
+    groups : array-like, optional
+        Group label of each row (e.g. rounded setpoint). All rows form one group if None 
+
+    Returns
+    -------
+    zscores : DataFrame
+        Robust z-scores with the same index and columns as qtys
+
+    '''
+    qtys = qtys.astype(float)
+    if groups is None:
+        groups = np.zeros(len(qtys))
+    groups = np.asarray(groups)
+    deviation = qtys - qtys.groupby(groups).transform('median')
+    absdev = deviation.abs().groupby(groups)
+    mad = 1.4826 * absdev.transform('median')
+    #Fall back to the mean absolute deviation where more than half of a group shares the median value 
+    mad = mad.mask(mad == 0, 1.2533 * absdev.transform('mean'))
+    zscores = deviation / mad.replace(0, np.nan)
+    return zscores
+
+def anomaly_scores(holds, regens, threshold=3.5):
+    '''
+    Flags anomalous temperature holds and magnet cycles using robust z-scores 
+    Hold quantities are scored per setpoint; magnet cycle times are scored across all cycles 
+
+    Parameters
+    ----------
+    holds, regens : DataFrame
+        Return of catalog_summary()
+    threshold : float
+        Phases with an absolute robust z-score above threshold for any quantity are flagged 
+
+    Returns
+    -------
+    holds : DataFrame
+        Copy of holds with a '<quantity> z' column for decay rate, hold time and 50 mK std dev and a boolean 'Anomaly' column 
+    regens : DataFrame
+        Copy of regens with a 'Regen times z' column and a boolean 'Anomaly' column 
+        Both have these columns (and no rows) if there are no holds or magnet cycles
+
+    '''
+    holds = holds.copy()
+    regens = regens.copy()
+    hold_columns = ['Current Rate 1','Hold Time','50 mK std dev']
+    if len(holds):
+        zscores = robust_zscores(holds[hold_columns], holds['Setpoint'].astype(float).round(6))
+        holds[[column + ' z' for column in hold_columns]] = zscores.to_numpy()
+        holds['Anomaly'] = (zscores.abs() > threshold).any(axis=1)
+    else:
+        holds = holds.reindex(columns=list(holds.columns) + [column + ' z' for column in hold_columns]).assign(Anomaly=pd.Series(dtype=bool))
+    if len(regens):
+        zscores = robust_zscores(regens[['Regen times']])
+        regens['Regen times z'] = zscores['Regen times']
+        regens['Anomaly'] = zscores['Regen times'].abs() > threshold
+    else:
+        regens = regens.reindex(columns=list(regens.columns) + ['Regen times z']).assign(Anomaly=pd.Series(dtype=bool))
+    return holds, regens
 
 
 '''
@@ -719,10 +2824,11 @@ They are specific to 107 log files
 '''
 
 
-def maxcurrent_holdtime(loglist, setpoint, window): 
+def maxcurrent_holdtime(loglist, setpoint, window, tol=1e-4, dedup=True): 
     '''
     Scatter plot of maximum magnet current versus hold time for temperature holds across multiple log files for a given setpoint temperature 
     Each log file has a unique marker color; legend shows date of each log file
+    Holds at the setpoint are found from the segment index of each log (see segment_index()), so only their rows are loaded
 
     Parameters
     ----------
@@ -732,29 +2838,62 @@ def maxcurrent_holdtime(loglist, setpoint, window):
         50 mK stage setpoint of interest (e.g. 0.06)
     window : PlotWindow
         Window containing MatPlotLib canvas which gets plotted to 
+    tol : float
+        Largest difference (K) between the setpoint of a hold and the setpoint of interest
+    dedup : bool
+        Skip holds repeated across the log files (see unique_spans())
 
     Returns
     -------
     None.
 
     '''
+    ax = maxcurrent_axes(window)
+    spans = unique_spans(loglist) if dedup else {}
+    for logpath in loglist: #Loop through log files 
+        if spans.get(logpath) != []:
+            maxcurrent_points(ax, maxcurrent_file(logpath, setpoint, tol, spans.get(logpath)))
+
+def maxcurrent_axes(window):
+    '''Adds the axes of maxcurrent_holdtime() to the figure of a window '''
     ax = window.canvas.fig.add_subplot(111) #Add subplot to figure of MPL canvas in window and assign it to varible ax
     ax.set_xlabel('Hold Time (hrs)')
     ax.set_ylabel('Max Current (A)')
-    num = len(loglist) #Number of log files 
-    for i in range(num): #Loop through number of log files 
-        log = load_107(loglist[i]) #Load and process each log file
-        label = str(log.iloc[0,0])[:10]
-        dicts = split_107(log)
-        regs = temp_hold(dicts[2]) #Dictionary of all, revised temperature hold logs
-        new_regs = {key:val for key, val in regs.items() if val.iloc[0,7] == setpoint}
-        if new_regs: 
-            hold = hold_summary(new_regs) #DataFrame of magnet-related summary quantities 
+    return ax
+
+def maxcurrent_file(logpath, setpoint, tol=1e-4, spans=None):
+    '''
+    Calculates the points of one log file for maxcurrent_holdtime()
+    Only holds inside the row ranges of spans (from unique_spans()) are loaded; all holds if spans is None
+
+    Returns
+    -------
+    label : str
+        Date of the log file
+    hold : DataFrame
+        Return of hold_summary() for the temperature holds at the setpoint, or None if there are none
+
+    '''
+    segments = segment_index(logpath) #Segment index of the log file 
+    label = segments['start'][:10]
+    #Load only the temperature holds at the setpoint 
+    holds = holds_at_setpoint(segments, setpoint, tol)
+    if spans is not None:
+        holds = {key:rows for key, rows in holds.items() if any(start <= rows[0] and rows[1] <= end for start, end in spans)}
+    new_regs = {key:load_hold(logpath, rows) for key, rows in holds.items()}
+    if new_regs: 
+        return (label, hold_summary(new_regs)) #DataFrame of magnet-related summary quantities 
+    return (label, None)
+
+def maxcurrent_points(ax, result):
+    '''Plots the return of maxcurrent_file() for one log file '''
+    label, hold = result
+    if hold is not None: 
         #Plot max current vs. hold time 
-            ax.scatter(hold.loc[:,'Hold Time'],hold.loc[:,'Max Current'], s=10, marker="s", label=label)
-    ax.legend(loc = 'upper left')
+        ax.scatter(hold.loc[:,'Hold Time'],hold.loc[:,'Max Current'], s=10, marker="s", label=label)
+        ax.legend(loc = 'upper left')
 
-def stddev_time(loglist, window):
+def stddev_time(loglist, window, dedup=True):
     '''
     Creates scatter plot of 50 mK stage standard deviation in microKelvin versus date of temperature hold for temperature holds across multiple log files
 
@@ -764,27 +2903,49 @@ def stddev_time(loglist, window):
         List of 107 log filepaths
     window : PlotWindow
         Window containing MatPlotLib canvas which gets plotted to 
+    dedup : bool
+        Skip data repeated across the log files (see unique_spans())
 
     Returns
     -------
     None.
 
     '''
+    ax = stddev_axes(window)
+    spans = unique_spans(loglist) if dedup else {}
+    for logpath in loglist: #Loop through log files
+        if spans.get(logpath) != []:
+            stddev_points(ax, stddev_file(logpath, spans.get(logpath)))
+
+def stddev_axes(window):
+    '''Adds the axes of stddev_time() to the figure of a window '''
     ax = window.canvas.fig.add_subplot(111) #Add subplot to figure of MPL canvas in window and assign it to varible ax
     ax.set_xlabel('Date')
     ax.set_ylabel('50 mK Std Dev (microK)')
     ax.set_ylim(0, 1000) #Y-axis limits may need to be manually adjusted 
-    num = len(loglist) #Number of log files
-    for i in range(num): #Loop through number of log files
-        log = load_107(loglist[i]) #Load and process each log file
-        dicts = split_107(log)
-        regs = temp_hold(dicts[2]) #Dictionary of all, revised temperature hold logs
-        temp = temp_summary(regs,107)['50 mK'] #DataFrame of temperature-related summary quantities for 50 mK stage
-        stddev = temp.loc[:,'50 mK std dev'].map(lambda x : x*10**6) #Series of standard deviation
-        x = temp.index #Get date and time of each temperature hold 
-        ax.scatter(x,stddev, s=10, marker="s") #Plot 50 mK std dev versus date of temp hold
-
-def temp_minmaxmean(loglist, temp, window): 
+    return ax
+
+def stddev_file(logpath, spans=None):
+    '''
+    Calculates the points of one log file for stddev_time()
+    Only the row ranges of spans (from unique_spans()) are loaded; the entire log if spans is None
+
+    Returns
+    -------
+    stddev : Series
+        50 mK standard deviation (microK) of each temperature hold, indexed by date and time of the hold
+
+    '''
+    dicts = split_unique(logpath, spans) #Load and process the log file
+    regs = temp_hold(dicts[2]) #Dictionary of all, revised temperature hold logs
+    temp = temp_summary(regs,107)['50 mK'] #DataFrame of temperature-related summary quantities for 50 mK stage
+    return temp.loc[:,'50 mK std dev'].map(lambda x : x*10**6) #Series of standard deviation
+
+def stddev_points(ax, stddev):
+    '''Plots the return of stddev_file() for one log file '''
+    ax.scatter(stddev.index, stddev, s=10, marker="s") #Plot 50 mK std dev versus date of temp hold
+
+def temp_minmaxmean(loglist, temp, window, dedup=True): 
     '''
     Creates stacked error bar plot of min, max, and mean of desired temperature stage versus date of temperature hold for temperature holds across multiple log files
 
@@ -796,26 +2957,124 @@ def temp_minmaxmean(loglist, temp, window):
         Temperature stage of interest (e.g. "3 K")
     window : PlotWindow
         Window containing MatPlotLib canvas which gets plotted to 
+    dedup : bool
+        Skip data repeated across the log files (see unique_spans())
 
     Returns
     -------
     None.
 
     '''
+    ax = temp_axes(window)
+    spans = unique_spans(loglist) if dedup else {}
+    for logpath in loglist: #Loop through log files
+        if spans.get(logpath) != []:
+            temp_points(ax, temp_file(logpath, temp, spans.get(logpath)))
+
+def temp_axes(window):
+    '''Adds the axes of temp_minmaxmean() to the figure of a window '''
     ax = window.canvas.fig.add_subplot(111)  #Add subplot to figure of MPL canvas in window and assign it to varible ax
     ax.set_xlabel('Date')
     ax.set_ylabel('Temp (K)')
-    num = len(loglist) #Number of log files
-    for i in range(num): #Loop through number of log files
-        log = load_107(loglist[i]) #Load and process each log file 
-        dicts = split_107(log)
-        regs = temp_hold(dicts[2]) #Dictionary of all, revised temperature hold logs
-        temps = temp_summary_combine(temp_summary(regs,107),107) #DataFrame of temperature-related summary quantities for all temperature stages and all temperature holds
-        mins = temps['{} min'.format(temp)] 
-        maxes = temps['{} max'.format(temp)]
-        means = temps['{} mean'.format(temp)]
-        dates = temps.index
-        #Create stacked error bar plot showing min, max, and mean of temperature stage versus date of temperature hold
-        ax.errorbar(dates, means, [means - mins, maxes - means], fmt='.k', ecolor='gray', lw=1)
+    return ax
 
+def temp_file(logpath, temp, spans=None):
+    '''
+    Calculates the points of one log file for temp_minmaxmean()
+    Only the row ranges of spans (from unique_spans()) are loaded; the entire log if spans is None
+
+    Returns
+    -------
+    temps : DataFrame
+        Min, max and mean of the temperature stage for each temperature hold, indexed by date and time of the hold
+
+    '''
+    dicts = split_unique(logpath, spans) #Load and process the log file 
+    regs = temp_hold(dicts[2]) #Dictionary of all, revised temperature hold logs
+    temps = temp_summary_combine(temp_summary(regs,107),107) #DataFrame of temperature-related summary quantities for all temperature stages and all temperature holds
+    return temps[['{} min'.format(temp), '{} max'.format(temp), '{} mean'.format(temp)]]
+
+def temp_points(ax, temps):
+    '''Plots the return of temp_file() for one log file '''
+    mins, maxes, means = temps.iloc[:,0], temps.iloc[:,1], temps.iloc[:,2]
+    #Create stacked error bar plot showing min, max, and mean of temperature stage versus date of temperature hold
+    ax.errorbar(temps.index, means, [means - mins, maxes - means], fmt='.k', ecolor='gray', lw=1)
+
+#Per-file parts of the summary plots above, for drawing the points of each log file as soon as they are calculated
+#Values are (function adding the axes, function calculating the points of one log file, function plotting them)
+STREAMED_PLOTS = {'maxcurrent_holdtime':(maxcurrent_axes, maxcurrent_file, maxcurrent_points),
+                  'stddev_time':(stddev_axes, stddev_file, stddev_points),
+                  'temp_minmaxmean':(temp_axes, temp_file, temp_points)}
+
+def anomaly_time(loglist, window, threshold=3.5, dedup=True):
+    '''
+    Creates scatter plots of decay rate, hold time, 50 mK std dev and magnet cycle time versus date across multiple log files
+    Phases flagged by anomaly_scores() are circled in red
+
+    Parameters
+    ----------
+    loglist : list
+        List of 107 log filepaths
+    window : PlotWindow
+        Window containing MatPlotLib canvas which gets plotted to 
+    threshold : float
+        Robust z-score threshold passed to anomaly_scores() 
+    dedup : bool
+        Skip data repeated across the log files (see catalog_summary())
+
+    Returns
+    -------
+    holds, regens : DataFrame
+        Return of anomaly_scores(), so the flagged phases can be shown in a table 
+
+    '''
+    holds, regens = anomaly_scores(*catalog_summary(loglist, dedup), threshold)
+    panels = [(holds,'Current Rate 1','Current Rate (A/hr)'), (holds,'Hold Time','Hold Time (hrs)'), (holds,'50 mK std dev','50 mK Std Dev (K)'), (regens,'Regen times','Regen Time (hrs)')]
+    for i, (qtys, column, ylabel) in enumerate(panels):
+        ax = window.canvas.fig.add_subplot(2,2,i+1)
+        ax.scatter(qtys.index, qtys[column], s=10, marker="s")
+        flagged = qtys.loc[qtys['Anomaly'].astype(bool)]
+        ax.scatter(flagged.index, flagged[column], s=60, facecolors='none', edgecolors='r', label='Anomaly')
+        ax.set_xlabel('Date')
+        ax.set_ylabel(ylabel)
+        ax.legend(loc='upper left')
+    plt.subplots_adjust(wspace = 0.5, hspace=0.5)
+    return holds, regens
+
+def noise_waterfall(loglist, window, segment=1.0, dedup=True):
+    '''
+    Creates waterfall plot of 50 mK PSDs of all temperature holds across multiple log files
+    PSDs of all holds are computed in one batch (see hold_psd())
+
+    Parameters
+    ----------
+    loglist : list
+        List of 107 log filepaths
+    window : PlotWindow
+        Window containing MatPlotLib canvas which gets plotted to 
+    segment : float
+        Welch segment length in hours
+    dedup : bool
+        Skip holds repeated across the log files (see unique_spans())
+
+    Returns
+    -------
+    None.
 
+    '''
+    runs = {}
+    spans = unique_spans(loglist) if dedup else {}
+    for logpath in loglist: #Load and process each log file 
+        if spans.get(logpath) == []:
+            continue
+        logs = split_unique(logpath, spans.get(logpath))
+        if not logs[0]: #Log holds no phase 
+            continue
+        #Runs are labelled by their full start time, so logs started on the same day keep separate rows; logs with the 
+        #same start (repeated files kept by dedup=False) are told apart by file name
+        label = str(next(iter(logs[0].values()))['Date/Time'].iloc[0])
+        if label in runs:
+            label = '{} {}'.format(label, os.path.basename(logpath))
+        runs[label] = (logs[0], logs[1], temp_hold(logs[2]))
+    freqs, psd, labels = hold_psd(collect_phases(runs, 'reg'), segment=segment)
+    psd_waterfall(freqs, psd, labels, window)
@@ -0,0 +1,366 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+import cryostat_functions as cryo
+
+
+'''
+
+Cross-run index of the events in the Notes column of log files
+Each distinct Notes text (e.g. "Mag Cycle Canceled") is an event; the index stores, per event, the file, row and
+timestamp of every occurrence as sorted numpy arrays, so queries never open a log file
+Rows are row numbers of the loaded log, i.e. load_107(path).iloc[row] is the row of the event
+
+The index is saved as <path>.npz (postings) and <path>.json (files and event texts)
+
+'''
+
+
+#(Columns read, rows skipped) of the "Date/Time" and "Notes" columns of each cryostat model, as in load_107() and load_102()
+NOTES_COLUMNS = {107:([0,1], [1,2]), 102:([0,2], None)}
+
+
+def read_events(filepath, cryostat=107):
+    '''
+    Reads the non-empty Notes of a log file, without the other columns
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of a log file. May be compressed (see open_log())
+    cryostat : int
+        Cryostat model (107 or 102)
+
+    Returns
+    -------
+    rows : ndarray
+        Row numbers of the events in the loaded log
+    times : ndarray
+        datetime64[ns] timestamps of the events
+    notes : ndarray
+        Event texts, stripped of surrounding whitespace
+
+    '''
+    usecols, skiprows = NOTES_COLUMNS[cryostat]
+    with cryo.open_log(filepath) as f:
+        log = pd.read_csv(f, usecols=usecols, skiprows=skiprows, na_filter=False, dtype=str)
+    notes = log.iloc[:,1].str.strip().to_numpy()
+    rows = np.flatnonzero(notes != '')
+    times = pd.to_datetime(log.iloc[rows,0], infer_datetime_format=True).to_numpy(dtype='datetime64[ns]')
+    return rows, times, notes[rows]
+
+class EventIndex:
+    '''
+    Inverted index of Notes events across log files
+
+    Postings are sorted by event, then file, then time, so all occurrences of an event are one contiguous slice
+    (offsets[event]:offsets[event+1]) and are found by array slicing instead of scanning any log
+
+    Parameters
+    ----------
+    path : str, optional
+        Filepath of the saved index, without extension. A new, empty index is created if it does not exist yet
+
+    Examples
+    --------
+    >>> index = EventIndex('events')
+    >>> index.update(cryo.log_files('logs'))
+    >>> index.save()
+    >>> index.find('Mag Cycle Canceled', start='2020-01-01', end='2021-01-01')
+
+    '''
+    def __init__(self, path=None):
+        self.path = path
+        self.files = [] #[filepath, size, mtime, cryostat] of every indexed file; position is the file id
+        self.events = [] #Event texts; position is the event id
+        self.errors = {} #Filepath -> error message of files that could not be read by the last update
+        self.file = np.zeros(0, dtype=np.int32)
+        self.row = np.zeros(0, dtype=np.int64)
+        self.time = np.zeros(0, dtype='datetime64[ns]')
+        self.event = np.zeros(0, dtype=np.int32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        if path is not None and os.path.exists(path + '.json'):
+            self.load()
+
+    def __len__(self):
+        return len(self.row)
+
+    def __repr__(self):
+        return 'EventIndex({} events in {} files)'.format(len(self.row), len(self.files))
+
+    def load(self):
+        with open(self.path + '.json') as f:
+            meta = json.load(f)
+        self.files, self.events = meta['files'], meta['events']
+        with np.load(self.path + '.npz') as arrays:
+            self.file, self.row, self.time, self.event = arrays['files'], arrays['row'], arrays['time'], arrays['event']
+        self._sort()
+
+    def save(self, path=None):
+        '''
+        Saves the index to <path>.npz and <path>.json. Each file is written under a temporary name and renamed when complete
+
+        '''
+        self.path = path or self.path
+        np.savez(self.path + '.tmp.npz', files=self.file, row=self.row, time=self.time, event=self.event)
+        os.replace(self.path + '.tmp.npz', self.path + '.npz')
+        with open(self.path + '.json.tmp', 'w') as f:
+            json.dump({'files':self.files, 'events':self.events}, f)
+        os.replace(self.path + '.json.tmp', self.path + '.json')
+
+    def _sort(self):
+        #Sort postings by event, file and time, and find the first posting of each event
+        order = np.lexsort((self.time, self.file, self.event))
+        self.file, self.row, self.time, self.event = self.file[order], self.row[order], self.time[order], self.event[order]
+        self.offsets = np.searchsorted(self.event, np.arange(len(self.events) + 1)).astype(np.int64)
+
+    def update(self, paths, cryostat=107):
+        '''
+        Adds new log files to the index and re-indexes files whose size or modification time changed
+        Files that cannot be read are skipped and listed in the errors attribute
+
+        Parameters
+        ----------
+        paths : list
+            Filepaths of log files
+        cryostat : int
+            Cryostat model of the log files (107 or 102)
+
+        Returns
+        -------
+        indexed : list
+            Filepaths indexed by this call
+
+        '''
+        known = {path:number for number, (path, size, mtime, model) in enumerate(self.files)}
+        vocabulary = {text:number for number, text in enumerate(self.events)}
+        keep = np.ones(len(self.row), dtype=bool)
+        new = []
+        indexed = []
+        for path in paths:
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            #Unchanged files are not read again
+            if path in known and self.files[known[path]][1:3] == [stat.st_size, stat.st_mtime]:
+                continue
+            try:
+                rows, times, notes = read_events(path, cryostat)
+            except (ValueError, pd.errors.ParserError) as error:
+                #Not a readable log: skip it and try again on the next update
+                self.errors[path] = str(error)
+                continue
+            self.errors.pop(path, None)
+            if path in known:
+                number = known[path]
+                #Drop the postings of the old version of the file
+                keep &= self.file != number
+                self.files[number] = [path, stat.st_size, stat.st_mtime, cryostat]
+            else:
+                number = len(self.files)
+                known[path] = number
+                self.files.append([path, stat.st_size, stat.st_mtime, cryostat])
+            events = np.array([vocabulary.setdefault(text, len(vocabulary)) for text in notes], dtype=np.int32)
+            new.append((np.full(len(rows), number, dtype=np.int32), rows.astype(np.int64), times, events))
+            indexed.append(path)
+        if not indexed:
+            return indexed
+        self.events = sorted(vocabulary, key=vocabulary.get)
+        self.file, self.row, self.time, self.event = [np.concatenate([array[keep]] + [postings[i] for postings in new])
+                                                      for i, array in enumerate((self.file, self.row, self.time, self.event))]
+        self._sort()
+        return indexed
+
+    def match(self, text, exact=False, case=False):
+        '''
+        Finds the ids of events whose text contains (or, with exact=True, equals) a query text
+
+        Parameters
+        ----------
+        text : str or list
+            Query text, or list of query texts of which any may match
+        exact : bool
+            Match whole event texts only
+        case : bool
+            Case-sensitive matching
+
+        Returns
+        -------
+        ids : ndarray
+            Event ids
+
+        '''
+        texts = [text] if isinstance(text, str) else list(text)
+        if not case:
+            texts = [t.lower() for t in texts]
+        ids = []
+        for number, event in enumerate(self.events):
+            event = event if case else event.lower()
+            if any(t == event if exact else t in event for t in texts):
+                ids.append(number)
+        return np.array(ids, dtype=np.int64)
+
+    def _postings(self, text, exact=False, case=False):
+        #Positions of all postings of the events matching text
+        ids = self.match(text, exact, case)
+        if len(ids) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(self.offsets[i], self.offsets[i+1]) for i in ids])
+
+    def _frame(self, positions):
+        paths = np.array([path for path, size, mtime, model in self.files] or [''], dtype=object)
+        return pd.DataFrame({'Path':paths[self.file[positions]], 'Row':self.row[positions],
+                             'Date/Time':self.time[positions], 'Event':np.asarray(self.events, dtype=object)[self.event[positions]]})
+
+    def find(self, text, start=None, end=None, paths=None, exact=False, case=False):
+        '''
+        Finds all occurrences of matching events
+
+        Parameters
+        ----------
+        text : str or list
+            Query text (see match())
+        start, end : str or Timestamp, optional
+            Only occurrences at or after start and before end
+        paths : list, optional
+            Only occurrences in these log files
+        exact, case : bool
+            See match()
+
+        Returns
+        -------
+        found : DataFrame
+            Columns 'Path', 'Row', 'Date/Time' and 'Event', sorted by time
+
+        '''
+        positions = self._postings(text, exact, case)
+        mask = np.ones(len(positions), dtype=bool)
+        if start is not None:
+            mask &= self.time[positions] >= np.datetime64(pd.Timestamp(start))
+        if end is not None:
+            mask &= self.time[positions] < np.datetime64(pd.Timestamp(end))
+        if paths is not None:
+            numbers = [number for number, (path, size, mtime, model) in enumerate(self.files) if path in {os.path.abspath(p) for p in paths}]
+            mask &= np.isin(self.file[positions], numbers)
+        positions = positions[mask]
+        positions = positions[np.argsort(self.time[positions], kind='stable')]
+        return self._frame(positions).reset_index(drop=True)
+
+    def counts(self, start=None, end=None):
+        '''
+        Number of occurrences of every event, optionally between start and end
+
+        Returns
+        -------
+        counts : Series
+            Index is event text, sorted by number of occurrences
+
+        '''
+        mask = np.ones(len(self.row), dtype=bool)
+        if start is not None:
+            mask &= self.time >= np.datetime64(pd.Timestamp(start))
+        if end is not None:
+            mask &= self.time < np.datetime64(pd.Timestamp(end))
+        counts = np.bincount(self.event[mask], minlength=len(self.events))
+        return pd.Series(counts, index=self.events, name='Count').sort_values(ascending=False)
+
+    def preceding(self, text, targets, within=None, exact=False, case=False):
+        '''
+        Finds, for every target time, the last matching event before it in the same log file
+        E.g. every temperature hold that a canceled magnet cycle preceded by less than 12 hours, using the 'holds' table of the summary store:
+        index.preceding('Mag Cycle Canceled', holds[holds['Hold Time'] < 5], within='12h')
+
+        Parameters
+        ----------
+        text : str or list
+            Query text (see match())
+        targets : DataFrame
+            Rows with 'Path' and 'Date/Time' columns (e.g. a summary table of cryostat_daemon.SummaryStore)
+        within : str or Timedelta, optional
+            Maximum time between event and target. Any earlier event in the file counts if None
+        exact, case : bool
+            See match()
+
+        Returns
+        -------
+        matched : DataFrame
+            Targets that have a preceding event, with added 'Event', 'Event Row' and 'Event Time' columns
+
+        '''
+        positions = self._postings(text, exact, case)
+        #Postings of one file are contiguous and time sorted after sorting by (file, time)
+        positions = positions[np.lexsort((self.time[positions], self.file[positions]))]
+        files, times = self.file[positions], self.time[positions]
+        numbers = {path:number for number, (path, size, mtime, model) in enumerate(self.files)}
+        target_files = np.array([numbers.get(os.path.abspath(path), -1) for path in targets['Path']], dtype=np.int64)
+        target_times = pd.to_datetime(targets['Date/Time']).to_numpy(dtype='datetime64[ns]')
+        #Rank event and target times together, so (file, time) pairs become one sortable integer key
+        ranks = np.unique(np.concatenate([times, target_times]), return_inverse=True)[1].astype(np.int64)
+        scale = len(ranks) + 1
+        keys = files.astype(np.int64) * scale + ranks[:len(times)]
+        target_keys = target_files * scale + ranks[len(times):]
+        #Last posting strictly before the target, which must be in the target's file
+        first = np.searchsorted(files, target_files, side='left')
+        before = np.searchsorted(keys, target_keys, side='left') - 1
+        valid = (before >= first) & (target_files >= 0)
+        if within is not None:
+            valid[valid] &= target_times[valid] - times[before[valid]] <= np.timedelta64(pd.Timedelta(within))
+        matched = targets.loc[valid].copy()
+        chosen = positions[before[valid]]
+        matched['Event'] = np.asarray(self.events, dtype=object)[self.event[chosen]]
+        matched['Event Row'] = self.row[chosen]
+        matched['Event Time'] = self.time[chosen]
+        return matched
+
+    def followed_by(self, first, then, within=None, exact=False, case=False):
+        '''
+        Finds occurrences of an event that are followed by another event in the same log file
+        E.g. magnet cycles that were canceled within an hour of starting: index.followed_by('Start Mag Cycle', 'Canceled', within='1h')
+
+        Parameters
+        ----------
+        first, then : str or list
+            Query texts (see match()) of the earlier and the later event
+        within : str or Timedelta, optional
+            Maximum time between the two events
+        exact, case : bool
+            See match()
+
+        Returns
+        -------
+        pairs : DataFrame
+            Columns 'Path', 'Row', 'Date/Time' and 'Event' of the first event, and 'Next Row', 'Next Time' and 'Next Event'
+            of the first later matching event
+
+        '''
+        targets = self.find(then, exact=exact, case=case).rename(columns={'Row':'Next Row', 'Event':'Next Event'})
+        pairs = self.preceding(first, targets, within, exact, case)
+        #Keep only the closest following event of each first event
+        pairs = pairs.drop_duplicates(['Path', 'Event Row'], keep='first')
+        pairs = pairs.rename(columns={'Date/Time':'Next Time', 'Event Row':'Row', 'Event Time':'Date/Time'})
+        return pairs[['Path', 'Row', 'Date/Time', 'Event', 'Next Row', 'Next Time', 'Next Event']].reset_index(drop=True)
+
+def build_index(directory, path, cryostat=107):
+    '''
+    Creates or updates the event index of every log file in a directory and saves it
+
+    Parameters
+    ----------
+    directory : str
+        Directory of log files
+    path : str
+        Filepath of the saved index, without extension
+    cryostat : int
+        Cryostat model of the log files (107 or 102)
+
+    Returns
+    -------
+    index : EventIndex
+
+    '''
+    index = EventIndex(path)
+    if index.update(cryo.log_files(directory), cryostat):
+        index.save()
+    return index
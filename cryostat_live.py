@@ -0,0 +1,243 @@
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+import cryostat_functions as cryo
+
+
+'''
+
+The classes below show a live view of a log that is still being written, like reg_plot() but updated in place
+New rows are read from the end of the log (LogTail) into preallocated ring buffers (RingBuffer), and LivePlot redraws
+only its lines over a cached background (blitting). Axis limits are rescaled at most every few seconds and with
+headroom, since rescaling redraws the entire figure. Lines are drawn from at most a few points per pixel, so an update
+costs the same after a full day of data as after a minute
+
+'''
+
+
+#Channels of the live view, in the order of LogTail.read() and LivePlot
+LIVE_CHANNELS = ['50 mK FAA', 'Temperature Setpoint', 'Magnet Current', 'Magnet Voltage']
+#Columns of a raw log read by LogTail and their names in load_log(), by cryostat model (from LOG_SCHEMAS)
+LIVE_COLUMNS = {cryostat:{schema['usecols'][schema['column_order'][schema['columns'].index(name)]]:name for name in LIVE_CHANNELS}
+                for cryostat, schema in cryo.LOG_SCHEMAS.items()}
+
+
+class RingBuffer:
+    '''
+    Fixed-size buffer of the most recent rows of several float columns
+    Every row is written twice, capacity rows apart, so the buffered rows are always one contiguous view without copying
+
+    Parameters
+    ----------
+    capacity : int
+        Number of rows kept; older rows are overwritten
+    columns : int
+        Number of columns
+
+    '''
+    def __init__(self, capacity, columns):
+        self.capacity = capacity
+        self.data = np.full((2 * capacity, columns), np.nan)
+        self.end = 0 #Rows written in total
+
+    def __len__(self):
+        return min(self.end, self.capacity)
+
+    def append(self, rows):
+        '''Appends rows (array of shape (n, columns)) '''
+        rows = np.asarray(rows, dtype=float).reshape(-1, self.data.shape[1])[-self.capacity:]
+        positions = (self.end + np.arange(len(rows))) % self.capacity
+        self.data[positions] = rows
+        self.data[positions + self.capacity] = rows
+        self.end += len(rows)
+
+    def view(self):
+        '''Buffered rows, oldest first, as a view of shape (len, columns) '''
+        start = self.end % self.capacity if self.end > self.capacity else 0
+        return self.data[start:start + len(self)]
+
+    def clear(self):
+        self.end = 0
+
+class LogTail:
+    '''
+    Reads the rows appended to a plain (uncompressed) log since the last read
+    A partly written last line is kept until it is complete
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of the log being written
+    cryostat : int
+        Cryostat model of the log (107 or 102)
+
+    Attributes
+    ----------
+    start : Timestamp
+        Date and time of the first row, once read
+
+    '''
+    def __init__(self, filepath, cryostat=107):
+        self.filepath = filepath
+        self.cryostat = cryostat
+        self.columns = LIVE_COLUMNS[cryostat]
+        self.offset = 0
+        self.partial = b''
+        self.header = cryo.LOG_SCHEMAS[cryostat]['header_rows'] #Header and unit rows still to skip
+        self.start = None
+
+    def read(self):
+        '''
+        Reads new complete rows
+
+        Returns
+        -------
+        rows : ndarray
+            Shape (n, 5): hours after the first row of the log, then the channels of LIVE_CHANNELS
+
+        '''
+        with open(self.filepath, 'rb') as f:
+            f.seek(0, io.SEEK_END)
+            if f.tell() < self.offset:
+                #The log was replaced: read it again from the start
+                self.__init__(self.filepath, self.cryostat)
+            f.seek(self.offset)
+            chunk = f.read()
+            self.offset = f.tell()
+        lines = (self.partial + chunk).split(b'\n')
+        self.partial = lines.pop()
+        skip, self.header = min(self.header, len(lines)), self.header - min(self.header, len(lines))
+        lines = [line for line in lines[skip:] if line.strip()]
+        if not lines:
+            return np.empty((0, len(LIVE_CHANNELS) + 1))
+        rows = pd.read_csv(io.BytesIO(b'\n'.join(lines)), header=None, usecols=[0] + list(self.columns), na_filter=False)
+        times = pd.to_datetime(rows[0], infer_datetime_format=True)
+        if self.start is None:
+            self.start = times.iloc[0]
+        hours = (times - self.start).dt.total_seconds().to_numpy() / 3600
+        return np.column_stack([hours, rows[list(self.columns)].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)])
+
+def envelope(x, y, bins):
+    '''
+    Decimates a line to the first x and the min and max y of each of at most bins groups of points, so spikes stay visible
+
+    Returns
+    -------
+    x, y : ndarray
+        Decimated line, two points per group
+
+    '''
+    if len(x) <= 2 * bins:
+        return x, y
+    size = len(x) // bins
+    n = size * bins
+    groups = y[len(y) - n:].reshape(bins, size)
+    xs = x[len(x) - n:].reshape(bins, size)
+    with np.errstate(invalid='ignore'):
+        return np.repeat(xs[:, 0], 2), np.column_stack([np.nanmin(groups, axis=1), np.nanmax(groups, axis=1)]).ravel()
+
+class LivePlot:
+    '''
+    Live plot of 50 mK temperature, setpoint, magnet current and voltage versus time, laid out as reg_plot()
+    Call extend() with new rows and update() to redraw; only the lines are redrawn unless the limits change
+
+    Parameters
+    ----------
+    fig : Figure
+        Figure to plot to. Its canvas must support blitting (e.g. FigureCanvasQTAgg)
+    capacity : int
+        Number of most recent rows shown (e.g. 86400 for a day of 1 s rows)
+    rescale : float
+        Shortest time (s) between two rescales of the axes
+    pixels : int
+        Number of point groups each line is decimated to (see envelope())
+
+    '''
+    def __init__(self, fig, capacity=2**17, rescale=2.0, pixels=500):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.buffer = RingBuffer(capacity, len(LIVE_CHANNELS) + 1)
+        self.rescale = rescale
+        self.pixels = pixels
+        self.rescaled = 0.0
+        self.background = None
+
+        ax1 = fig.add_subplot(121)
+        ax2 = fig.add_subplot(122)
+        ax3 = ax2.twinx()
+        #Lines are animated, so a full draw leaves them out of the cached background
+        temp, = ax1.plot([], [], '-', label='50 mK FAA', animated=True)
+        setpoint, = ax1.plot([], [], '-', label='Temperature Setpoint', animated=True)
+        ax1.set_xlabel('Time after start (hrs)')
+        ax1.set_ylabel('Temperature (K)')
+        ax1.legend()
+        current, = ax2.plot([], [], 'g-', label='Magnet Current', animated=True)
+        ax2.set_xlabel('Time after start (hrs)')
+        ax2.set_ylabel('Magnet Current (A)')
+        voltage, = ax3.plot([], [], 'r-', label='Magnet Voltage', animated=True)
+        ax3.set_ylabel('Magnet Voltage (V)')
+        ax2.legend([current, voltage], ['Magnet Current', 'Magnet Voltage'], loc='upper right')
+        #Line and axes of each channel of LIVE_CHANNELS
+        self.lines = [(temp, ax1), (setpoint, ax1), (current, ax2), (voltage, ax3)]
+        self.axes = [ax1, ax2, ax3]
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def on_draw(self, event):
+        #A full draw (first show, resize or rescale) renders the static parts; keep them and draw the lines over them
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_lines()
+
+    def extend(self, rows):
+        '''Appends rows returned by LogTail.read() '''
+        if len(rows):
+            self.buffer.append(rows)
+
+    def limits(self, data):
+        #Axis limits of each axes with headroom, so new data stays inside for a while
+        hours = data[:, 0]
+        span = max(hours[-1] - hours[0], 1 / 60)
+        xlim = (hours[0], hours[-1] + 0.25 * span)
+        ylims = {}
+        for n, (line, ax) in enumerate(self.lines):
+            values = data[:, n + 1]
+            values = values[np.isfinite(values)]
+            if len(values):
+                low, high = ylims.get(ax, (np.inf, -np.inf))
+                ylims[ax] = (min(low, values.min()), max(high, values.max()))
+        return xlim, ylims
+
+    def outside(self, data):
+        #True if the data has left the current limits
+        xlim, ylims = self.limits(data)
+        if xlim[0] < self.axes[0].get_xlim()[0] or data[-1, 0] > self.axes[0].get_xlim()[1]:
+            return True
+        return any(low < ax.get_ylim()[0] or high > ax.get_ylim()[1] for ax, (low, high) in ylims.items())
+
+    def update(self):
+        '''Redraws the lines, rescaling the axes (a full redraw) at most every rescale seconds when the data has left them '''
+        data = self.buffer.view()
+        if not len(data):
+            return
+        for n, (line, ax) in enumerate(self.lines):
+            line.set_data(*envelope(data[:, 0], data[:, n + 1], self.pixels))
+        if self.background is None or (self.outside(data) and time.monotonic() - self.rescaled >= self.rescale):
+            xlim, ylims = self.limits(data)
+            for ax in self.axes:
+                ax.set_xlim(*xlim)
+            for ax, (low, high) in ylims.items():
+                pad = 0.1 * (high - low) or 0.1 * abs(high) or 0.1
+                ax.set_ylim(low - pad, high + pad)
+            self.rescaled = time.monotonic()
+            #Full draw; on_draw() caches the new background and blits the lines
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_lines()
+
+    def draw_lines(self):
+        for line, ax in self.lines:
+            ax.draw_artist(line)
+        self.canvas.blit(self.fig.bbox)
@@ -0,0 +1,336 @@
+import os
+
+import numpy as np
+import matplotlib.dates as mdates
+import pandas as pd
+
+import cryostat_functions as cryo
+
+
+'''
+
+The functions below create and read multi-resolution aggregates (an aggregate pyramid) of log files for long-term trend plots
+Every channel of load_log() is reduced to min, max, sum and count per 1 s, 1 min, 1 h and 1 day bin; each level is
+reduced from the level below it, so a log is read once. Only bins that contain data are stored
+The pyramid of a log is saved next to it as <log>.pyramid.npz (or in a separate directory if the log directory is read-only)
+
+'''
+
+
+#Bin width in seconds of each pyramid level, from finest to coarsest
+LEVELS = {'1s':1, '1min':60, '1h':3600, '1d':86400}
+#Channels of load_log() that are aggregated, by cryostat model: every column of the schema but times and Notes
+CHANNELS = {cryostat:[column for column in schema['columns'] if column not in ('Date/Time','Hours after Start','Notes')]
+            for cryostat, schema in cryo.LOG_SCHEMAS.items()}
+#Channel of each temperature stage name used by the summary functions, by cryostat model
+TEMP_CHANNELS = {cryostat:schema['stages'] for cryostat, schema in cryo.LOG_SCHEMAS.items()}
+
+
+def pyramid_path(logpath, directory=None):
+    '''
+    Filepath of the pyramid of a log file: next to the log, or in directory if given
+
+    '''
+    if directory is None:
+        return str(logpath) + '.pyramid.npz'
+    return os.path.join(directory, os.path.basename(str(logpath)) + '.pyramid.npz')
+
+def reduce_bins(bins, mins, maxes, sums, counts):
+    '''
+    Merges consecutive rows that fall in the same bin
+
+    Parameters
+    ----------
+    bins : ndarray
+        Sorted bin start times (seconds since epoch) of each row
+    mins, maxes, sums, counts : ndarray
+        2D arrays (rows x channels) of minimums, maximums, sums and counts of non-NaN values
+
+    Returns
+    -------
+    bins, mins, maxes, sums, counts : ndarray
+        One row per distinct bin
+
+    '''
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    #fmin/fmax ignore NaN, so a bin is NaN only if all of its values are NaN
+    return (bins[starts], np.fmin.reduceat(mins, starts, axis=0), np.fmax.reduceat(maxes, starts, axis=0),
+            np.add.reduceat(sums, starts, axis=0), np.add.reduceat(counts, starts, axis=0))
+
+def build_pyramid(log, channels=None):
+    '''
+    Aggregates a log into every pyramid level
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted log. Return of load_log()
+    channels : list, optional
+        Columns to aggregate. Defaults to the CHANNELS of the cryostat model of the log
+
+    Returns
+    -------
+    pyramid : dict
+        Keys are level names of LEVELS
+        Values are tuples (bins, mins, maxes, sums, counts) of arrays, as returned by reduce_bins()
+
+    '''
+    channels = CHANNELS[cryo.log_model(log)] if channels is None else channels
+    seconds = log['Date/Time'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+    values = log[channels].to_numpy(dtype=float)
+    #Rows are sorted by time first, so bins are contiguous even if timestamps jump back
+    order = np.argsort(seconds, kind='stable')
+    seconds, values = seconds[order], values[order]
+    valid = ~np.isnan(values)
+    level = (seconds, values, values, np.where(valid, values, 0), valid.astype(np.int64))
+    pyramid = {}
+    for name, width in LEVELS.items():
+        level = reduce_bins(level[0] // width * width, *level[1:])
+        pyramid[name] = level
+    return pyramid
+
+def write_pyramid(logpath, directory=None, log=None, channels=None, cryostat=107):
+    '''
+    Creates the pyramid of a log file and saves it compressed. The file is written under a temporary name and renamed when complete
+
+    Parameters
+    ----------
+    logpath : str
+        Filepath of a log
+    directory : str, optional
+        Directory to save the pyramid in. Saved next to the log if None
+    log : DataFrame, optional
+        Return of load_log() for the log, if it is already loaded
+    channels : list, optional
+        Columns to aggregate. Defaults to CHANNELS[cryostat]
+    cryostat : int
+        Cryostat model of the log (107 or 102)
+
+    Returns
+    -------
+    path : str
+        Filepath of the pyramid
+
+    '''
+    if log is None:
+        log = cryo.load_log(logpath, cryostat)
+    channels = CHANNELS[cryostat] if channels is None else channels
+    stat = os.stat(logpath)
+    arrays = {'source':np.array([stat.st_size, stat.st_mtime]), 'channels':np.array(channels)}
+    for name, (bins, mins, maxes, sums, counts) in build_pyramid(log, channels).items():
+        arrays.update({'{}|time'.format(name):bins, '{}|min'.format(name):mins, '{}|max'.format(name):maxes,
+                       '{}|sum'.format(name):sums, '{}|count'.format(name):counts})
+    path = pyramid_path(logpath, directory)
+    tmp = '{}.{}.tmp.npz'.format(path[:-len('.npz')], os.getpid())
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+    return path
+
+def pyramid_current(logpath, directory=None, channels=None):
+    '''
+    Checks whether the pyramid of a log file exists and was created from the current version of the log
+    If channels are given, also checks that the pyramid has all of them
+
+    '''
+    path = pyramid_path(logpath, directory)
+    if not os.path.exists(path):
+        return False
+    stat = os.stat(logpath)
+    with np.load(path) as arrays:
+        return tuple(arrays['source']) == (stat.st_size, stat.st_mtime) and set(channels or []) <= set(arrays['channels'])
+
+def update_pyramids(loglist, directory=None, executor=None, cryostat=107):
+    '''
+    Creates pyramids of log files that have none, whose log changed since its pyramid was created, or that lack channels
+    of the cryostat model
+
+    Parameters
+    ----------
+    loglist : list
+        List of log filepaths
+    directory : str, optional
+        Directory to save pyramids in. Saved next to each log if None
+    executor : Executor, optional
+        Executor to create the pyramids on (e.g. a ProcessPoolExecutor). Created serially if None
+    cryostat : int
+        Cryostat model of the logs (107 or 102)
+
+    Returns
+    -------
+    written : list
+        Filepaths of pyramids created by this call
+
+    '''
+    stale = [path for path in loglist if not pyramid_current(path, directory, CHANNELS[cryostat])]
+    if executor is None:
+        return [write_pyramid(path, directory, cryostat=cryostat) for path in stale]
+    return list(executor.map(write_pyramid, stale, [directory] * len(stale), [None] * len(stale), [None] * len(stale), [cryostat] * len(stale)))
+
+def read_level(loglist, level, channels, start=None, end=None, directory=None):
+    '''
+    Reads one pyramid level of multiple log files, between start and end
+
+    Parameters
+    ----------
+    loglist : list
+        List of log filepaths with pyramids (see update_pyramids())
+    level : str
+        Level name of LEVELS (e.g. '1h')
+    channels : list
+        Channels to read
+    start, end : optional
+        Only bins starting at or after start and before end (Timestamps, or seconds since epoch)
+    directory : str, optional
+        Directory the pyramids are saved in. Next to each log if None
+
+    Returns
+    -------
+    trend : DataFrame
+        Columns 'Date/Time' (bin start) and '<channel> min', '<channel> max' and '<channel> mean' for each channel, sorted by time
+
+    '''
+    seconds = lambda t: t if isinstance(t, (int, float, np.integer, np.floating)) else pd.Timestamp(t).value // 10**9
+    parts = []
+    for logpath in loglist:
+        #Arrays in a .npz are read on access, so only the requested level is loaded
+        with np.load(pyramid_path(logpath, directory)) as arrays:
+            stored = list(arrays['channels'])
+            columns = [stored.index(channel) for channel in channels]
+            bins = arrays['{}|time'.format(level)]
+            first = 0 if start is None else np.searchsorted(bins, seconds(start), side='left')
+            last = len(bins) if end is None else np.searchsorted(bins, seconds(end), side='left')
+            if last <= first:
+                continue
+            rows = slice(first, last)
+            part = {'Date/Time':bins[rows].astype('datetime64[s]')}
+            mins, maxes = arrays['{}|min'.format(level)][rows][:,columns], arrays['{}|max'.format(level)][rows][:,columns]
+            sums, counts = arrays['{}|sum'.format(level)][rows][:,columns], arrays['{}|count'.format(level)][rows][:,columns]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = np.where(counts > 0, sums / counts, np.nan)
+            for n, channel in enumerate(channels):
+                part.update({'{} min'.format(channel):mins[:,n], '{} max'.format(channel):maxes[:,n], '{} mean'.format(channel):means[:,n]})
+            parts.append(pd.DataFrame(part))
+    if not parts:
+        return pd.DataFrame(columns=['Date/Time'] + ['{} {}'.format(channel, qty) for channel in channels for qty in ('min','max','mean')])
+    return pd.concat(parts).sort_values('Date/Time', kind='stable').reset_index(drop=True)
+
+def choose_level(span, pixels):
+    '''
+    Chooses the coarsest pyramid level that still has at least one bin per pixel
+
+    Parameters
+    ----------
+    span : float
+        Time span shown, in seconds
+    pixels : float
+        Width of the plot in pixels
+
+    Returns
+    -------
+    level : str
+        Level name of LEVELS
+
+    '''
+    width = span / max(pixels, 1)
+    fitting = [name for name, seconds in LEVELS.items() if seconds <= width]
+    return fitting[-1] if fitting else next(iter(LEVELS))
+
+class TrendView:
+    '''
+    Trend plot of channels across many log files, drawn from their pyramids
+    The plot shows the mean of each channel as a line and its min-max range as a band. When the view is zoomed or panned,
+    the level that fills the pixels of the axes is chosen and the bins of the shown time range (plus one view width on
+    each side) are read again; log data is never loaded
+
+    Parameters
+    ----------
+    ax : Axes
+        Axes to plot to
+    loglist : list
+        List of log filepaths with pyramids (see update_pyramids())
+    channels : list
+        Channels to plot
+    colors : list, optional
+        Color of each channel
+    directory : str, optional
+        Directory the pyramids are saved in. Next to each log if None
+
+    '''
+    def __init__(self, ax, loglist, channels, colors=None, directory=None):
+        self.ax = ax
+        self.loglist = loglist
+        self.channels = channels
+        self.colors = colors or ['C{}'.format(n) for n in range(len(channels))]
+        self.directory = directory
+        self.artists = []
+        self.loaded = None #(level, start, end) in seconds of the bins currently drawn
+        #Time range of all logs, from the coarsest level
+        trend = read_level(loglist, list(LEVELS)[-1], channels[:1], directory=directory)
+        self.start = pd.Timestamp(trend['Date/Time'].iloc[0]).value // 10**9
+        self.end = pd.Timestamp(trend['Date/Time'].iloc[-1]).value // 10**9 + LEVELS[list(LEVELS)[-1]]
+        self.epoch = mdates.date2num(np.datetime64('1970-01-01'))
+        self.draw(self.start, self.end)
+        ax.set_xlim(mdates.date2num(np.datetime64(self.start, 's')), mdates.date2num(np.datetime64(self.end, 's')))
+        ax.callbacks.connect('xlim_changed', self.on_xlim)
+
+    def pixels(self):
+        return self.ax.get_window_extent().width
+
+    def draw(self, start, end):
+        '''
+        Redraws the bins between start and end (seconds since epoch) at the level that fills the axes
+
+        '''
+        level = choose_level(end - start, self.pixels())
+        span = end - start
+        start, end = start - span, end + span
+        trend = read_level(self.loglist, level, self.channels, start, end, self.directory)
+        for artist in self.artists:
+            artist.remove()
+        self.artists = []
+        dates = trend['Date/Time'].to_numpy()
+        for channel, color in zip(self.channels, self.colors):
+            self.artists.append(self.ax.fill_between(dates, trend['{} min'.format(channel)], trend['{} max'.format(channel)], color=color, alpha=0.3, lw=0))
+            self.artists.extend(self.ax.plot(dates, trend['{} mean'.format(channel)], color=color, lw=1, label=channel))
+        self.loaded = (level, start, end)
+
+    def on_xlim(self, ax):
+        low, high = ax.get_xlim()
+        start, end = (low - self.epoch) * 86400, (high - self.epoch) * 86400
+        level, loaded_start, loaded_end = self.loaded
+        #Read again only if a different level fills the pixels or the view leaves the bins that are drawn
+        if choose_level(end - start, self.pixels()) != level or start < max(loaded_start, self.start) or end > min(loaded_end, self.end):
+            self.draw(start, end)
+            ax.figure.canvas.draw_idle()
+
+def trend_plot(loglist, temp, window, cryostat=107):
+    '''
+    Creates trend plot (mean line and min-max band) of desired temperature stage versus date across multiple log files
+    Pyramids of the log files are created first if needed
+
+    Parameters
+    ----------
+    loglist : list
+        List of log filepaths
+    temp : str
+        Temperature stage of interest (e.g. "3 K"), or a channel of CHANNELS
+    window : PlotWindow
+        Window containing MatPlotLib canvas which gets plotted to
+    cryostat : int
+        Cryostat model of the logs (107 or 102)
+
+    Returns
+    -------
+    view : TrendView
+        Keep a reference to it, so zooming keeps reading finer levels
+
+    '''
+    update_pyramids(loglist, cryostat=cryostat)
+    stages = TEMP_CHANNELS[cryostat]
+    ax = window.canvas.fig.add_subplot(111)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Temp (K)' if temp in stages else temp)
+    view = TrendView(ax, loglist, [stages.get(temp, temp)])
+    ax.xaxis_date()
+    ax.legend(loc='best')
+    return view
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+import cryostat_functions as cryo
+
+
+'''
+
+The functions below check the sensor data of a loaded log for quality problems in one vectorized pass:
+logging gaps, non-monotonic timestamps, dropouts (0 or NaN readings), sentinel readings (e.g. 500 for a disconnected diode),
+out-of-range readings and stuck sensors (the same reading for many consecutive rows)
+The report covers the entire log and each phase of split_log(), and its row mask lets summaries exclude bad readings
+(see mask_bad() and Run.from_file(exclude_bad=True)) without scanning the log again
+
+'''
+
+
+#Sensor channels that are checked, with the range (K) of valid readings. Channels missing from a log (e.g. 'He-3' in a 102 log) are skipped
+SENSOR_RANGES = {'50 mK FAA':(0.01, 400), 'He-3':(0.1, 400), 'ADR 1K':(0.1, 400), '3K Stage Diode':(1, 400), 'Magnet Diode':(1, 400),
+                 '50K Stage Diode':(1, 400), '60K Stage Diode':(1, 400)}
+#Readings the controller logs for a missing or disconnected sensor (see cooldown_plot())
+SENTINELS = (500,)
+
+
+def quality_scan(log, gap_factor=5, stuck_rows=360, rules=None):
+    '''
+    Checks the sensor data of a log for quality problems
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted 107 or 102 log. Return of load_log()
+    gap_factor : float
+        A logging gap is a time step longer than gap_factor times the median time step
+    stuck_rows : int
+        A sensor is stuck if it reads the same value for at least this many consecutive rows
+    rules : dict, optional
+        Thresholds of the validity rules used for the phases (see SEGMENT_RULES)
+
+    Returns
+    -------
+    report : dict
+        'gaps' : DataFrame of logging gaps ('Row' after the gap, 'Start', 'End', 'Seconds')
+        'timestamps' : DataFrame of rows whose timestamp is not after the previous one ('Row', 'Date/Time', 'Seconds' back)
+        'stuck' : DataFrame of stuck-value runs ('Channel', 'Start Row', 'End Row', 'Value', 'Rows')
+        'channels' : DataFrame of counts per channel ('Dropouts', 'Sentinels', 'Out of Range', 'Stuck Rows')
+        'phases' : DataFrame of counts per phase of split_log() (index is the phase key, e.g. 'reg3')
+        'bad' : DataFrame of booleans, True where a reading of a channel is a dropout, sentinel, out of range or stuck
+        'interval' : median time step in seconds
+
+    '''
+    channels = [channel for channel in SENSOR_RANGES if channel in log.columns]
+    values = log[channels].to_numpy(dtype=float)
+    seconds = (log['Date/Time'].to_numpy() - log['Date/Time'].to_numpy()[0]) / np.timedelta64(1, 's')
+
+    #Timestamps: gaps and steps that do not move forward
+    steps = np.diff(seconds)
+    interval = float(np.median(steps[steps > 0])) if (steps > 0).any() else 0.0
+    gaprows = np.flatnonzero(steps > gap_factor * interval) + 1
+    backrows = np.flatnonzero(steps <= 0) + 1
+    gaps = pd.DataFrame({'Row':gaprows, 'Start':log['Date/Time'].to_numpy()[gaprows-1], 'End':log['Date/Time'].to_numpy()[gaprows], 'Seconds':steps[gaprows-1]})
+    timestamps = pd.DataFrame({'Row':backrows, 'Date/Time':log['Date/Time'].to_numpy()[backrows], 'Seconds':-steps[backrows-1]})
+
+    #Readings: dropouts, sentinels and out-of-range values of all channels at once
+    low, high = np.array([SENSOR_RANGES[channel] for channel in channels]).T
+    dropouts = np.isnan(values) | (values == 0)
+    sentinels = np.isin(values, SENTINELS)
+    with np.errstate(invalid='ignore'):
+        outside = ~dropouts & ~sentinels & ((values < low) | (values > high))
+
+    #Stuck sensors: runs of identical valid readings
+    stuck = np.zeros_like(dropouts)
+    runs = []
+    for n, channel in enumerate(channels):
+        starts, ends, run_values = cryo.run_lengths(values[:,n])
+        long = (ends - starts >= stuck_rows) & ~np.isnan(run_values) & (run_values != 0) & ~np.isin(run_values, SENTINELS)
+        for start, end, value in zip(starts[long], ends[long], run_values[long]):
+            stuck[start:end,n] = True
+            runs.append([channel, start, end, value, end - start])
+    stuck_runs = pd.DataFrame(runs, columns=['Channel','Start Row','End Row','Value','Rows'])
+
+    bad = dropouts | sentinels | outside | stuck
+    counts = pd.DataFrame({'Dropouts':dropouts.sum(axis=0), 'Sentinels':sentinels.sum(axis=0), 'Out of Range':outside.sum(axis=0), 'Stuck Rows':stuck.sum(axis=0)}, index=channels)
+
+    #Per-phase counts from cumulative sums over rows
+    flags = np.column_stack([dropouts.sum(axis=1), sentinels.sum(axis=1), outside.sum(axis=1), stuck.sum(axis=1), bad.any(axis=1),
+                             np.isin(np.arange(len(log)), gaprows), np.isin(np.arange(len(log)), backrows)])
+    cumulative = np.vstack([np.zeros((1, flags.shape[1]), dtype=np.int64), np.cumsum(flags, axis=0)])
+    keys, kinds, bounds = [], [], []
+    for kind, phases in zip(['log','regen','reg'], cryo.phase_bounds(log, rules)):
+        for key, (start, end) in phases.items():
+            keys.append(key)
+            kinds.append(kind)
+            bounds.append((start, end))
+    bounds = np.array(bounds, dtype=np.int64).reshape(-1, 2)
+    phasecounts = cumulative[bounds[:,1]] - cumulative[bounds[:,0]]
+    phases = pd.DataFrame(phasecounts, index=keys, columns=['Dropouts','Sentinels','Out of Range','Stuck Rows','Bad Rows','Gaps','Non-monotonic'])
+    phases.insert(0, 'Kind', kinds)
+    phases.insert(1, 'Rows', bounds[:,1] - bounds[:,0])
+
+    return {'gaps':gaps, 'timestamps':timestamps, 'stuck':stuck_runs, 'channels':counts, 'phases':phases,
+            'bad':pd.DataFrame(bad, columns=channels, index=log.index), 'interval':interval}
+
+def quality_summary(report):
+    '''
+    One-row summary of a quality report, e.g. for a table of many logs
+
+    Parameters
+    ----------
+    report : dict
+        Return of quality_scan()
+
+    Returns
+    -------
+    summary : dict
+        Counts of gaps, non-monotonic timestamps, stuck runs, dropouts, sentinels and out-of-range readings,
+        the longest gap (hours) and the fraction of rows with any bad reading
+
+    '''
+    channels = report['channels']
+    return {'Gaps':len(report['gaps']), 'Longest Gap (hrs)':report['gaps']['Seconds'].max()/3600 if len(report['gaps']) else 0.0,
+            'Non-monotonic':len(report['timestamps']), 'Stuck Runs':len(report['stuck']), 'Dropouts':int(channels['Dropouts'].sum()),
+            'Sentinels':int(channels['Sentinels'].sum()), 'Out of Range':int(channels['Out of Range'].sum()),
+            'Bad Fraction':float(report['bad'].to_numpy().any(axis=1).mean()) if len(report['bad']) else 0.0}
+
+def mask_bad(log, report):
+    '''
+    Replaces the bad readings of a quality report with NaN, so the NaN-aware summaries (e.g. temp_summary()) exclude them
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted log the report was made from
+    report : dict
+        Return of quality_scan()
+
+    Returns
+    -------
+    log : DataFrame
+        Copy of the log with bad sensor readings set to NaN. "Magnet Current" and the other columns are unchanged,
+        so the log splits into the same phases
+
+    '''
+    bad = report['bad']
+    log = log.copy()
+    for channel in bad.columns:
+        log[channel] = log[channel].mask(bad[channel].to_numpy())
+    return log
@@ -0,0 +1,263 @@
+import numpy as np
+import pandas as pd
+
+import cryostat_functions as cryo
+import cryostat_quality
+
+
+'''
+
+The classes below wrap a loaded log (Run) and its phase logs (Phase)
+Derived quantities are computed on first use and stored on the object, so plots and summaries share them
+
+'''
+
+
+class cached_slot:
+    '''
+    Read-only attribute computed by the decorated method on first access and stored in the slot '_<method name>'
+    Works like functools.cached_property for classes with __slots__
+
+    '''
+    def __init__(self, func):
+        self.func = func
+        self.slot = '_' + func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.slot)
+        except AttributeError:
+            value = self.func(obj)
+            setattr(obj, self.slot, value)
+            return value
+
+class Phase:
+    '''
+    One phase log (cooldown/warmup, magnet cycle or temperature hold) with memoized derived quantities
+    Attribute and item access not defined here (e.g. phase.iloc, phase['Magnet Current']) is passed to the DataFrame,
+    so a Phase can be given to any function that takes a phase log
+
+    Parameters
+    ----------
+    log : DataFrame
+        Phase log
+    key : str
+        Dictionary key of the phase (e.g. 'reg3')
+
+    '''
+    __slots__ = ('log', 'key', '_hours', '_magnet_on', '_coolwarm_window', '_hold_qtys', '_regen_time')
+
+    def __init__(self, log, key=None):
+        self.log = log
+        self.key = key
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name == 'log':
+            raise AttributeError(name)
+        return getattr(self.log, name)
+
+    def __getitem__(self, item):
+        return self.log[item]
+
+    def __len__(self):
+        return len(self.log)
+
+    def __repr__(self):
+        return 'Phase({!r}, {} rows)'.format(self.key, len(self.log))
+
+    @cached_slot
+    def hours(self):
+        '''Hours after the first row of the phase, from "Date/Time" '''
+        times = self.log['Date/Time'].to_numpy()
+        return (times - times[0]) / np.timedelta64(1, 'h')
+
+    @cached_slot
+    def magnet_on(self):
+        '''Boolean mask of rows where the magnet is on (current above 0.085 A by default, as in temp_hold()) '''
+        return self.log['Magnet Current'].to_numpy(dtype=float) > cryo.SEGMENT_RULES['magnet_on_current']
+
+    @cached_slot
+    def coolwarm_window(self):
+        '''(first, last) rows where the 50 mK stage is between 3.5 K and 286 K, or None if there is no full cooldown or warmup '''
+        faa = self.log['50 mK FAA'].to_numpy(dtype=float)
+        if not (((faa >= 284) & (faa <= 286)).any() and ((faa >= 3.5) & (faa <= 4.5)).any()):
+            return None
+        rows = np.flatnonzero((faa < 286) & (faa > 3.5))
+        return rows[0], rows[-1]
+
+    @cached_slot
+    def hold_qtys(self):
+        '''[date, hold time, max current, current rate 1, 2, 3] as calculated by hold_summary() '''
+        return [self.log['Date/Time'].iloc[0]] + cryo.hold_current_qtys(self.log['Date/Time'].to_numpy(), self.log['Magnet Current'].to_numpy(dtype=float))
+
+    @cached_slot
+    def regen_time(self):
+        '''Magnet cycle time in hours, as calculated by regen_time() '''
+        return cryo.magnet_cycle_time(self.log['Date/Time'].to_numpy(), self.log['Magnet Current'].to_numpy(dtype=float))
+
+    def coolwarm_time(self):
+        '''
+        Cooldown or warmup time in hours, as calculated by coolwarm_time()
+        Returns error message if log does not contain a full cooldown or warmup
+
+        '''
+        if self.coolwarm_window is None:
+            return "No full cooldown or warmup logged"
+        first, last = self.coolwarm_window
+        return self.hours[last] - self.hours[first]
+
+    def hold(self):
+        '''
+        Phase of the rows where the magnet is on, with index and "Hours after Start" reset to start at 0 (as in temp_hold())
+
+        '''
+        hold = self.log.loc[self.magnet_on].reset_index(drop=True)
+        hold["Hours after Start"] = (hold['Date/Time']-hold['Date/Time'].iloc[0]).dt.total_seconds()/3600
+        return Phase(hold, self.key)
+
+class Run:
+    '''
+    One loaded log and its split phases
+    Indexing and unpacking behave like the (logs, regenfiles, regfiles) tuple returned by split_log(),
+    so run[2]['reg1'] and cryo.temp_hold(run[2]) keep working
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted log. Return of load_log(), load_107() or load_102()
+    path : str, optional
+        Filepath the log was loaded from
+    cryostat : int
+        Cryostat model (107 or 102)
+
+    '''
+    __slots__ = ('log', 'path', 'cryostat', '_split', '_phases', '_holds', '_summaries', '_quality')
+
+    def __init__(self, log, path=None, cryostat=107):
+        self.log = log
+        self.path = path
+        self.cryostat = cryostat
+        self._summaries = {}
+
+    @classmethod
+    def from_file(cls, path, exclude_bad=False, cryostat=107):
+        '''
+        Loads a 107 or 102 log into a Run
+
+        Parameters
+        ----------
+        path : str
+            Filepath of individual, complete 107 or 102 log (see cryostat)
+        exclude_bad : bool
+            Set the bad sensor readings of the quality report to NaN (see mask_bad()), so the summaries of the run 
+            exclude them. The log is scanned at load time either way and the report of the raw log is kept as run.quality
+        cryostat : int
+            Cryostat model (107 or 102) of the log
+
+        Returns
+        -------
+        run : Run
+
+        '''
+        log = cryo.load_log(path, cryostat)
+        quality = cryostat_quality.quality_scan(log)
+        run = cls(cryostat_quality.mask_bad(log, quality) if exclude_bad else log, path, cryostat)
+        run._quality = quality
+        return run
+
+    def __getitem__(self, index):
+        return self.split[index]
+
+    def __iter__(self):
+        return iter(self.split)
+
+    def __len__(self):
+        return len(self.split)
+
+    def __repr__(self):
+        return 'Run({!r})'.format(self.label)
+
+    @property
+    def label(self):
+        '''Date of the first row, e.g. '2020-06-01' '''
+        return str(self.log['Date/Time'].iloc[0])[:10]
+
+    @cached_slot
+    def quality(self):
+        '''Data-quality report of the log (see quality_scan()) '''
+        return cryostat_quality.quality_scan(self.log)
+
+    @cached_slot
+    def split(self):
+        '''Return of split_log() for the log '''
+        return cryo.split_log(self.log, cryostat=self.cryostat)
+
+    @cached_slot
+    def phases(self):
+        '''
+        Dictionary of Phase dictionaries. Keys are 'log', 'regen', 'reg' and 'hold' (temperature holds after temp_hold())
+
+        '''
+        phases = {kind:{key:Phase(log, key) for key, log in files.items()} for kind, files in zip(['log','regen','reg'], self.split)}
+        phases['hold'] = {key:phase.hold() for key, phase in phases['reg'].items()}
+        return phases
+
+    @cached_slot
+    def holds(self):
+        '''Dictionary of temperature hold logs after temp_hold(), as DataFrames '''
+        return {key:phase.log for key, phase in self.phases['hold'].items()}
+
+    def _memo(self, name, func):
+        if name not in self._summaries:
+            self._summaries[name] = func()
+        return self._summaries[name]
+
+    def temp_summary(self):
+        '''Return of temp_summary() for the temperature holds of the run, computed once '''
+        return self._memo('temp_summary', lambda: cryo.temp_summary(self.holds, self.cryostat))
+
+    def temp_summary_combine(self):
+        '''Return of temp_summary_combine() for the temperature holds of the run, computed once '''
+        return self._memo('temp_summary_combine', lambda: cryo.temp_summary_combine(self.temp_summary(), self.cryostat))
+
+    def noise_summary(self):
+        '''Return of noise_summary() for the temperature holds of the run, computed once '''
+        return self._memo('noise_summary', lambda: cryo.noise_summary(self.holds))
+
+    def hold_summary(self, energy=False):
+        '''Return of hold_summary() for the temperature holds of the run, computed once from the memoized phase quantities '''
+        def summary():
+            hold_qtys = cryo.hold_table([phase.hold_qtys for phase in self.phases['hold'].values()])
+            if energy:
+                hold_qtys = pd.concat([hold_qtys, self.phase_energy('hold').set_axis(hold_qtys.index)], axis=1)
+            return hold_qtys.sort_index()
+        return self._memo('hold_summary' + ' energy'*energy, summary)
+
+    def regen_summary(self, energy=False):
+        '''Return of regen_summary() for the magnet cycles of the run, computed once from the memoized phase quantities '''
+        def summary():
+            regen_times = cryo.regen_table(self.phases['regen'].keys(), [phase.regen_time for phase in self.phases['regen'].values()])
+            if energy:
+                regen_times = pd.concat([regen_times, self.phase_energy('regen').set_axis(regen_times.index)], axis=1)
+            return regen_times.sort_index().reset_index(drop=True)
+        return self._memo('regen_summary' + ' energy'*energy, summary)
+
+    def hold_decay(self):
+        '''Return of hold_decay() for the temperature holds of the run, computed once '''
+        return self._memo('hold_decay', lambda: cryo.hold_decay(self.holds))
+
+    def phase_energy(self, kind):
+        '''Return of phase_energy() for the phases of a kind ('log', 'regen', 'reg' or 'hold'), computed once '''
+        return self._memo('phase_energy ' + kind, lambda: cryo.phase_energy({key:phase.log for key, phase in self.phases[kind].items()}))
+
+    def coolwarm_crossings(self):
+        '''Return of coolwarm_run() for the log: threshold crossings of every stage in the cooldown and warmup, computed once '''
+        return self._memo('coolwarm_crossings', lambda: cryo.coolwarm_run(self.log, self.cryostat))
+
+    def coolwarm_time(self):
+        '''(cooldown time, warmup time) of the first and last phase logs, as calculated by coolwarm_time() '''
+        logs = self.phases['log']
+        return self._memo('coolwarm_time', lambda: (logs['log1'].coolwarm_time(), logs['log{}'.format(len(logs))].coolwarm_time()))
@@ -0,0 +1,352 @@
+import os
+import json
+import hashlib
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+
+import cryostat_functions as cryo
+from cryostat_run import Run
+
+
+'''
+
+Local read-only query service for run summaries
+Loads each log once into an in-process cache of Run objects and serves their summary tables and decimated phase
+time series as JSON or Arrow, so notebooks and other users do not parse the same logs again. The server listens on
+localhost only and serves logs of one directory. Responses carry an ETag from the log's size and modification time,
+so clients that send If-None-Match get 304 Not Modified without the log being loaded
+
+Usage: python cryostat_server.py <log directory> [--port 8107] [--workers 4] [--runs 16] [--cryostat 107]
+
+Endpoints (all GET; add format=arrow for an Arrow IPC stream instead of JSON, needs pyarrow):
+    /runs                                       logs in the directory, with size, modification time and whether loaded
+    /summary/<table>?log=<name>                 table is one of SUMMARIES. 422 if the table cannot be computed for the
+                                                log (e.g. 'holds' of a log without temperature holds)
+    /phase?log=<name>&kind=reg&key=reg3         phase log, kind is 'log', 'regen', 'reg' or 'hold'
+          [&columns=50 mK FAA,Magnet Current]   columns to return (default all but Notes)
+          [&points=2000]                        at most this many rows, evenly strided
+Add cryostat=102 to /summary and /phase requests for 102 logs (default: the --cryostat of the server)
+
+'''
+
+
+logger = logging.getLogger('cryostat_server')
+
+#Summary tables served by /summary/<table>, from the memoized summaries of a Run
+SUMMARIES = {'temps':lambda run: run.temp_summary_combine(),
+             'holds':lambda run: run.hold_summary(energy=True),
+             'regens':lambda run: run.regen_summary(energy=True),
+             'coolwarm':lambda run: pd.DataFrame({'Hours':[t if not isinstance(t, str) else None for t in run.coolwarm_time()]}, index=['cooldown','warmup']),
+             'decay':lambda run: run.hold_decay(),
+             'noise':lambda run: run.noise_summary()}
+#Phase kinds served by /phase (see Run.phases)
+PHASE_KINDS = ('log', 'regen', 'reg', 'hold')
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+class RequestError(Exception):
+    '''Error with an HTTP status, reported to the client as JSON '''
+    def __init__(self, status, message):
+        super(RequestError, self).__init__(message)
+        self.status = status
+
+class RunCache:
+    '''
+    Loaded runs of the logs in a directory, keyed by filepath and cryostat model
+    A run is reloaded when its log changes size or modification time. Concurrent requests for the same log wait for one
+    load, and the least recently used runs are dropped when more than max_runs are loaded
+
+    Parameters
+    ----------
+    directory : str
+        Directory of log files. Only logs in it are served
+    max_runs : int
+        Maximum number of loaded runs
+    cryostat : int
+        Cryostat model of logs requested without a model (107 or 102)
+
+    '''
+    def __init__(self, directory, max_runs=16, cryostat=107):
+        self.directory = os.path.realpath(directory)
+        self.max_runs = max_runs
+        self.cryostat = cryostat
+        self.runs = OrderedDict() #(Filepath, cryostat) -> ((size, mtime), Run)
+        self.lock = threading.Lock()
+        self.loading = {} #(Filepath, cryostat) -> Lock held while the log is loaded
+
+    def resolve(self, name):
+        '''Filepath and (size, mtime) of a log name in the directory, or RequestError 404 '''
+        if not name:
+            raise RequestError(400, 'Missing log parameter')
+        path = os.path.realpath(os.path.join(self.directory, name))
+        if os.path.dirname(path) != self.directory or not path.lower().endswith(cryo.LOG_EXTENSIONS) or not os.path.isfile(path):
+            raise RequestError(404, 'Unknown log: {}'.format(name))
+        stat = os.stat(path)
+        return path, (stat.st_size, stat.st_mtime)
+
+    def listing(self):
+        '''Name, size, modification time and loaded state of every log in the directory '''
+        with self.lock:
+            loaded = {path:state for (path, cryostat), (state, run) in self.runs.items()}
+        logs = []
+        for path in cryo.log_files(self.directory):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            logs.append({'name':os.path.basename(path), 'size':stat.st_size, 'mtime':stat.st_mtime,
+                         'loaded':loaded.get(path) == (stat.st_size, stat.st_mtime)})
+        return logs
+
+    def get(self, path, state, cryostat=None):
+        '''
+        Returns the run of a log, loading it if it is not loaded or has changed
+
+        Parameters
+        ----------
+        path : str
+            Filepath returned by resolve()
+        state : tuple
+            (size, mtime) returned by resolve()
+        cryostat : int, optional
+            Cryostat model of the log. Defaults to the model of the cache
+
+        Returns
+        -------
+        run : Run
+
+        '''
+        key = (path, self.cryostat if cryostat is None else cryostat)
+        with self.lock:
+            if key in self.runs and self.runs[key][0] == state:
+                self.runs.move_to_end(key)
+                return self.runs[key][1]
+            loading = self.loading.setdefault(key, threading.Lock())
+        with loading:
+            #Another request may have loaded the log while this one waited
+            with self.lock:
+                if key in self.runs and self.runs[key][0] == state:
+                    return self.runs[key][1]
+            logger.info('Loading %s as a %d log', path, key[1])
+            try:
+                run = Run.from_file(path, cryostat=key[1])
+            except (ValueError, KeyError, pd.errors.ParserError) as error:
+                raise RequestError(422, 'Could not load log {} as a {} log: {}'.format(os.path.basename(path), key[1], error))
+            finally:
+                with self.lock:
+                    self.loading.pop(key, None)
+            with self.lock:
+                self.runs[key] = (state, run)
+                self.runs.move_to_end(key)
+                while len(self.runs) > self.max_runs:
+                    self.runs.popitem(last=False)
+            return run
+
+def etag(state, request):
+    '''Strong ETag of a response, from the (size, mtime) of its log and the request path and query '''
+    digest = hashlib.sha1(json.dumps([state, request]).encode()).hexdigest()[:20]
+    return '"{}"'.format(digest)
+
+def decimate(frame, points):
+    '''Every n-th row of a DataFrame, with n chosen so at most points rows are left (the last row is always kept) '''
+    if points is None or len(frame) <= points:
+        return frame
+    step = int(np.ceil(len(frame) / max(points - 1, 1)))
+    rows = np.unique(np.r_[np.arange(0, len(frame), step), len(frame) - 1])
+    return frame.iloc[rows]
+
+def frame_json(frame):
+    '''JSON bytes of a DataFrame as {"columns":[...], "index":[...], "data":[[...], ...]}, with ISO dates and null for NaN '''
+    return frame.to_json(orient='split', date_format='iso', date_unit='s').encode()
+
+def frame_arrow(frame):
+    '''Arrow IPC stream bytes of a DataFrame, with its index as the first column '''
+    import pyarrow as pa
+    table = pa.Table.from_pandas(frame.reset_index().rename(columns=str), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+class Handler(BaseHTTPRequestHandler):
+    '''Handles one GET request against the RunCache of its server '''
+    server_version = 'CryostatServer/1.0'
+
+    def do_GET(self):
+        try:
+            url = urlsplit(self.path)
+            query = {key:values[-1] for key, values in parse_qs(url.query).items()}
+            fmt = query.pop('format', 'json')
+            if fmt not in ('json', 'arrow'):
+                raise RequestError(400, 'Unknown format: {}'.format(fmt))
+            parts = [part for part in url.path.split('/') if part]
+            if parts == ['runs']:
+                if fmt == 'arrow':
+                    self.send(200, frame_arrow(pd.DataFrame(self.server.cache.listing()).set_index('name')), ARROW_TYPE)
+                else:
+                    self.send(200, json.dumps(self.server.cache.listing()).encode(), 'application/json')
+                return
+            if len(parts) == 2 and parts[0] == 'summary':
+                if parts[1] not in SUMMARIES:
+                    raise RequestError(404, 'Unknown summary table: {}'.format(parts[1]))
+                get = self.summary(parts[1])
+            elif parts == ['phase']:
+                get = self.phase(query)
+            else:
+                raise RequestError(404, 'Unknown endpoint: {}'.format(url.path))
+            cryostat = self.cryostat(query)
+            path, state = self.server.cache.resolve(query.get('log'))
+            tag = etag(state, [url.path, sorted(query.items()), fmt])
+            if self.headers.get('If-None-Match') == tag:
+                self.send(304, b'', None, tag)
+                return
+            frame = get(self.server.cache.get(path, state, cryostat))
+            if fmt == 'arrow':
+                self.send(200, frame_arrow(frame), ARROW_TYPE, tag)
+            else:
+                self.send(200, frame_json(frame), 'application/json', tag)
+        except RequestError as error:
+            self.send(error.status, json.dumps({'error':str(error)}).encode(), 'application/json')
+        except ImportError as error:
+            self.send(501, json.dumps({'error':str(error)}).encode(), 'application/json')
+        except Exception as error:
+            logger.exception('Failed request %s', self.path)
+            self.send(500, json.dumps({'error':str(error)}).encode(), 'application/json')
+
+    def cryostat(self, query):
+        #Cryostat model of the request, or None for the model of the server
+        if 'cryostat' not in query:
+            return None
+        try:
+            cryostat = int(query['cryostat'])
+        except ValueError:
+            cryostat = None
+        if cryostat not in cryo.LOG_SCHEMAS:
+            raise RequestError(400, 'Unknown cryostat model: {}'.format(query['cryostat']))
+        return cryostat
+
+    def summary(self, table):
+        #Function of a run returning a summary table. A table that cannot be computed for the log is a client error
+        def get(run):
+            try:
+                return SUMMARIES[table](run)
+            except Exception as error:
+                raise RequestError(422, 'Could not compute {} of log {}: {}'.format(table, os.path.basename(run.path), error))
+        return get
+
+    def phase(self, query):
+        #Function of a run returning the requested, decimated phase log
+        kind, key = query.get('kind', 'reg'), query.get('key')
+        if kind not in PHASE_KINDS:
+            raise RequestError(400, 'Unknown phase kind: {}'.format(kind))
+        try:
+            points = int(query['points']) if 'points' in query else 2000
+        except ValueError:
+            raise RequestError(400, 'points must be an integer')
+        columns = query['columns'].split(',') if 'columns' in query else None
+        def get(run):
+            phases = run.phases[kind]
+            if key not in phases:
+                raise RequestError(404, 'Unknown phase: {}'.format(key))
+            log = phases[key].log
+            selected = columns or [column for column in log.columns if column not in ('Date/Time', 'Notes')]
+            missing = [column for column in selected if column not in log.columns]
+            if missing:
+                raise RequestError(400, 'Unknown columns: {}'.format(', '.join(missing)))
+            return decimate(log.set_index('Date/Time')[selected], points)
+        return get
+
+    def send(self, status, body, content_type, tag=None):
+        self.send_response(status)
+        if content_type is not None:
+            self.send_header('Content-Type', content_type)
+        if tag is not None:
+            self.send_header('ETag', tag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug('%s %s', self.address_string(), format % args)
+
+class CryostatServer(HTTPServer):
+    '''
+    HTTP server that handles requests on a bounded pool of threads
+    At most workers requests are handled at once and at most backlog more wait; further requests get 503 Service Unavailable
+
+    Parameters
+    ----------
+    directory : str
+        Directory of log files to serve
+    port : int
+        Port on localhost (0 picks a free port, see server_address)
+    workers : int
+        Number of request threads
+    backlog : int, optional
+        Number of requests waiting for a thread. Defaults to four times workers
+    max_runs : int
+        Maximum number of loaded runs (see RunCache)
+    cryostat : int
+        Cryostat model of logs requested without a cryostat parameter (107 or 102)
+
+    '''
+    daemon_threads = True
+
+    def __init__(self, directory, port=8107, workers=4, backlog=None, max_runs=16, cryostat=107):
+        super(CryostatServer, self).__init__(('127.0.0.1', port), Handler)
+        self.cache = RunCache(directory, max_runs, cryostat)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cryostat-server')
+        self.slots = threading.BoundedSemaphore(workers + (backlog if backlog is not None else 4 * workers))
+
+    def process_request(self, request, client_address):
+        if not self.slots.acquire(blocking=False):
+            #Pool and queue are full: answer right away instead of queueing without bound
+            request.sendall(b'HTTP/1.0 503 Service Unavailable\r\nContent-Length: 0\r\nRetry-After: 1\r\n\r\n')
+            self.shutdown_request(request)
+            return
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def server_close(self):
+        super(CryostatServer, self).server_close()
+        self.executor.shutdown(wait=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve cryostat run summaries on localhost')
+    parser.add_argument('directory', help='Directory of log files to serve')
+    parser.add_argument('--port', type=int, default=8107, help='Port on localhost (default: 8107)')
+    parser.add_argument('--workers', type=int, default=4, help='Number of request threads (default: 4)')
+    parser.add_argument('--runs', type=int, default=16, help='Maximum number of loaded runs (default: 16)')
+    parser.add_argument('--cryostat', type=int, default=107, choices=sorted(cryo.LOG_SCHEMAS), help='Cryostat model of requests without a cryostat parameter (default: 107)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    server = CryostatServer(args.directory, args.port, args.workers, max_runs=args.runs, cryostat=args.cryostat)
+    logger.info('Serving %s on http://%s:%d', args.directory, *server.server_address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
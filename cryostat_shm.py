@@ -0,0 +1,307 @@
+import atexit
+import multiprocessing
+import os
+import weakref
+from collections import OrderedDict
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+import pandas as pd
+
+import cryostat_functions as cryo
+
+
+'''
+
+The classes and functions below share the arrays of a loaded log with worker processes through shared memory
+The numeric channels and timestamps of the log are copied once into shared memory blocks; workers receive a small
+descriptor (block names, shapes, dtypes and phase row ranges) and attach NumPy views of the blocks without copying,
+instead of receiving pickled copies of the DataFrames. The "Notes" column is not shared: phases are given by their row
+ranges from phase_bounds(), so workers do not need it
+
+'''
+
+
+#Columns of load_log() copied to the channel block, in order, by cryostat model: every column of the schema but "Date/Time" and "Notes"
+SHARED_COLUMNS = {cryostat:[column for column in schema['columns'] if column not in ('Date/Time','Notes')] 
+                  for cryostat, schema in cryo.LOG_SCHEMAS.items()}
+
+
+def _shares_tracker(descriptor):
+    #The owner's process and the processes it starts with multiprocessing (fork, spawn or forkserver) all use the owner's
+    #resource tracker; any other process starts a tracker of its own when it attaches a block
+    return os.getpid() == descriptor['pid'] or multiprocessing.parent_process() is not None
+
+class SharedLog:
+    '''
+    Owner of the shared memory blocks of one loaded log
+    The blocks are freed by close(), when the SharedLog is garbage collected, or at interpreter exit, whichever is first
+
+    Parameters
+    ----------
+    log : DataFrame
+        Entire, reformatted log. Return of load_log(), load_107() or load_102()
+    rules : dict, optional
+        Thresholds of the validity rules used for the phase row ranges (see SEGMENT_RULES)
+    cryostat : int, optional
+        Cryostat model of the log (107 or 102). Found from the columns of the log if None
+
+    Attributes
+    ----------
+    descriptor : dict
+        Picklable description of the blocks and phases; pass it to worker processes and attach it with SharedView
+
+    '''
+    def __init__(self, log, rules=None, cryostat=None):
+        cryostat = cryo.log_model(log) if cryostat is None else cryostat
+        values = log[SHARED_COLUMNS[cryostat]].to_numpy(dtype=np.float64)
+        times = log['Date/Time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        self.blocks = []
+        arrays = {}
+        for name, array in (('values', values), ('times', times)):
+            #Zero-size blocks are not allowed, so every block has at least one byte
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            arrays[name] = {'name':block.name, 'shape':array.shape, 'dtype':array.dtype.str}
+        logbounds, regenbounds, regbounds = cryo.phase_bounds(log, rules, cryostat)
+        self.descriptor = {'arrays':arrays, 'cryostat':cryostat, 'columns':SHARED_COLUMNS[cryostat], 'rows':len(log), 'pid':os.getpid(),
+                           'phases':{'log':logbounds, 'regen':regenbounds, 'reg':regbounds}}
+        #Free the blocks even if close() is never called
+        self._finalizer = weakref.finalize(self, SharedLog._free, list(self.blocks))
+
+    @staticmethod
+    def _free(blocks):
+        for block in blocks:
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+    @property
+    def nbytes(self):
+        return sum(block.size for block in self.blocks)
+
+    @property
+    def closed(self):
+        return not self._finalizer.alive
+
+    def close(self):
+        '''Frees the shared memory blocks. Views attached by workers must be closed first '''
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SharedView:
+    '''
+    Zero-copy view of a shared log in any process, from its descriptor
+    Use as a context manager; arrays and DataFrames from the view must not be used after it is closed, so copy results
+    (e.g. with np.array(...)) that outlive it
+
+    Parameters
+    ----------
+    descriptor : dict
+        SharedLog.descriptor
+    track : bool, optional
+        Whether the attached blocks stay registered with the resource tracker of this process. If None, they stay 
+        registered only in the owner's process and in processes started by it with multiprocessing, which share the 
+        owner's tracker; unregistering there would remove the owner's own registration
+
+    '''
+    def __init__(self, descriptor, track=None):
+        track = _shares_tracker(descriptor) if track is None else track
+        self.descriptor = descriptor
+        self.blocks = []
+        arrays = {}
+        for name, spec in descriptor['arrays'].items():
+            block = shared_memory.SharedMemory(name=spec['name'])
+            if not track:
+                #Attaching registered the block with this process's own resource tracker, which would unlink it when 
+                #this process exits; the owning SharedLog is responsible for it
+                resource_tracker.unregister(block._name, 'shared_memory')
+            self.blocks.append(block)
+            arrays[name] = np.ndarray(spec['shape'], dtype=np.dtype(spec['dtype']), buffer=block.buf)
+        self.values = arrays['values']
+        self.times = arrays['times'].view('datetime64[ns]')
+        self.columns = {column:n for n, column in enumerate(descriptor['columns'])}
+
+    def column(self, name, rows=None):
+        '''
+        View of one channel, optionally of a row range
+
+        Parameters
+        ----------
+        name : str
+            Column name (one of the SHARED_COLUMNS of the cryostat model)
+        rows : tuple, optional
+            (first row, row after the last row)
+
+        '''
+        column = self.values[:, self.columns[name]]
+        return column if rows is None else column[rows[0]:rows[1]]
+
+    def frame(self, rows=None):
+        '''
+        DataFrame with the columns of load_log() ("Notes" is empty) for a row range, or the entire log if None
+        The DataFrame is a copy of the rows; use column() or the values attribute for views without copying
+
+        '''
+        start, end = (0, self.descriptor['rows']) if rows is None else rows
+        frame = pd.DataFrame(self.values[start:end], columns=self.descriptor['columns'], copy=False)
+        frame.insert(0, 'Date/Time', self.times[start:end])
+        frame['Notes'] = ''
+        #Column order of load_log()
+        return frame[cryo.LOG_SCHEMAS[self.descriptor['cryostat']]['columns']]
+
+    def phase(self, kind, key):
+        '''
+        Phase log as returned by split_log() (kind 'log', 'regen' or 'reg'), or after temp_hold() (kind 'hold')
+
+        Parameters
+        ----------
+        kind : str
+            'log', 'regen', 'reg' or 'hold'
+        key : str
+            Dictionary key of the phase (e.g. 'reg3')
+
+        Returns
+        -------
+        phase : DataFrame
+            Copy of the phase rows, reformatted as by split_log() and temp_hold()
+
+        '''
+        phases = self.descriptor['phases']
+        rows = phases['reg' if kind == 'hold' else kind][key]
+        phase = self.frame(rows)
+        if kind == 'log':
+            return phase.set_axis(range(rows[0], rows[1]))
+        #Reset "Hours from Start" column
+        phase["Hours after Start"] = (phase['Date/Time']-phase.iloc[0,0]).dt.total_seconds()/3600
+        if kind in ('reg', 'hold'):
+            #Replace 0 values in "50 mK FAA" column with NaN
+            phase['50 mK FAA'] = phase['50 mK FAA'].replace(0,np.nan)
+        if kind == 'hold':
+            phase = cryo.magnet_on(phase)
+        return phase
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _call_phase(func, descriptor, kind, key):
+    #Runs in a worker process: attach, build the phase log, call func and detach
+    with SharedView(descriptor) as view:
+        return func(view.phase(kind, key))
+
+def shared_phase_map(func, shared, kind, executor=None):
+    '''
+    Applies a function to every phase of a shared log, on a process pool. Like phase_map(), but workers attach
+    the phase rows from shared memory instead of receiving pickled phase logs
+
+    Parameters
+    ----------
+    func : function
+        Picklable (module-level) function of one phase log, e.g. cryo.hold_phase_qtys
+    shared : SharedLog or dict
+        Shared log, or its descriptor
+    kind : str
+        'log', 'regen', 'reg' or 'hold' (see SharedView.phase())
+    executor : Executor, optional
+        Executor to run func on (e.g. a ProcessPoolExecutor). Runs serially in this process if None
+
+    Returns
+    -------
+    results : dict
+        Return of func for each phase, keyed as in split_log()
+
+    '''
+    descriptor = shared.descriptor if isinstance(shared, SharedLog) else shared
+    keys = list(descriptor['phases']['reg' if kind == 'hold' else kind])
+    if executor is None:
+        return {key:_call_phase(func, descriptor, kind, key) for key in keys}
+    futures = [executor.submit(_call_phase, func, descriptor, kind, key) for key in keys]
+    return {key:future.result() for key, future in zip(keys, futures)}
+
+class SharedLogRegistry:
+    '''
+    Shared logs of recently used runs, keyed by filepath (or any key)
+    When more than max_bytes of shared memory are in use, the least recently used logs are evicted and their blocks freed
+
+    Parameters
+    ----------
+    max_bytes : int
+        Shared memory above which least recently used logs are evicted
+
+    '''
+    def __init__(self, max_bytes=2 * 2**30):
+        self.max_bytes = max_bytes
+        self.logs = OrderedDict()
+        atexit.register(self.clear)
+
+    def __contains__(self, key):
+        return key in self.logs
+
+    def __len__(self):
+        return len(self.logs)
+
+    @property
+    def nbytes(self):
+        return sum(shared.nbytes for shared in self.logs.values())
+
+    def get(self, key, log=None, rules=None, cryostat=107):
+        '''
+        Returns the shared log of a key, creating it from log (a DataFrame, or a function returning one) if it is not shared yet
+
+        Parameters
+        ----------
+        key : str
+            Filepath of the log, or any key
+        log : DataFrame or function, optional
+            Log to share if the key is not shared yet. Defaults to load_log(key, cryostat)
+        rules : dict, optional
+            Thresholds of the validity rules (see SEGMENT_RULES)
+        cryostat : int
+            Cryostat model of the log (107 or 102)
+
+        Returns
+        -------
+        shared : SharedLog
+
+        '''
+        if key in self.logs:
+            self.logs.move_to_end(key)
+            return self.logs[key]
+        if log is None:
+            log = cryo.load_log(key, cryostat)
+        elif callable(log):
+            log = log()
+        self.logs[key] = SharedLog(log, rules, cryostat)
+        self.evict()
+        return self.logs[key]
+
+    def release(self, key):
+        '''Frees the shared log of a key '''
+        shared = self.logs.pop(key, None)
+        if shared is not None:
+            shared.close()
+
+    def evict(self):
+        '''Frees least recently used logs until at most max_bytes are in use, keeping the most recent one '''
+        while len(self.logs) > 1 and self.nbytes > self.max_bytes:
+            self.release(next(iter(self.logs)))
+
+    def clear(self):
+        for key in list(self.logs):
+            self.release(key)